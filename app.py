@@ -68,22 +68,19 @@ def token_required(f):
 
 def apply_adjustments_to_companies(companies):
     """Aplica ajustes do banco de dados aos dados das empresas"""
+    # Duas consultas no total, independente do número de empresas
+    adjustments = db.get_adjustments_by_company()
+    expense_totals = db.get_expenses_totals_by_company()
+    
     for company in companies:
-        adjustment = db.get_company_adjustment(company['code'])
-        if adjustment:
-            # Aplicar ajustes se existirem
-            if adjustment.get('contract_value') is not None:
-                company['contract_value'] = adjustment['contract_value']
-            if adjustment.get('spent_value') is not None:
-                company['spent_value'] = adjustment['spent_value']
-            else:
-                # Se não há ajuste de spent_value, usar soma de lançamentos
-                total_expenses = db.get_expenses_by_company(company['code'])
-                if total_expenses > 0:
-                    company['spent_value'] = total_expenses
+        adjustment = adjustments.get(company['code'])
+        if adjustment and adjustment.get('contract_value') is not None:
+            company['contract_value'] = adjustment['contract_value']
+        if adjustment and adjustment.get('spent_value') is not None:
+            company['spent_value'] = adjustment['spent_value']
         else:
-            # Se não há ajuste, usar soma de lançamentos
-            total_expenses = db.get_expenses_by_company(company['code'])
+            # Se não há ajuste de spent_value, usar soma de lançamentos
+            total_expenses = expense_totals.get(company['code'], 0)
             if total_expenses > 0:
                 company['spent_value'] = total_expenses
         
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Expense, CompanyAdjustment
+from .models import User, Expense, ExpenseTotal, CompanyAdjustment
 
 
 @admin.register(Expense)
@@ -11,6 +11,15 @@ class ExpenseAdmin(admin.ModelAdmin):
     ordering = ['-expense_date']
 
 
+@admin.register(ExpenseTotal)
+class ExpenseTotalAdmin(admin.ModelAdmin):
+    list_display = ['company_code', 'total', 'count', 'last_expense_date', 'updated_at']
+    search_fields = ['company_code']
+    ordering = ['company_code']
+    # Mantidos pelos lançamentos (manage.py rebuild_expense_totals para recalcular)
+    readonly_fields = ['company_code', 'total', 'count', 'last_expense_date', 'updated_at']
+
+
 @admin.register(CompanyAdjustment)
 class CompanyAdjustmentAdmin(admin.ModelAdmin):
     list_display = ['company_name', 'company_code', 'contract_value', 'spent_value', 'updated_at']
@@ -0,0 +1,7 @@
+"""
+Erros comuns das respostas da API
+"""
+
+
+class ListingError(ValueError):
+    """Parâmetro inválido em uma listagem ou consulta (resposta 400)"""
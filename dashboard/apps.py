@@ -12,70 +12,38 @@ class DashboardConfig(AppConfig):
         """Inicializar quando a aplicação estiver pronta"""
         # Importar aqui para evitar problemas de importação circular
         import os
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from .db import configure_sqlite
+        
+        # PRAGMAs de desempenho em cada conexão SQLite (ver SQLITE_PRAGMAS)
+        connection_created.connect(configure_sqlite, dispatch_uid='dashboard.configure_sqlite')
+        
         if os.environ.get('RUN_MAIN') or os.environ.get('WERKZEUG_RUN_MAIN'):
-            # Só executar no processo principal (não no reloader)
-            self.start_file_monitor()
+            # Só executar no processo principal (não no reloader); em produção
+            # a ingestão roda no comando run_ingestor
+            if getattr(settings, 'INGEST_EMBEDDED', True):
+                self.start_file_monitor()
     
     def start_file_monitor(self):
-        """Iniciar o monitoramento de arquivos"""
+        """Iniciar o monitoramento de arquivos, se nenhum outro processo for o líder"""
         try:
-            from django.conf import settings
-            from .utils.file_monitor import FileMonitor
-            from .utils.excel_processor import ExcelProcessor
-            from . import views
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-            from datetime import datetime
+            from .ingest import IngestService, get_leader_lock
+            import threading
             
-            processor = ExcelProcessor()
-            monitor = FileMonitor(
-                settings.WATCH_FOLDER,
-                settings.EXCEL_PATTERN,
-                settings.CHECK_INTERVAL
-            )
+            lock = get_leader_lock()
+            if not lock.acquire():
+                holder = lock.holder() or {}
+                logger.info(f"Ingestão já executada por outro processo (pid {holder.get('pid')}); "
+                            f"usando os dados publicados")
+                return
             
-            def on_file_changed(file_path: str):
-                """Callback quando arquivo é detectado/modificado"""
-                try:
-                    logger.info(f"Processando arquivo: {file_path}")
-                    
-                    # Processar arquivo
-                    companies = processor.process_file(file_path)
-                    
-                    # Aplicar ajustes do banco de dados
-                    companies = views.apply_adjustments_to_companies(companies)
-                    
-                    statistics = processor.get_statistics(companies)
-                    
-                    # Atualizar dados
-                    views.current_data['companies'] = companies
-                    views.current_data['statistics'] = statistics
-                    views.current_data['file_path'] = file_path
-                    views.current_data['last_update'] = datetime.now().isoformat()
-                    
-                    # Emitir atualização para todos os clientes conectados via Channels
-                    channel_layer = get_channel_layer()
-                    if channel_layer:
-                        async_to_sync(channel_layer.group_send)(
-                            "dashboard",
-                            {
-                                "type": "dashboard_update",
-                                "data": views.current_data
-                            }
-                        )
-                    
-                    logger.info(f"Dados atualizados: {len(companies)} empresas")
-                
-                except Exception as e:
-                    logger.error(f"Erro ao processar arquivo: {e}")
-                    import traceback
-                    traceback.print_exc()
+            # A trava fica com o processo enquanto ele existir
+            self.leader_lock = lock
+            self.ingest_service = IngestService()
             
-            # Iniciar monitor
-            if monitor.start(on_file_changed):
-                logger.info("Monitor de arquivo iniciado")
-            else:
-                logger.warning("Falha ao iniciar monitor de arquivo")
+            # Fora da thread principal: o acesso ao banco não bloqueia a inicialização
+            threading.Thread(target=self.ingest_service.start, daemon=True).start()
         
         except Exception as e:
             logger.error(f"Erro ao inicializar monitor: {e}")
@@ -0,0 +1,90 @@
+"""
+Consulta das empresas do snapshot para a API
+Filtros por status, faixa de percentual utilizado e início do nome ou
+código, ordenação e paginação por offset/limit, respondidos pelos índices
+montados uma vez por versão (ver utils.snapshot_index)
+"""
+
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+from .api_errors import ListingError
+from .utils.company_table import STATUSES
+from .utils.snapshot_index import SORT_KEYS
+
+
+def _parse_float(params, name: str) -> Optional[float]:
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ListingError(f"Valor inválido em {name}: {value}")
+
+
+def _parse_int(params, name: str, default: int) -> int:
+    value = params.get(name)
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ListingError(f"{name} inválido: {value}")
+    if number < 0:
+        raise ListingError(f"{name} não pode ser negativo")
+    return number
+
+
+def page(snapshot, params) -> Dict[str, Any]:
+    """
+    Uma página de empresas do snapshot
+
+    Args:
+        snapshot: Snapshot atual
+        params: QueryDict (status, pct_min, pct_max, q, sort, offset, limit)
+
+    Returns:
+        {'results': [...], 'total': n, 'offset': n, 'limit': n,
+         'status_counts': {...}, 'version': n}
+
+    Raises:
+        ListingError: Se algum parâmetro for inválido
+    """
+    statuses = None
+    if params.get('status'):
+        statuses = [status.strip() for status in params['status'].split(',') if status.strip()]
+        unknown = [status for status in statuses if status not in STATUSES]
+        if unknown:
+            raise ListingError(f"Status inválido: {', '.join(unknown)}. Use {', '.join(STATUSES)}")
+
+    sort = params.get('sort') or 'name'
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    if sort not in SORT_KEYS:
+        raise ListingError(f"Ordenação inválida: {sort}. Use {', '.join(SORT_KEYS)} (com - para decrescente)")
+
+    offset = _parse_int(params, 'offset', 0)
+    limit = _parse_int(params, 'limit', getattr(settings, 'COMPANIES_PAGE_SIZE', 100))
+    limit = max(1, min(limit, getattr(settings, 'COMPANIES_MAX_PAGE_SIZE', 5000)))
+
+    index = snapshot.index
+    total, results = index.query(
+        statuses=statuses,
+        percentage_min=_parse_float(params, 'pct_min'),
+        percentage_max=_parse_float(params, 'pct_max'),
+        prefix=params.get('q'),
+        sort=sort,
+        descending=descending,
+        offset=offset,
+        limit=limit
+    )
+    return {
+        'results': results,
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'status_counts': index.status_counts(),
+        'version': snapshot.version
+    }
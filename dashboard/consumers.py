@@ -7,26 +7,30 @@ import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from asgiref.sync import sync_to_async
 from datetime import datetime
+from urllib.parse import parse_qs
 
 logger = logging.getLogger(__name__)
 
+# Início (em MessagePack) de um mapa de 2 itens: "type": "update", "data": ...
+MSGPACK_UPDATE_PREFIX = b'\x82\xa4type\xa6update\xa4data'
+
 
 class DashboardConsumer(AsyncWebsocketConsumer):
     """Consumer para atualizações em tempo real do dashboard"""
     
     async def connect(self):
         """Quando cliente se conecta"""
+        # Formato das mensagens: ws/dashboard/?format=columnar ou ?format=msgpack (padrão json)
+        self.wire = self._wire_format(self.scope.get('query_string', b''))
+        
         await self.channel_layer.group_add("dashboard", self.channel_name)
         await self.accept()
         
-        logger.info(f"Cliente conectado: {self.channel_name}")
+        logger.info(f"Cliente conectado: {self.channel_name} ({self.wire})")
         
-        # Enviar dados atuais
-        from .views import current_data
-        await self.send(text_data=json.dumps({
-            'type': 'update',
-            'data': current_data
-        }))
+        # Enviar dados atuais (a versão inteira, lida uma só vez)
+        from . import views
+        await self._send_snapshot(views.current_snapshot)
     
     async def disconnect(self, close_code):
         """Quando cliente se desconecta"""
@@ -39,7 +43,37 @@ class DashboardConsumer(AsyncWebsocketConsumer):
     
     async def dashboard_update(self, event):
         """Enviar atualização para o cliente"""
-        await self.send(text_data=json.dumps({
-            'type': 'update',
-            'data': event['data']
-        }))
+        # Os bytes vêm do snapshot deste processo: ingest.apply_snapshot já
+        # serializou todos os formatos, e todos os clientes recebem os mesmos
+        from . import views
+        snapshot = views.current_snapshot
+        if snapshot.version > event.get('version', 0):
+            # Uma versão mais nova já foi publicada e a notificação dela vem em seguida
+            return
+        await self._send_snapshot(snapshot)
+    
+    async def _send_snapshot(self, snapshot):
+        body = snapshot.cached_body(self.wire)
+        if body is None:
+            # Versão ainda não preparada: serializar em uma thread, fora do laço de eventos
+            body = await sync_to_async(snapshot.body, thread_sensitive=False)(self.wire)
+        if self.wire == 'msgpack':
+            # Mapa {'type': 'update', 'data': <snapshot>} montado sem reserializar os dados
+            await self.send(bytes_data=MSGPACK_UPDATE_PREFIX + body)
+        else:
+            await self.send(text_data=self._update_message(body.decode('utf-8')))
+    
+    @staticmethod
+    def _wire_format(query_string: bytes) -> str:
+        """Formato pedido na URL, se disponível (senão json)"""
+        from .utils.snapshot import WIRE_FORMATS, msgpack
+        
+        wire = parse_qs(query_string.decode('latin-1')).get('format', ['json'])[0]
+        if wire not in WIRE_FORMATS or (wire == 'msgpack' and msgpack is None):
+            return 'json'
+        return wire
+    
+    @staticmethod
+    def _update_message(payload: str) -> str:
+        """Mensagem de atualização com os dados já serializados do snapshot"""
+        return '{"type":"update","data":' + payload + '}'
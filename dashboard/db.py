@@ -0,0 +1,252 @@
+"""
+Ajustes de desempenho do SQLite e escrita agrupada de lançamentos
+Cada conexão nova recebe os PRAGMAs de SQLITE_PRAGMAS (WAL, espera por
+trava, mmap e cache); com EXPENSE_GROUP_COMMIT os lançamentos que chegam em
+poucos milissegundos são gravados em uma só transação
+"""
+
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+import queue
+import threading
+import time
+import logging
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Perfil padrão: WAL deixa leituras (ingestão, API) e escritas simultâneas;
+# busy_timeout espera a trava em vez de falhar com 'database is locked'
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Aplica os PRAGMAs a cada conexão SQLite aberta (sinal connection_created)
+
+    Um banco pode definir 'PRAGMAS' no próprio DATABASES para usar outro perfil
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if pragmas is None:
+        pragmas = getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def create_expense(using: str = 'default', **fields):
+    """
+    Inclui um lançamento na sua própria transação (um por requisição)
+
+    Returns:
+        (Expense criado, total de lançamentos da empresa)
+    """
+    from .models import CompanyAdjustment, Expense, ExpenseTotal
+
+    with transaction.atomic(using=using):
+        expense = Expense(**fields)
+        expense.save(using=using)
+
+        # Atualizar valor gasto na empresa com o total de lançamentos
+        adjustment, created = CompanyAdjustment.objects.using(using).get_or_create(
+            company_code=expense.company_code,
+            defaults={'company_name': expense.company_name}
+        )
+        total = ExpenseTotal.objects.using(using).filter(
+            company_code=expense.company_code
+        ).values_list('total', flat=True).first() or 0
+        adjustment.spent_value = total
+        adjustment.save(using=using)
+    return expense, total
+
+
+def delete_expense(expense_id: int, using: str = 'default'):
+    """
+    Remove um lançamento pelo modelo (o sinal post_delete atualiza ExpenseTotal)
+
+    O valor gasto da empresa acompanha o total restante; sem lançamentos, o
+    ajuste de valor gasto é limpo e volta a valer o valor do Excel
+
+    Returns:
+        Expense removido
+
+    Raises:
+        Expense.DoesNotExist: Se o lançamento não existe
+    """
+    from .models import CompanyAdjustment, Expense, ExpenseTotal
+
+    with transaction.atomic(using=using):
+        expense = Expense.objects.using(using).get(id=expense_id)
+        expense.delete(using=using)
+
+        total = ExpenseTotal.objects.using(using).filter(
+            company_code=expense.company_code
+        ).values_list('total', flat=True).first()
+        # updated_at muda junto: a versão do relatório em cache depende dele (ver export_cache)
+        CompanyAdjustment.objects.using(using).filter(company_code=expense.company_code).update(
+            spent_value=total, updated_at=timezone.now()
+        )
+    return expense
+
+
+def sync_spent_values(names: Dict[str, str], totals: Dict[str, Any], using: str = 'default') -> None:
+    """
+    Valor gasto das empresas acompanha o total de lançamentos (como em add_expense)
+
+    Args:
+        names: {código: nome} das empresas afetadas (criadas em CompanyAdjustment se faltarem)
+        totals: {código: total de lançamentos}; empresas ausentes ficam com 0
+        using: Banco de dados (alias do DATABASES)
+    """
+    from .models import CompanyAdjustment
+
+    adjustments = CompanyAdjustment.objects.using(using)
+    existing = set(adjustments.filter(company_code__in=names).values_list('company_code', flat=True))
+    adjustments.bulk_create([
+        CompanyAdjustment(company_code=code, company_name=name)
+        for code, name in names.items() if code not in existing
+    ])
+    now = timezone.now()
+    for code in names:
+        adjustments.filter(company_code=code).update(spent_value=totals.get(code, 0), updated_at=now)
+
+
+class ExpenseWriter:
+    """Grava lançamentos em lotes: uma transação para todos os que chegam na janela"""
+
+    def __init__(self, window: float = 0.005, max_batch: int = 500, using: str = 'default'):
+        """
+        Inicializa o gravador
+
+        Args:
+            window: Segundos de espera por mais lançamentos depois do primeiro do lote
+            max_batch: Máximo de lançamentos por transação
+            using: Banco de dados (alias do DATABASES)
+        """
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.using = using
+        self._queue: 'queue.Queue[Optional[Tuple[Dict[str, Any], Future]]]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.written = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name='expense-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        """Grava o que está na fila e para a thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread:
+            self._queue.put(None)
+            thread.join(timeout=timeout)
+
+    def submit(self, **fields) -> Future:
+        """
+        Agenda a inclusão de um lançamento
+
+        Args:
+            fields: Campos do Expense (company_code, company_name, amount, ...)
+
+        Returns:
+            Future com (Expense criado, total de lançamentos da empresa)
+        """
+        self.start()
+        future: Future = Future()
+        self._queue.put((fields, future))
+        return future
+
+    def write(self, **fields):
+        """Inclui um lançamento e espera a gravação do lote"""
+        return self.submit(**fields).result()
+
+    def _collect(self, first) -> Tuple[List[Tuple[Dict[str, Any], Future]], bool]:
+        """Junta ao primeiro lançamento os que chegarem dentro da janela"""
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _worker(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch, stopping = self._collect(item)
+            try:
+                close_old_connections()
+                self._write_batch(batch)
+            except Exception as e:
+                # Um lançamento inválido não derruba os demais: grava um a um
+                logger.warning(f"Lote de {len(batch)} lançamentos falhou ({e}); gravando individualmente")
+                for entry in batch:
+                    try:
+                        self._write_batch([entry])
+                    except Exception as error:
+                        entry[1].set_exception(error)
+        connections[self.using].close()
+
+    def _write_batch(self, batch) -> None:
+        from .models import Expense, ExpenseTotal
+
+        with transaction.atomic(using=self.using):
+            expenses = Expense.objects.using(self.using).bulk_create(
+                [Expense(**fields) for fields, _ in batch]
+            )
+            # Totais das empresas do lote atualizados uma vez por empresa
+            ExpenseTotal.record_many(
+                ((expense.company_code, expense.amount, expense.expense_date) for expense in expenses),
+                using=self.using
+            )
+            names = {expense.company_code: expense.company_name for expense in expenses}
+            totals = dict(ExpenseTotal.objects.using(self.using).filter(
+                company_code__in=names
+            ).values_list('company_code', 'total'))
+            sync_spent_values(names, totals, using=self.using)
+
+        self.batches += 1
+        self.written += len(batch)
+        for expense, (_, future) in zip(expenses, batch):
+            future.set_result((expense, totals.get(expense.company_code, 0)))
+
+
+_writer: Optional[ExpenseWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_expense_writer() -> ExpenseWriter:
+    """Gravador agrupado compartilhado pelo processo"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ExpenseWriter(
+                window=getattr(settings, 'EXPENSE_GROUP_COMMIT_WINDOW_MS', 5) / 1000,
+                max_batch=getattr(settings, 'EXPENSE_GROUP_COMMIT_MAX_BATCH', 500)
+            )
+        return _writer
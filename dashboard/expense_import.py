@@ -0,0 +1,383 @@
+"""
+Importação de lançamentos em lote
+Lê CSV, XLSX ou JSON/NDJSON aos poucos e valida em blocos antes de gravar;
+grava tudo em uma só transação curta (bulk_create) e recalcula uma vez os
+totais das empresas afetadas
+"""
+
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+import codecs
+import csv
+import io
+import itertools
+import json
+import pickle
+import re
+import tempfile
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from .db import sync_spent_values
+from .models import Expense, ExpenseTotal
+from .utils.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'xlsx', 'json')
+
+REQUIRED_FIELDS = ('company_code', 'company_name', 'amount', 'expense_date')
+OPTIONAL_FIELDS = ('description', 'category', 'notes')
+
+# Caracteres lidos por vez de um array JSON
+JSON_BLOCK_SIZE = 64 * 1024
+
+# Cabeçalhos aceitos além dos nomes dos campos (comparados sem acentos e maiúsculas)
+HEADER_ALIASES = {
+    'codigo': 'company_code',
+    'codigo da empresa': 'company_code',
+    'empresa': 'company_name',
+    'nome da empresa': 'company_name',
+    'valor': 'amount',
+    'data': 'expense_date',
+    'data do gasto': 'expense_date',
+    'descricao': 'description',
+    'categoria': 'category',
+    'observacoes': 'notes',
+}
+
+# Erros devolvidos na resposta (a validação continua até o fim do arquivo)
+MAX_REPORTED_ERRORS = 50
+
+_MAX_AMOUNT = Decimal('1e13')
+# '1.234' sem vírgula: milhar no formato brasileiro ou 1,234 com ponto decimal?
+_AMBIGUOUS_AMOUNT = re.compile(r'[-+]?\d{1,3}(\.\d{3})+')
+
+
+class ImportValidationError(ValueError):
+    """Arquivo com linhas inválidas: nada foi gravado"""
+
+    def __init__(self, errors: List[Tuple[int, str]], error_count: int, rows: int):
+        """
+        Args:
+            errors: (linha, mensagem) das primeiras MAX_REPORTED_ERRORS linhas inválidas
+            error_count: Total de linhas inválidas
+            rows: Linhas lidas
+        """
+        self.errors = errors
+        self.error_count = error_count
+        self.rows = rows
+        super().__init__(f"{error_count} linha(s) inválida(s) em {rows}; nenhum lançamento importado")
+
+
+def detect_format(filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
+    """
+    Formato pelo nome do arquivo ou pelo Content-Type
+
+    Raises:
+        ImportValidationError: Se o formato não for reconhecido
+    """
+    name = (filename or '').lower()
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if name.endswith('.csv') or content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if name.endswith(('.xlsx', '.xlsm')) or 'spreadsheetml' in content_type:
+        return 'xlsx'
+    if name.endswith(('.json', '.ndjson', '.jsonl')) or content_type in ('application/json', 'application/x-ndjson'):
+        return 'json'
+    raise ImportValidationError([(0, f"Formato não reconhecido. Use {', '.join(IMPORT_FORMATS)}")], 1, 0)
+
+
+def _header_field(value: Any) -> Optional[str]:
+    header = normalize_text(value).replace(' ', '_')
+    if header in REQUIRED_FIELDS or header in OPTIONAL_FIELDS:
+        return header
+    return HEADER_ALIASES.get(header.replace('_', ' '))
+
+
+def _map_header(header: Iterable[Any]) -> List[Optional[str]]:
+    fields = [_header_field(value) for value in header]
+    missing = [field for field in REQUIRED_FIELDS if field not in fields]
+    if missing:
+        raise ImportValidationError([(1, f"Colunas obrigatórias ausentes: {', '.join(missing)}")], 1, 0)
+    return fields
+
+
+def _read_csv(stream: BinaryIO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    text = codecs.getreader('utf-8-sig')(stream)
+    first = text.readline()
+    # Planilhas exportadas em português costumam usar ';'
+    delimiter = ';' if first.count(';') > first.count(',') else ','
+    reader = csv.reader(itertools.chain([first], text), delimiter=delimiter)
+    fields = _map_header(next(reader, []))
+    for line, values in enumerate(reader, start=2):
+        if any(value.strip() for value in values):
+            yield line, {field: value for field, value in zip(fields, values) if field}
+
+
+def _read_xlsx(stream: BinaryIO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        fields = _map_header(next(rows, ()))
+        for line, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield line, {field: value for field, value in zip(fields, values) if field}
+    finally:
+        workbook.close()
+
+
+def _loads(content: str, line: int) -> Any:
+    try:
+        return json.loads(content)
+    except ValueError as e:
+        raise ImportValidationError([(line, f"JSON inválido: {e}")], 1, line)
+
+
+def _iter_json_array(text: io.TextIOBase) -> Iterator[Any]:
+    """
+    Itens de um array JSON lidos em blocos (o '[' já foi consumido)
+
+    Só o bloco atual e o item sendo decodificado ficam em memória
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    number = 0
+    expect_item = True
+
+    def more() -> bool:
+        nonlocal buffer, position, eof
+        block = text.read(JSON_BLOCK_SIZE)
+        buffer = buffer[position:] + block
+        position = 0
+        eof = not block
+        return bool(block)
+
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        if position == len(buffer):
+            if not more():
+                raise ImportValidationError([(number, 'JSON inválido: array não terminado')], 1, number)
+            continue
+
+        if buffer[position] == ']' and (number == 0 or not expect_item):
+            return
+        if not expect_item:
+            if buffer[position] != ',':
+                raise ImportValidationError([(number, f"JSON inválido: ',' ou ']' esperado após o item {number}")], 1, number)
+            position += 1
+            expect_item = True
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except ValueError as e:
+            # Item incompleto no fim do bloco: ler mais e tentar de novo
+            if more():
+                continue
+            raise ImportValidationError([(number + 1, f"JSON inválido: {getattr(e, 'msg', e)}")], 1, number + 1)
+        if end == len(buffer) and not eof and more():
+            # Um número no fim do bloco pode continuar no bloco seguinte
+            continue
+        position = end
+        number += 1
+        expect_item = False
+        yield item
+
+
+def _read_json(stream: BinaryIO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    first = text.read(1)
+    while first.isspace():
+        first = text.read(1)
+
+    if first == '[':
+        # Array JSON: item a item, sem carregar o arquivo inteiro (NDJSON é lido linha a linha)
+        items = enumerate(_iter_json_array(text), start=1)
+    else:
+        items = (
+            (line, _loads(content, line))
+            for line, content in enumerate(itertools.chain([first + text.readline()], text), start=1)
+            if content.strip()
+        )
+
+    for number, item in items:
+        if not isinstance(item, dict):
+            raise ImportValidationError([(number, 'Cada lançamento deve ser um objeto JSON')], 1, number)
+        fields = ((_header_field(key), value) for key, value in item.items())
+        yield number, {field: value for field, value in fields if field}
+
+
+def read_rows(stream: BinaryIO, import_format: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Linhas do arquivo, uma a uma, com os campos do lançamento
+
+    Args:
+        stream: Arquivo binário (upload ou arquivo local)
+        import_format: 'csv', 'xlsx' ou 'json' (array ou NDJSON)
+
+    Returns:
+        Iterador de (linha do arquivo, {campo: valor})
+
+    Raises:
+        ImportValidationError: Formato desconhecido ou colunas obrigatórias ausentes
+    """
+    readers = {'csv': _read_csv, 'xlsx': _read_xlsx, 'json': _read_json}
+    if import_format not in readers:
+        raise ImportValidationError([(0, f"Formato inválido: {import_format}. Use {', '.join(IMPORT_FORMATS)}")], 1, 0)
+    return readers[import_format](stream)
+
+
+def _parse_amount(value: Any) -> Decimal:
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        amount = Decimal(str(value))
+    else:
+        text = str(value or '').strip().replace('R$', '').replace(' ', '')
+        if ',' in text:
+            # Formato brasileiro: 1.234,56
+            text = text.replace('.', '').replace(',', '.')
+        elif _AMBIGUOUS_AMOUNT.fullmatch(text):
+            raise ValueError(f"valor ambíguo: {value!r} (use 1.234,00 ou 1234)")
+        try:
+            amount = Decimal(text)
+        except InvalidOperation:
+            raise ValueError(f"valor inválido: {value!r}")
+    if not amount.is_finite() or abs(amount) >= _MAX_AMOUNT:
+        raise ValueError(f"valor inválido: {value!r}")
+    return amount.quantize(Decimal('0.01'))
+
+
+def _parse_date(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value or '').strip()
+    for pattern in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(text, pattern).date()
+        except ValueError:
+            pass
+    raise ValueError(f"data inválida: {value!r} (use AAAA-MM-DD ou DD/MM/AAAA)")
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Códigos numéricos lidos do XLSX como 1234.0
+        value = int(value)
+    return str(value).strip()
+
+
+def parse_row(row: Dict[str, Any], created_by: str = '') -> Expense:
+    """
+    Lançamento (não salvo) a partir de uma linha do arquivo
+
+    Raises:
+        ValueError: Com a descrição do problema da linha
+    """
+    company_code = _text(row.get('company_code'))
+    company_name = _text(row.get('company_name'))
+    if not company_code:
+        raise ValueError('company_code vazio')
+    if len(company_code) > 50 or len(company_name) > 255:
+        raise ValueError('código ou nome da empresa muito longo')
+    if not company_name:
+        raise ValueError('company_name vazio')
+
+    return Expense(
+        company_code=company_code,
+        company_name=company_name,
+        amount=_parse_amount(row.get('amount')),
+        expense_date=_parse_date(row.get('expense_date')),
+        description=_text(row.get('description')),
+        category=_text(row.get('category'))[:100],
+        notes=_text(row.get('notes')),
+        created_by=created_by
+    )
+
+
+def import_expenses(rows: Iterable[Tuple[int, Dict[str, Any]]], created_by: str = '',
+                    chunk_size: Optional[int] = None, using: str = 'default',
+                    dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Valida e grava os lançamentos em uma só transação (tudo ou nada)
+
+    O arquivo inteiro é lido e validado antes, fora da transação, com os
+    lançamentos de cada bloco de chunk_size linhas guardados em um arquivo
+    temporário; a transação (que com BEGIN IMMEDIATE trava as outras
+    escritas) só grava os blocos com bulk_create e recalcula uma vez os
+    totais (ExpenseTotal) e o valor gasto (CompanyAdjustment) das empresas
+
+    Args:
+        rows: (linha, {campo: valor}), como em read_rows
+        created_by: Autor registrado nos lançamentos
+        chunk_size: Linhas por bloco (padrão EXPENSE_IMPORT_CHUNK_SIZE)
+        using: Banco de dados (alias do DATABASES)
+        dry_run: Só valida, sem abrir transação nem gravar
+
+    Returns:
+        {'imported': n, 'companies': {código: total}, 'rows': linhas lidas}
+
+    Raises:
+        ImportValidationError: Se alguma linha for inválida (nada é gravado)
+    """
+    chunk_size = max(1, chunk_size or getattr(settings, 'EXPENSE_IMPORT_CHUNK_SIZE', 1000))
+    errors: List[Tuple[int, str]] = []
+    error_count = 0
+    imported = 0
+    line_count = 0
+    chunk_count = 0
+    names: Dict[str, str] = {}
+
+    with tempfile.TemporaryFile() as spool:
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            line_count += len(chunk)
+
+            expenses = []
+            for line, row in chunk:
+                try:
+                    expenses.append(parse_row(row, created_by))
+                except ValueError as e:
+                    error_count += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append((line, str(e)))
+
+            # Depois do primeiro erro só valida: nada será gravado
+            if error_count or dry_run:
+                continue
+            pickle.dump(expenses, spool, pickle.HIGHEST_PROTOCOL)
+            chunk_count += 1
+
+        if error_count:
+            raise ImportValidationError(errors, error_count, line_count)
+        if dry_run:
+            logger.info(f"Importação (só validação): {line_count} linhas válidas")
+            return {'imported': 0, 'companies': {}, 'rows': line_count}
+
+        spool.seek(0)
+        with transaction.atomic(using=using):
+            for _ in range(chunk_count):
+                expenses = pickle.load(spool)
+                Expense.objects.using(using).bulk_create(expenses, batch_size=chunk_size)
+                imported += len(expenses)
+                names.update((expense.company_code, expense.company_name) for expense in expenses)
+
+            totals = ExpenseTotal.refresh(names, using=using)
+            sync_spent_values(names, totals, using=using)
+
+    logger.info(f"Importação: {imported} lançamentos de {len(names)} empresas ({line_count} linhas)")
+    return {'imported': imported, 'companies': totals, 'rows': line_count}
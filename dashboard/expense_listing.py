@@ -0,0 +1,286 @@
+"""
+Listagem de lançamentos para a API
+Paginação por cursor em (expense_date, id), projeção de campos com .values(),
+filtros por empresa, período e valor e resposta em fluxo (JSON/NDJSON)
+"""
+
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+import base64
+import binascii
+import itertools
+import json
+
+from django.conf import settings
+from django.db.models import Q
+
+from .api_errors import ListingError
+from .models import Expense
+
+# Campos disponíveis em ?fields= (na ordem da resposta)
+EXPENSE_FIELDS = (
+    'id', 'company_code', 'company_name', 'description', 'amount', 'expense_date',
+    'category', 'notes', 'created_by', 'created_at', 'updated_at'
+)
+
+# Do mais recente ao mais antigo; o id desempata lançamentos da mesma data
+ORDERING = ('-expense_date', '-id')
+
+# Formatos de ?stream=: um array JSON ou um objeto JSON por linha
+STREAM_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+# Bytes acumulados antes de cada envio ao cliente
+STREAM_BUFFER_BYTES = 64 * 1024
+
+
+def _format(field: str, value: Any) -> Any:
+    """Valor de um campo no formato JSON da API"""
+    if value is None:
+        return None
+    if field == 'amount':
+        return float(value)
+    if field == 'expense_date':
+        return value.strftime('%Y-%m-%d')
+    if field in ('created_at', 'updated_at'):
+        return value.isoformat()
+    return value
+
+
+def serialize_row(fields: Sequence[str], row: Sequence[Any]) -> Dict[str, Any]:
+    """Dicionário da API a partir de uma linha de values_list(*fields)"""
+    return {field: _format(field, value) for field, value in zip(fields, row)}
+
+
+def parse_fields(raw: Optional[str]) -> Tuple[str, ...]:
+    """
+    Campos pedidos em ?fields= (vírgulas)
+
+    Raises:
+        ListingError: Se algum campo não existir
+    """
+    if not raw:
+        return EXPENSE_FIELDS
+    fields = tuple(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in EXPENSE_FIELDS]
+    if unknown or not fields:
+        raise ListingError(f"Campos inválidos: {', '.join(unknown) or raw}. Use {', '.join(EXPENSE_FIELDS)}")
+    return fields
+
+
+def encode_cursor(expense_date: date, expense_id: int) -> str:
+    """Cursor opaco da posição (data, id) do último lançamento devolvido"""
+    raw = f"{expense_date.isoformat()}:{expense_id}".encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[date, int]:
+    """
+    Posição (data, id) de um cursor
+
+    Raises:
+        ListingError: Se o cursor não for válido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        day, expense_id = raw.split(':')
+        return date.fromisoformat(day), int(expense_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ListingError('Cursor inválido')
+
+
+def _parse_date(params, name: str) -> Optional[date]:
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ListingError(f"Data inválida em {name}: {value} (use AAAA-MM-DD)")
+
+
+def _parse_amount(params, name: str) -> Optional[Decimal]:
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ListingError(f"Valor inválido em {name}: {value}")
+    # NaN e Infinity são aceitos por Decimal, mas não são valores comparáveis no banco
+    if not amount.is_finite():
+        raise ListingError(f"Valor inválido em {name}: {value}")
+    return amount
+
+
+def filtered_queryset(params):
+    """
+    Lançamentos filtrados pelos parâmetros da requisição, do mais recente ao mais antigo
+
+    Args:
+        params: QueryDict (company_code, date_from, date_to, amount_min, amount_max)
+
+    Raises:
+        ListingError: Se algum filtro for inválido
+    """
+    queryset = Expense.objects.order_by(*ORDERING)
+
+    company_code = params.get('company_code')
+    if company_code:
+        queryset = queryset.filter(company_code=company_code)
+
+    filters = {
+        'expense_date__gte': _parse_date(params, 'date_from'),
+        'expense_date__lte': _parse_date(params, 'date_to'),
+        'amount__gte': _parse_amount(params, 'amount_min'),
+        'amount__lte': _parse_amount(params, 'amount_max'),
+    }
+    return queryset.filter(**{lookup: value for lookup, value in filters.items() if value is not None})
+
+
+def parse_limit(params) -> int:
+    """Tamanho da página (?limit=), limitado a EXPENSES_MAX_PAGE_SIZE"""
+    default = getattr(settings, 'EXPENSES_PAGE_SIZE', 100)
+    maximum = getattr(settings, 'EXPENSES_MAX_PAGE_SIZE', 1000)
+    try:
+        limit = int(params.get('limit') or default)
+    except ValueError:
+        raise ListingError(f"limit inválido: {params.get('limit')}")
+    if limit < 1:
+        raise ListingError('limit deve ser maior que zero')
+    return min(limit, maximum)
+
+
+def after_cursor(queryset, cursor: str):
+    """
+    Lançamentos depois da posição do cursor, na ordem de ORDERING
+
+    (data, id) < (data do cursor, id do cursor), escrito como faixa de datas
+    para que o SQLite percorra o índice (company_code, expense_date, id) a
+    partir da posição, sem OFFSET
+
+    Raises:
+        ListingError: Se o cursor não for válido
+    """
+    last_date, last_id = decode_cursor(cursor)
+    return queryset.filter(expense_date__lte=last_date).exclude(Q(expense_date=last_date) & Q(id__gte=last_id))
+
+
+def page(params) -> Dict[str, Any]:
+    """
+    Uma página de lançamentos
+
+    Args:
+        params: QueryDict da requisição (filtros, fields, limit, cursor)
+
+    Returns:
+        {'results': [...], 'next_cursor': cursor da próxima página ou None, 'limit': n}
+
+    Raises:
+        ListingError: Se algum parâmetro for inválido
+    """
+    fields = parse_fields(params.get('fields'))
+    limit = parse_limit(params)
+    queryset = filtered_queryset(params)
+
+    cursor = params.get('cursor')
+    if cursor:
+        queryset = after_cursor(queryset, cursor)
+
+    # Data e id sempre lidos para montar o cursor; uma linha a mais indica se há próxima página
+    rows = list(queryset.values_list(*fields, 'expense_date', 'id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    results: List[Dict[str, Any]] = [serialize_row(fields, row) for row in rows]
+    next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1]) if has_more else None
+    return {'results': results, 'next_cursor': next_cursor, 'limit': limit}
+
+
+def stream(params, stream_format: str) -> Iterator[bytes]:
+    """
+    Todos os lançamentos filtrados, serializados aos poucos
+
+    Os parâmetros são validados antes do primeiro byte; as linhas são lidas do
+    banco em blocos (.iterator) e nunca ficam todas em memória
+
+    Args:
+        params: QueryDict da requisição (filtros, fields e cursor opcional)
+        stream_format: 'json' (array) ou 'ndjson' (um objeto por linha)
+
+    Raises:
+        ListingError: Se algum parâmetro for inválido
+    """
+    if stream_format not in STREAM_FORMATS:
+        raise ListingError(f"Formato inválido: {stream_format}. Use {', '.join(STREAM_FORMATS)}")
+    fields = parse_fields(params.get('fields'))
+    queryset = filtered_queryset(params)
+    cursor = params.get('cursor')
+    if cursor:
+        queryset = after_cursor(queryset, cursor)
+
+    chunk_size = getattr(settings, 'EXPENSES_STREAM_CHUNK_SIZE', 2000)
+    return _serialize(queryset.values_list(*fields).iterator(chunk_size=chunk_size), fields, stream_format)
+
+
+def _serialize(rows, fields: Sequence[str], stream_format: str) -> Iterator[bytes]:
+    """Gera o conteúdo em blocos de até STREAM_BUFFER_BYTES"""
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    if stream_format == 'json':
+        opening, separator, closing = '[', ',', ']'
+    else:
+        opening, separator, closing = '', '\n', '\n'
+
+    # O início do array sai logo: o cliente recebe o primeiro byte antes da consulta terminar
+    if opening:
+        yield opening.encode('utf-8')
+
+    buffer: List[str] = []
+    size = 0
+    first = True
+    for row in rows:
+        item = encoder.encode(serialize_row(fields, row))
+        if first:
+            first = False
+            if not opening:
+                # NDJSON: a primeira linha também sai sem esperar o buffer
+                yield item.encode('utf-8')
+                continue
+        else:
+            item = separator + item
+        buffer.append(item)
+        size += len(item)
+        if size >= STREAM_BUFFER_BYTES:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+
+    if not first or opening:
+        buffer.append(closing)
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+async def aiterate(iterator: Iterator[bytes], batch: int = 16) -> AsyncIterator[bytes]:
+    """
+    Consome um gerador síncrono (que acessa o banco) a partir do ASGI
+
+    O StreamingHttpResponse do Django junta um iterador síncrono inteiro em
+    memória antes de enviá-lo pelo ASGI; aqui cada lote é lido na thread
+    síncrona do Django (a mesma conexão com o banco) e enviado em seguida
+    """
+    from asgiref.sync import sync_to_async
+
+    next_batch = sync_to_async(lambda: list(itertools.islice(iterator, batch)))
+    try:
+        while True:
+            parts = await next_batch()
+            if not parts:
+                return
+            for part in parts:
+                yield part
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close:
+            await sync_to_async(close)()
@@ -0,0 +1,173 @@
+"""
+Cache dos relatórios Excel de movimentos (/api/download/expenses/<código>)
+Cada arquivo é identificado pela empresa, pela versão dos seus lançamentos e
+pela versão do ajuste e dos valores exibidos: enquanto nada disso muda, o
+download serve o arquivo já gerado. A pasta é limitada por tamanho e idade,
+removendo primeiro os relatórios usados há mais tempo
+"""
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import CompanyAdjustment, Expense
+
+logger = logging.getLogger(__name__)
+
+# Relatórios gerenciados pela limpeza (inclui os antigos, com data e hora no nome)
+EXPORT_PATTERN = 'Movimentos_*.xlsx'
+TEMP_PREFIX = '.tmp-'
+
+_UNSAFE = re.compile(r'[^\w.-]')
+
+
+def export_version(company: Dict[str, Any]) -> str:
+    """
+    Versão do relatório da empresa
+
+    Muda quando um lançamento é incluído, alterado ou removido, quando o
+    ajuste é salvo ou quando os valores exibidos no cabeçalho (nome,
+    contrato, gasto) mudam no snapshot
+
+    Args:
+        company: Empresa do snapshot (dicionário da API)
+
+    Returns:
+        Hash curto (hexadecimal)
+    """
+    code = company['code']
+    expenses = Expense.objects.filter(company_code=code).order_by().aggregate(
+        count=Count('id'), last_id=Max('id'), updated=Max('updated_at')
+    )
+    adjustment = CompanyAdjustment.objects.filter(company_code=code).values_list('updated_at', flat=True).first()
+    parts = (
+        code, company.get('name'), company.get('contract_value'), company.get('spent_value'),
+        expenses['count'], expenses['last_id'], expenses['updated'], adjustment
+    )
+    return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=8).hexdigest()
+
+
+class ExportCache:
+    """Relatórios gerados, reaproveitados enquanto os dados da empresa não mudam"""
+
+    def __init__(self, directory: str, max_bytes: int = 200 * 1024 * 1024, max_age: float = 7 * 86400):
+        """
+        Inicializa o cache
+
+        Args:
+            directory: Pasta dos relatórios
+            max_bytes: Tamanho máximo total (os usados há mais tempo são removidos)
+            max_age: Idade máxima em segundos desde o último uso
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, company_code: str, version: str) -> Path:
+        return self.directory / f"Movimentos_{_UNSAFE.sub('_', company_code)}_{version}.xlsx"
+
+    def get_or_export(self, company: Dict[str, Any], build: Callable[[str], Optional[str]]) -> Optional[str]:
+        """
+        Caminho do relatório da empresa, gerando-o só se a versão atual não existir
+
+        Args:
+            company: Empresa do snapshot
+            build: Gera o relatório no caminho recebido (ex: ExcelExporter.export_company_expenses);
+                retorna o caminho ou None em caso de erro
+
+        Returns:
+            Caminho do relatório ou None se não foi possível gerá-lo
+        """
+        path = self.path_for(company['code'], export_version(company))
+        try:
+            # Marcar como usado recentemente (LRU pela data de modificação)
+            os.utime(path)
+            logger.info(f"Relatório reaproveitado: {path.name}")
+            return str(path)
+        except FileNotFoundError:
+            pass
+
+        # Gerado em arquivo temporário e renomeado: um download simultâneo nunca lê arquivo parcial
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=TEMP_PREFIX, suffix='.xlsx')
+        os.close(fd)
+        try:
+            if not build(tmp_path):
+                return None
+            os.replace(tmp_path, path)
+        finally:
+            self._remove(Path(tmp_path))
+
+        self.prune(keep=path)
+        return str(path)
+
+    def prune(self, keep: Optional[Path] = None) -> int:
+        """
+        Remove os relatórios sem uso há mais de max_age e, acima de max_bytes,
+        os usados há mais tempo
+
+        Args:
+            keep: Relatório que não deve ser removido (o recém-gerado)
+
+        Returns:
+            Número de arquivos removidos
+        """
+        now = time.time()
+        entries = []
+        removed = 0
+        for path in self.directory.glob(EXPORT_PATTERN):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path != keep and now - stat.st_mtime > self.max_age:
+                self._remove(path)
+                removed += 1
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        # Temporários de gerações interrompidas
+        for path in self.directory.glob(f'{TEMP_PREFIX}*'):
+            try:
+                if now - path.stat().st_mtime > self.max_age:
+                    self._remove(path)
+            except OSError:
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            total -= size
+            removed += 1
+
+        if removed:
+            logger.info(f"Relatórios removidos: {removed} ({total / 1024 / 1024:.1f} MB mantidos)")
+        return removed
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def get_export_cache() -> ExportCache:
+    """Cache de relatórios configurado em settings"""
+    return ExportCache(
+        getattr(settings, 'EXPORT_CACHE_DIR', settings.MEDIA_ROOT),
+        max_bytes=getattr(settings, 'EXPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024),
+        max_age=getattr(settings, 'EXPORT_CACHE_MAX_AGE_DAYS', 7) * 86400
+    )
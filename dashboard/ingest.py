@@ -0,0 +1,358 @@
+"""
+Serviço de ingestão do Excel
+Monitora a pasta, processa os arquivos e publica os dados para os processos
+web. Só um processo (o líder) executa o serviço: o comando run_ingestor ou,
+em desenvolvimento, o próprio runserver
+"""
+
+from datetime import datetime
+from typing import Optional
+import logging
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def get_snapshot_store():
+    """Store onde o líder publica os dados lidos pelos processos web"""
+    from .utils.snapshot_store import SnapshotStore
+    return SnapshotStore(getattr(settings, 'SNAPSHOT_DB', settings.BASE_DIR / 'cache' / 'snapshot.sqlite3'))
+
+
+def get_leader_lock():
+    """Trava que elege o único processo que monitora e processa o Excel"""
+    from .utils.leader import LeaderLock
+    return LeaderLock(getattr(settings, 'INGEST_LOCK_FILE', settings.BASE_DIR / 'cache' / 'ingestor.lock'))
+
+
+def broadcast(snapshot) -> None:
+    """Avisa os clientes WebSocket deste processo da nova versão (cada um recebe os bytes já serializados no snapshot)"""
+    from channels.layers import get_channel_layer
+    from asgiref.sync import async_to_sync
+
+    channel_layer = get_channel_layer()
+    if channel_layer:
+        async_to_sync(channel_layer.group_send)(
+            "dashboard",
+            {
+                "type": "dashboard_update",
+                "version": snapshot.version
+            }
+        )
+
+
+# Só serializa quem publica; quem lê usa views.current_snapshot sem trava
+_swap_lock = threading.Lock()
+
+# Tentativas de publish_spent_values quando outra versão é publicada no meio
+PUBLISH_ATTEMPTS = 5
+
+
+def apply_snapshot(snapshot) -> bool:
+    """
+    Troca o snapshot deste processo e notifica os clientes WebSocket
+
+    Args:
+        snapshot: Snapshot completo, montado à parte
+
+    Returns:
+        False se a versão não é mais nova que a atual (ex: já publicada por este processo)
+    """
+    from . import views
+
+    # Conteúdo serializado e comprimido fora da trava, antes de a versão ficar visível
+    snapshot.prepare()
+    with _swap_lock:
+        if snapshot.version <= views.current_snapshot.version:
+            return False
+        views.current_snapshot = snapshot
+    broadcast(snapshot)
+    return True
+
+
+def publish_table(store, table, file_path: Optional[str], expected_version: Optional[int] = None):
+    """
+    Publica a tabela (já com ajustes) como um novo snapshot e notifica os clientes
+
+    Args:
+        store: SnapshotStore compartilhado com os outros processos
+        table: CompanyTable a publicar
+        file_path: Arquivo ou pasta de origem
+        expected_version: Versão publicada da qual a tabela foi derivada (ver SnapshotStore.publish)
+
+    Returns:
+        O Snapshot publicado
+
+    Raises:
+        VersionConflict: Se outra versão foi publicada depois de expected_version
+    """
+    from .utils.snapshot import Snapshot
+    from .utils.snapshot_store import VersionConflict
+    from . import views
+
+    # Dicionários por empresa só na borda da API
+    data = {
+        'companies': table.to_dicts(),
+        'statistics': table.statistics(),
+        'last_update': datetime.now().isoformat(),
+        'file_path': file_path
+    }
+
+    def build(version: int, payload: Optional[bytes]):
+        return Snapshot(version, data['companies'], data['statistics'], file_path, data['last_update'], payload)
+
+    prepared = []
+
+    def encode(version: int, payload: bytes):
+        # Formatos e compressões montados só aqui e publicados junto com o JSON
+        prepared.append(build(version, payload).prepare())
+        return prepared[-1].encodings()
+
+    # Publicar para os processos web (serializado uma só vez)
+    try:
+        store.publish(data, expected_version, encode=encode)
+        snapshot = prepared[-1]
+    except VersionConflict:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao publicar dados: {e}")
+        snapshot = build(views.current_snapshot.version + 1, None)
+
+    apply_snapshot(snapshot)
+    return snapshot
+
+
+def publish_spent_values(spent_values) -> bool:
+    """
+    Publica uma versão com o valor gasto atualizado das empresas informadas
+
+    Usado depois de alterações em lote nos lançamentos: uma só versão (e uma
+    só mensagem WebSocket) para todas as empresas, sem reprocessar o Excel
+
+    Args:
+        spent_values: {código: valor gasto}; códigos fora do painel são ignorados
+
+    Returns:
+        True se uma nova versão foi publicada
+    """
+    from .utils.company_table import CompanyTable
+    from .utils.snapshot import Snapshot
+    from .utils.snapshot_store import VersionConflict
+    from . import views
+
+    store = get_snapshot_store()
+    for attempt in range(PUBLISH_ATTEMPTS):
+        # Partir da versão mais nova publicada por qualquer processo (também
+        # fora do servidor web, como no comando import_expenses)
+        snapshot = views.current_snapshot
+        loaded = store.load()
+        base_version = loaded[0] if loaded else 0
+        if loaded and loaded[0] > snapshot.version:
+            snapshot = Snapshot.from_payload(loaded[1])
+        table = CompanyTable.from_dicts(snapshot.companies)
+        rows = [(table.index_of(code), value) for code, value in spent_values.items()]
+        rows = [(row, value) for row, value in rows if row is not None]
+        if not rows:
+            return False
+
+        for row, value in rows:
+            table.set_spent(row, float(value))
+        try:
+            # Só publica se ninguém publicou desde a leitura (ex: um workbook novo);
+            # senão os valores são aplicados de novo sobre a versão mais nova
+            publish_table(store, table, snapshot.file_path, expected_version=base_version)
+        except VersionConflict as e:
+            logger.info(f"Valor gasto: {e}, aplicando de novo")
+            continue
+        logger.info(f"Valor gasto atualizado: {len(rows)} empresas")
+        return True
+
+    logger.warning(f"Valor gasto não publicado após {PUBLISH_ATTEMPTS} tentativas (publicações concorrentes)")
+    return False
+
+
+class IngestService:
+    """Monitor de arquivos, agendador e processamento do Excel"""
+
+    def __init__(self):
+        from .utils.file_monitor import FileMonitor
+        from .utils.excel_processor import ExcelProcessor
+        from .utils.excel_schema import WorkbookSchema
+        from .utils.folder_ingest import FolderIngestor
+        from .utils.ingest_scheduler import IngestScheduler
+        from .utils.parse_cache import ParseCache
+
+        self.processor = ExcelProcessor(
+            mode=getattr(settings, 'EXCEL_INGEST_MODE', 'full'),
+            profile=getattr(settings, 'EXCEL_INGEST_PROFILE', False),
+            workers=getattr(settings, 'EXCEL_INGEST_WORKERS', None)
+        )
+        self.cache = None
+        if getattr(settings, 'PARSE_CACHE_ENABLED', True):
+            # Um esquema diferente (EXCEL_SCHEMA) não reaproveita tabelas lidas com o anterior
+            self.cache = ParseCache(
+                settings.PARSE_CACHE_DIR,
+                getattr(settings, 'PARSE_CACHE_MAX_BYTES', 100 * 1024 * 1024),
+                variant=WorkbookSchema.from_settings().fingerprint()
+            )
+        watch_mode = getattr(settings, 'WATCH_MODE', 'latest')
+        self.monitor = FileMonitor(
+            settings.WATCH_FOLDER,
+            settings.EXCEL_PATTERN,
+            settings.CHECK_INTERVAL,
+            mode=watch_mode,
+            backend=getattr(settings, 'FILE_MONITOR_BACKEND', 'auto'),
+            rescan_interval=getattr(settings, 'FILE_MONITOR_RESCAN_INTERVAL', 60)
+        )
+        # Modo 'all': uma tabela por arquivo da pasta, combinadas em um só painel
+        self.folder = None
+        if watch_mode == 'all':
+            self.folder = FolderIngestor(
+                mode=getattr(settings, 'EXCEL_INGEST_MODE', 'full'),
+                workers=getattr(settings, 'EXCEL_INGEST_WORKERS', None),
+                cache=self.cache
+            )
+        self.store = get_snapshot_store()
+        self.scheduler = IngestScheduler(
+            self.ingest_folder if self.folder else self.ingest_file,
+            debounce=getattr(settings, 'INGEST_DEBOUNCE_SECONDS', 0.5),
+            max_pending=getattr(settings, 'INGEST_QUEUE_SIZE', 16),
+            merge=self.merge_folder_events if self.folder else None
+        )
+
+    def publish(self, table, file_path: str) -> None:
+        """Aplica ajustes, publica um novo snapshot e notifica os clientes"""
+        from . import views
+
+        # Aplicar ajustes do banco de dados
+        table = views.apply_adjustments_to_companies(table)
+        publish_table(self.store, table, file_path)
+
+        logger.info(f"Dados atualizados: {len(table)} empresas")
+
+    def ingest_file(self, file_path: str, cancel) -> None:
+        """Processa um arquivo (executado pelo agendador, fora da thread do monitor)"""
+        logger.info(f"Processando arquivo: {file_path}")
+
+        # Processar arquivo (ou reaproveitar o snapshot do mesmo conteúdo)
+        parse = lambda path: self.processor.process_table(path, cancel=cancel)
+        if self.cache:
+            table = self.cache.get_or_parse(file_path, parse)
+        else:
+            table = parse(file_path)
+
+        # Não publicar uma versão que já foi substituída
+        cancel.check()
+        self.publish(table, file_path)
+
+    def ingest_folder(self, payload, cancel) -> None:
+        """Processa os arquivos alterados e removidos da pasta (modo 'all')"""
+        changed, removed = payload
+        logger.info(f"Processando pasta: {len(changed)} alterado(s), {len(removed)} removido(s)")
+
+        # Só os arquivos alterados são processados; a tabela combinada é atualizada.
+        # Cancelado, o lote volta para a fila junto com os eventos mais novos
+        table = self.folder.update(changed, removed, cancel=cancel)
+
+        # Não publicar uma versão que já foi substituída
+        cancel.check()
+        self.publish(table, str(self.monitor.folder_path))
+
+    @staticmethod
+    def merge_folder_events(pending, new):
+        """Combina eventos da pasta ainda não processados (o evento mais novo prevalece)"""
+        changed = (set(pending[0]) - set(new[1])) | set(new[0])
+        removed = (set(pending[1]) - set(new[0])) | set(new[1])
+        return sorted(changed), sorted(removed)
+
+    def on_file_changed(self, file_path: str) -> None:
+        """Callback quando arquivo é detectado/modificado"""
+        # Uma só chave: o arquivo mais novo substitui o pendente e cancela o em andamento
+        self.scheduler.submit('latest', file_path)
+
+    def on_folder_changed(self, changed, removed) -> None:
+        """Callback do modo 'all' com os arquivos alterados e removidos da pasta"""
+        self.scheduler.submit('folder', (changed, removed))
+
+    def start(self) -> bool:
+        """
+        Publica o último snapshot gravado e inicia o agendador e o monitor
+
+        Returns:
+            True se o monitor foi iniciado
+        """
+        from . import views
+
+        try:
+            # No modo 'all' o snapshot de um só arquivo não representa a pasta;
+            # a primeira varredura reaproveita o cache de cada arquivo
+            snapshot = self.cache.load_latest() if self.cache and not self.folder else None
+            if snapshot:
+                logger.info(f"Restaurando último snapshot: {snapshot['file_path']}")
+                self.publish(snapshot['table'], snapshot['file_path'])
+        except Exception as e:
+            logger.error(f"Erro ao restaurar snapshot: {e}")
+
+        views.ingest_scheduler = self.scheduler
+        self.scheduler.start()
+        if self.monitor.start(self.on_folder_changed if self.folder else self.on_file_changed):
+            logger.info("Monitor de arquivo iniciado")
+            return True
+        logger.warning("Falha ao iniciar monitor de arquivo")
+        return False
+
+    def stop(self) -> None:
+        """Para o monitor, o agendador e os pools de processos"""
+        self.monitor.stop()
+        self.scheduler.stop()
+        if self.folder:
+            self.folder.shutdown()
+        parallel = getattr(self.processor, 'parallel', None)
+        if parallel:
+            parallel.shutdown()
+
+
+_follower: Optional[object] = None
+
+
+def start_snapshot_follower():
+    """
+    Acompanha os dados publicados pelo líder (um por processo web)
+
+    Returns:
+        O SnapshotFollower iniciado
+    """
+    global _follower
+    if _follower is not None:
+        return _follower
+
+    from .utils.snapshot_store import SnapshotFollower
+    from .utils.snapshot import Snapshot
+    from . import views
+
+    store = get_snapshot_store()
+
+    def on_update(version: int, payload: bytes) -> None:
+        # Versões publicadas por este mesmo processo (ingestão embutida) já estão em uso
+        if version <= views.current_snapshot.version:
+            return
+        # Formatos e compressões vêm prontos do store: só o índice é montado aqui
+        snapshot = Snapshot.from_payload(payload, store.load_encodings(version))
+        if apply_snapshot(snapshot):
+            logger.info(f"Dados publicados carregados: versão {version}")
+
+    _follower = SnapshotFollower(store, on_update, getattr(settings, 'SNAPSHOT_POLL_INTERVAL', 1))
+    _follower.start()
+    return _follower
+
+
+def refresh_snapshot() -> None:
+    """Carrega a versão publicada mais nova, se houver (verificação barata)"""
+    if _follower is None:
+        return
+    try:
+        _follower.poll()
+    except Exception as e:
+        logger.error(f"Erro ao verificar dados publicados: {e}")
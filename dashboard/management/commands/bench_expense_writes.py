@@ -0,0 +1,115 @@
+"""
+Management command para medir a vazão de inclusões de lançamentos no SQLite
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from dashboard.db import DEFAULT_SQLITE_PRAGMAS, ExpenseWriter, create_expense
+
+
+class Command(BaseCommand):
+    help = ('Mede inclusões de lançamentos por segundo com os PRAGMAs padrão do SQLite, '
+            'com os PRAGMAs ajustados e com a gravação agrupada (em bancos temporários)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writes', type=int, default=2000, help='Lançamentos incluídos por cenário')
+        parser.add_argument('--threads', type=int, default=8, help='Requisições simultâneas')
+        parser.add_argument('--companies', type=int, default=20, help='Empresas distintas nos lançamentos')
+        parser.add_argument('--window-ms', type=float, default=5, help='Janela da gravação agrupada')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('O benchmark só se aplica ao SQLite')
+
+        scenarios = [
+            ('padrão', {}, False),
+            ('pragmas', DEFAULT_SQLITE_PRAGMAS, False),
+            ('pragmas+lote', DEFAULT_SQLITE_PRAGMAS, True),
+        ]
+
+        tmpdir = Path(tempfile.mkdtemp(prefix='bench_expenses_'))
+        baseline = None
+        try:
+            self.stdout.write(f'{"cenário":<14}{"tempo (s)":>12}{"inclusões/s":>14}{"erros":>8}{"ganho":>9}')
+            for index, (name, pragmas, grouped) in enumerate(scenarios):
+                alias = f'bench_expenses_{index}'
+                self._create_database(alias, tmpdir / f'{alias}.sqlite3', pragmas)
+                try:
+                    elapsed, errors = self._run(alias, grouped, options)
+                    self._check_totals(alias)
+                finally:
+                    connections[alias].close()
+                    del connections.databases[alias]
+
+                rate = (options['writes'] - errors) / elapsed
+                baseline = baseline or rate
+                self.stdout.write(f'{name:<14}{elapsed:>12.3f}{rate:>14.0f}{errors:>8}{rate / baseline:>8.2f}x')
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    @staticmethod
+    def _create_database(alias, path, pragmas):
+        """Registra um banco temporário com o perfil de PRAGMAs e cria as tabelas"""
+        settings_dict = dict(connections.databases['default'])
+        settings_dict.update({'NAME': str(path), 'PRAGMAS': pragmas})
+        connections.databases[alias] = settings_dict
+        call_command('migrate', database=alias, verbosity=0)
+        connections[alias].close()
+
+    def _run(self, alias, grouped, options):
+        writer = ExpenseWriter(window=options['window_ms'] / 1000, using=alias) if grouped else None
+        companies = max(1, options['companies'])
+
+        def write(number):
+            fields = {
+                'company_code': f'{number % companies:04d}',
+                'company_name': f'Empresa {number % companies}',
+                'description': f'Lançamento {number}',
+                'amount': Decimal('10.50'),
+                'expense_date': date(2024, 1, 1 + number % 28),
+                'created_by': 'bench',
+            }
+            try:
+                if writer:
+                    writer.write(**fields)
+                else:
+                    create_expense(using=alias, **fields)
+                return 0
+            except Exception as e:
+                self.stderr.write(f'Erro na inclusão {number}: {e}')
+                return 1
+            finally:
+                # Como ao fim de uma requisição (CONN_MAX_AGE = 0)
+                if not writer:
+                    connections[alias].close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, options['threads'])) as pool:
+            errors = sum(pool.map(write, range(options['writes'])))
+        elapsed = time.perf_counter() - start
+        if writer:
+            writer.stop()
+        return elapsed, errors
+
+    @staticmethod
+    def _check_totals(alias):
+        """Os totais materializados devem bater com os lançamentos gravados"""
+        from dashboard.models import ExpenseTotal
+
+        expected = ExpenseTotal.aggregate_expenses(using=alias)
+        stored = {
+            total.company_code: (total.total, total.count, total.last_expense_date)
+            for total in ExpenseTotal.objects.using(alias)
+        }
+        if stored != expected:
+            raise CommandError(f'Totais divergentes no cenário {alias}')
@@ -0,0 +1,78 @@
+"""
+Management command para medir a escalabilidade da ingestão do Excel
+"""
+
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.utils.excel_processor import ExcelProcessor
+
+
+class Command(BaseCommand):
+    help = 'Mede o tempo de ingestão de um arquivo Excel nos modos seriais e no modo paralelo com 1..N processos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file_path', help='Arquivo Excel (.xlsx/.xlsm) a processar')
+        parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1,
+                            help='Maior número de processos testado no modo paralelo')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Execuções por configuração (vale o melhor tempo)')
+        parser.add_argument('--with-full', action='store_true',
+                            help='Incluir o modo full (carrega o workbook inteiro)')
+
+    def handle(self, *args, **options):
+        file_path = options['file_path']
+        if not os.path.exists(file_path):
+            raise CommandError(f'Arquivo não encontrado: {file_path}')
+
+        serial_modes = ['streaming', 'xml']
+        if options['with_full']:
+            serial_modes.insert(0, 'full')
+
+        reference = None
+        baseline = None
+
+        self.stdout.write(f'{"modo":<14}{"processos":>10}{"tempo (s)":>12}{"linhas/s":>14}{"ganho":>9}')
+
+        for mode in serial_modes:
+            processor = ExcelProcessor(mode=mode)
+            elapsed, result = self._measure(processor, file_path, options['repeat'])
+            if reference is None:
+                reference = result
+            elif result != reference:
+                raise CommandError(f'Resultado do modo {mode} difere do modo {serial_modes[0]}')
+            if mode == 'xml':
+                baseline = elapsed
+            self._report(mode, 1, elapsed, processor, baseline)
+
+        for workers in range(1, options['max_workers'] + 1):
+            processor = ExcelProcessor(mode='parallel', workers=workers)
+            try:
+                # Primeira execução só aquece o pool de processos
+                processor.process_file(file_path)
+                elapsed, result = self._measure(processor, file_path, options['repeat'])
+            finally:
+                processor.parallel.shutdown()
+
+            if result != reference:
+                raise CommandError(f'Resultado do modo paralelo ({workers} processos) difere do serial')
+            self._report('parallel', workers, elapsed, processor, baseline)
+
+        self.stdout.write(self.style.SUCCESS('Todos os modos produziram o mesmo resultado'))
+
+    @staticmethod
+    def _measure(processor, file_path, repeat):
+        best = None
+        result = None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            result = processor.process_file(file_path)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def _report(self, mode, workers, elapsed, processor, baseline):
+        rows = processor.last_stats.get('rows', 0)
+        speedup = f'{baseline / elapsed:.2f}x' if baseline else '-'
+        self.stdout.write(f'{mode:<14}{workers:>10}{elapsed:>12.3f}{rows / elapsed:>14.0f}{speedup:>9}')
@@ -0,0 +1,89 @@
+"""
+Management command que mostra o plano (EXPLAIN QUERY PLAN) das consultas mais frequentes
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Max, Sum
+from dashboard import expense_listing
+from dashboard.models import CompanyAdjustment, Expense, ExpenseTotal
+
+
+def hot_queries(company_code):
+    """
+    Consultas executadas pelas views e pela manutenção dos totais
+
+    Returns:
+        Lista de (nome, queryset, lê a tabela inteira de propósito)
+    """
+    return [
+        # get_expenses / download_expenses
+        ('lançamentos da empresa', Expense.objects.filter(company_code=company_code).order_by('-expense_date'), False),
+        ('todos os lançamentos', Expense.objects.all().order_by('-expense_date'), True),
+        # /api/expenses paginado: página seguinte a um cursor
+        ('página de lançamentos da empresa',
+         expense_listing.after_cursor(expense_listing.filtered_queryset({}).filter(company_code=company_code),
+                                      expense_listing.encode_cursor(date.today(), 1))[:100], False),
+        # ExpenseTotal.discard: data do último lançamento restante
+        ('último lançamento da empresa',
+         Expense.objects.filter(company_code=company_code).order_by().values('company_code')
+         .annotate(last=Max('expense_date')), False),
+        # rebuild_expense_totals
+        ('totais por empresa (recalcular)',
+         Expense.objects.order_by().values('company_code')
+         .annotate(total=Sum('amount'), count=Count('id'), last=Max('expense_date')), True),
+        # add_expense / delete_expense
+        ('total da empresa', ExpenseTotal.objects.filter(company_code=company_code).values_list('total', flat=True),
+         False),
+        # apply_adjustments_to_companies
+        ('totais de todas as empresas', ExpenseTotal.objects.order_by().values_list('company_code', 'total'), True),
+        ('ajustes', CompanyAdjustment.objects.order_by().values_list('company_code', 'contract_value', 'spent_value'),
+         True),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Mostra o plano de execução das consultas mais frequentes para conferir o uso dos índices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company-code',
+                            help='Código usado nas consultas por empresa (padrão: o de mais lançamentos)')
+        parser.add_argument('--sql', action='store_true', help='Mostrar também o SQL de cada consulta')
+
+    def handle(self, *args, **options):
+        company_code = options['company_code'] or self._busiest_company()
+
+        warnings = 0
+        for name, queryset, full_read in hot_queries(company_code):
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            if options['sql']:
+                self.stdout.write(f'  {queryset.query}')
+            for line in plan.splitlines():
+                self.stdout.write(f'  {line}')
+
+            # No SQLite: varredura da tabela (exceto nas leituras completas)
+            # ou ordenação fora do índice
+            problems = [line.strip() for line in plan.splitlines() if self._is_problem(line, full_read)]
+            if problems and connection.vendor == 'sqlite':
+                warnings += 1
+                self.stdout.write(self.style.WARNING(f'  sem índice: {"; ".join(problems)}'))
+
+        if warnings:
+            self.stdout.write(self.style.WARNING(f'{warnings} consulta(s) sem uso de índice'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Nenhuma consulta sem índice'))
+
+    @staticmethod
+    def _busiest_company():
+        row = Expense.objects.order_by().values('company_code').annotate(n=Count('id')).order_by('-n').first()
+        return row['company_code'] if row else ''
+
+    @staticmethod
+    def _is_problem(line, full_read):
+        line = line.upper()
+        if 'USE TEMP B-TREE' in line:
+            return True
+        return not full_read and 'SCAN' in line
@@ -0,0 +1,59 @@
+"""
+Management command para importar lançamentos em lote (CSV, XLSX ou JSON)
+"""
+
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import expense_import
+from dashboard.ingest import publish_spent_values
+
+
+class Command(BaseCommand):
+    help = ('Importa lançamentos de um arquivo CSV, XLSX ou JSON/NDJSON em uma só transação '
+            '(nada é gravado se alguma linha for inválida)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('file_path', help='Arquivo com os lançamentos')
+        parser.add_argument('--format', choices=expense_import.IMPORT_FORMATS,
+                            help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--created-by', default='importação', help='Autor registrado nos lançamentos')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Linhas validadas e gravadas por bloco (padrão: EXPENSE_IMPORT_CHUNK_SIZE)')
+        parser.add_argument('--dry-run', action='store_true', help='Só valida o arquivo, sem gravar')
+
+    def handle(self, *args, **options):
+        file_path = options['file_path']
+        if not os.path.exists(file_path):
+            raise CommandError(f'Arquivo não encontrado: {file_path}')
+
+        start = time.perf_counter()
+        try:
+            import_format = options['format'] or expense_import.detect_format(file_path)
+            with open(file_path, 'rb') as stream:
+                result = expense_import.import_expenses(
+                    expense_import.read_rows(stream, import_format),
+                    created_by=options['created_by'],
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run']
+                )
+        except expense_import.ImportValidationError as e:
+            for line, message in e.errors:
+                self.stderr.write(f'Linha {line}: {message}')
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Arquivo válido: {result["rows"]} linha(s)'))
+            return
+
+        # Uma só versão do painel para todas as empresas importadas
+        if result['companies'] and publish_spent_values(result['companies']):
+            self.stdout.write('Painel atualizado com os novos valores gastos')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{result["imported"]} lançamento(s) de {len(result["companies"])} empresa(s) '
+            f'importado(s) em {elapsed:.2f}s'
+        ))
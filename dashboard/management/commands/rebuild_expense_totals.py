@@ -0,0 +1,46 @@
+"""
+Management command para conferir e recalcular os totais de lançamentos por empresa
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.models import ExpenseTotal
+
+
+class Command(BaseCommand):
+    help = 'Confere a tabela de totais de lançamentos (ExpenseTotal) com os lançamentos e a recalcula'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Só conferir: lista as diferenças e termina com erro se houver alguma')
+
+    def handle(self, *args, **options):
+        expected = ExpenseTotal.aggregate_expenses()
+        stored = {
+            total.company_code: (total.total, total.count, total.last_expense_date)
+            for total in ExpenseTotal.objects.all()
+        }
+
+        differences = []
+        for code in sorted(set(expected) | set(stored)):
+            want = expected.get(code, (0, 0, None))
+            have = stored.get(code, (0, 0, None))
+            # Valores comparados em centavos (o SQLite soma decimais como ponto flutuante)
+            if (round(want[0] or 0, 2), want[1], want[2]) != (round(have[0] or 0, 2), have[1], have[2]):
+                differences.append((code, have, want))
+
+        for code, have, want in differences:
+            self.stdout.write(
+                f'{code}: armazenado total={have[0]} lançamentos={have[1]} último={have[2]}; '
+                f'esperado total={want[0]} lançamentos={want[1]} último={want[2]}'
+            )
+
+        if options['check']:
+            if differences:
+                raise CommandError(f'{len(differences)} empresa(s) com totais divergentes')
+            self.stdout.write(self.style.SUCCESS(f'Totais conferidos: {len(expected)} empresa(s)'))
+            return
+
+        companies = ExpenseTotal.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Totais recalculados: {companies} empresa(s), {len(differences)} corrigida(s)'
+        ))
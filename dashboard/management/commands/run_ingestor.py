@@ -0,0 +1,46 @@
+"""
+Management command que monitora e processa o Excel fora dos processos web
+Vários ingestores podem ser iniciados: só o que obtém a trava processa, os
+demais aguardam em espera e assumem se o líder parar
+"""
+
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from dashboard.ingest import IngestService, get_leader_lock
+from dashboard.utils.leader import LeaderLock
+
+
+class Command(BaseCommand):
+    help = 'Monitora a pasta do Excel e publica os dados para os processos web (um só líder por máquina)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lock-file', help='Arquivo da trava de liderança (padrão: INGEST_LOCK_FILE)')
+        parser.add_argument('--standby-interval', type=float, default=5,
+                            help='Segundos entre as tentativas de assumir a liderança')
+
+    def handle(self, *args, **options):
+        lock = LeaderLock(options['lock_file']) if options['lock_file'] else get_leader_lock()
+
+        stopping = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stopping.set())
+
+        if not lock.acquire():
+            holder = lock.holder() or {}
+            self.stdout.write(f'Em espera: líder atual pid {holder.get("pid")} em {holder.get("host")}')
+            while not stopping.is_set() and not lock.acquire():
+                stopping.wait(options['standby_interval'])
+            if stopping.is_set():
+                return
+
+        self.stdout.write(self.style.SUCCESS(f'Líder da ingestão ({lock.path})'))
+        service = IngestService()
+        try:
+            service.start()
+            stopping.wait()
+        finally:
+            self.stdout.write('Encerrando ingestão...')
+            service.stop()
+            lock.release()
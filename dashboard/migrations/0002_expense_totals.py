@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:18
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def populate_expense_totals(apps, schema_editor):
+    """Totais dos lançamentos já existentes"""
+    Expense = apps.get_model('dashboard', 'Expense')
+    ExpenseTotal = apps.get_model('dashboard', 'ExpenseTotal')
+    db_alias = schema_editor.connection.alias
+    rows = Expense.objects.using(db_alias).order_by().values('company_code').annotate(
+        total=Sum('amount'), count=Count('id'), last=Max('expense_date')
+    )
+    ExpenseTotal.objects.using(db_alias).bulk_create([
+        ExpenseTotal(company_code=row['company_code'], total=row['total'], count=row['count'],
+                     last_expense_date=row['last'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('company_code', models.CharField(max_length=50, unique=True, verbose_name='Código da Empresa')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=17, verbose_name='Total Lançado')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Lançamentos')),
+                ('last_expense_date', models.DateField(blank=True, null=True, verbose_name='Último Lançamento')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')),
+            ],
+            options={
+                'verbose_name': 'Total de Lançamentos',
+                'verbose_name_plural': 'Totais de Lançamentos',
+                'db_table': 'expense_totals',
+                'ordering': ['company_code'],
+            },
+        ),
+        migrations.RunPython(populate_expense_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+# Índice de texto completo (SQLite FTS5) da descrição, observações, empresa e
+# categoria dos lançamentos, sem acentos; gatilhos o mantêm em sincronia com
+# cada inclusão, alteração e remoção (também as feitas com bulk_create)
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE expenses_fts USING fts5(
+        description, notes, company_name, category,
+        content='expenses', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER expenses_fts_insert AFTER INSERT ON expenses BEGIN
+        INSERT INTO expenses_fts(rowid, description, notes, company_name, category)
+        VALUES (new.id, new.description, new.notes, new.company_name, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER expenses_fts_delete AFTER DELETE ON expenses BEGIN
+        INSERT INTO expenses_fts(expenses_fts, rowid, description, notes, company_name, category)
+        VALUES ('delete', old.id, old.description, old.notes, old.company_name, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER expenses_fts_update AFTER UPDATE ON expenses BEGIN
+        INSERT INTO expenses_fts(expenses_fts, rowid, description, notes, company_name, category)
+        VALUES ('delete', old.id, old.description, old.notes, old.company_name, old.category);
+        INSERT INTO expenses_fts(rowid, description, notes, company_name, category)
+        VALUES (new.id, new.description, new.notes, new.company_name, new.category);
+    END
+    """,
+    # Lançamentos já existentes
+    "INSERT INTO expenses_fts(expenses_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS expenses_fts_update',
+    'DROP TRIGGER IF EXISTS expenses_fts_delete',
+    'DROP TRIGGER IF EXISTS expenses_fts_insert',
+    'DROP TABLE IF EXISTS expenses_fts',
+]
+
+
+def create_expense_search(apps, schema_editor):
+    # Em outros bancos a busca usa LIKE (ver dashboard.search)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_expense_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_expense_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_expense_search, drop_expense_search),
+    ]
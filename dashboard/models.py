@@ -1,4 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser
 import hashlib
 
@@ -35,11 +39,183 @@ class Expense(models.Model):
     class Meta:
         db_table = 'expenses'
         ordering = ['-expense_date']
+        indexes = [
+            # Lançamentos de uma empresa do mais recente ao mais antigo (e MAX(expense_date) por empresa)
+            models.Index(fields=['company_code', 'expense_date', 'id'], name='expenses_company_date_idx'),
+            # Todos os lançamentos ordenados por data
+            models.Index(fields=['expense_date'], name='expenses_date_idx'),
+        ]
         verbose_name = 'Lançamento de Gasto'
         verbose_name_plural = 'Lançamentos de Gastos'
     
     def __str__(self):
         return f"{self.company_name} - R$ {self.amount}"
+    
+    def save(self, *args, **kwargs):
+        """Salva o lançamento e atualiza os totais da empresa na mesma transação"""
+        using = kwargs.get('using') or self._state.db or 'default'
+        with transaction.atomic(using=using):
+            previous = None
+            if self.pk is not None and not self._state.adding:
+                previous = Expense.objects.using(using).filter(pk=self.pk).values_list(
+                    'company_code', 'amount', 'expense_date'
+                ).first()
+            
+            super().save(*args, **kwargs)
+            
+            if previous:
+                ExpenseTotal.discard(*previous, using=using)
+            ExpenseTotal.record(self.company_code, self.amount, self.expense_date, using=using)
+
+
+@receiver(post_delete, sender=Expense)
+def _discard_deleted_expense(sender, instance, **kwargs):
+    """Lançamento removido (também por QuerySet.delete(), na transação da remoção)"""
+    ExpenseTotal.discard(instance.company_code, instance.amount, instance.expense_date, using=kwargs.get('using'))
+
+
+class ExpenseTotal(models.Model):
+    """Totais de lançamentos por empresa, mantidos a cada inclusão, alteração e remoção"""
+    company_code = models.CharField(max_length=50, unique=True, verbose_name='Código da Empresa')
+    total = models.DecimalField(max_digits=17, decimal_places=2, default=0, verbose_name='Total Lançado')
+    count = models.PositiveIntegerField(default=0, verbose_name='Lançamentos')
+    last_expense_date = models.DateField(null=True, blank=True, verbose_name='Último Lançamento')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')
+    
+    class Meta:
+        db_table = 'expense_totals'
+        ordering = ['company_code']
+        verbose_name = 'Total de Lançamentos'
+        verbose_name_plural = 'Totais de Lançamentos'
+    
+    def __str__(self):
+        return f"{self.company_code} - R$ {self.total} ({self.count})"
+    
+    @staticmethod
+    def _normalize(amount, expense_date):
+        """Valor e data como Decimal e date (o lançamento pode ter sido criado com str/float)"""
+        return (Expense._meta.get_field('amount').to_python(amount),
+                Expense._meta.get_field('expense_date').to_python(expense_date))
+    
+    @classmethod
+    def record(cls, company_code, amount, expense_date, using='default'):
+        """Soma um lançamento ao total da empresa (F(): sem ler e regravar o valor)"""
+        amount, expense_date = cls._normalize(amount, expense_date)
+        # UPDATE antes do INSERT: a transação já começa com a trava de escrita
+        updated = cls.objects.using(using).filter(company_code=company_code).update(
+            total=F('total') + amount,
+            count=F('count') + 1,
+            last_expense_date=Greatest(Coalesce(F('last_expense_date'), Value(expense_date)), Value(expense_date))
+        )
+        if not updated:
+            cls.objects.using(using).create(
+                company_code=company_code, total=amount, count=1, last_expense_date=expense_date
+            )
+    
+    @classmethod
+    def record_many(cls, expenses, using='default'):
+        """
+        Soma vários lançamentos aos totais (um UPDATE por empresa do lote)
+
+        Args:
+            expenses: Iterável de (código, valor, data)
+        """
+        grouped = {}
+        for company_code, amount, expense_date in expenses:
+            amount, expense_date = cls._normalize(amount, expense_date)
+            total, count, last = grouped.get(company_code, (0, 0, expense_date))
+            grouped[company_code] = (total + amount, count + 1, max(last, expense_date))
+
+        for company_code, (amount, count, expense_date) in grouped.items():
+            updated = cls.objects.using(using).filter(company_code=company_code).update(
+                total=F('total') + amount,
+                count=F('count') + count,
+                last_expense_date=Greatest(Coalesce(F('last_expense_date'), Value(expense_date)), Value(expense_date))
+            )
+            if not updated:
+                cls.objects.using(using).create(
+                    company_code=company_code, total=amount, count=count, last_expense_date=expense_date
+                )
+    
+    @classmethod
+    def discard(cls, company_code, amount, expense_date, using='default'):
+        """Retira um lançamento do total da empresa"""
+        amount, expense_date = cls._normalize(amount, expense_date)
+        totals = cls.objects.using(using)
+        updated = totals.filter(company_code=company_code).update(
+            total=F('total') - amount,
+            count=F('count') - 1
+        )
+        if not updated:
+            return
+        
+        # A data mais recente só muda se o lançamento removido era o último
+        total = totals.get(company_code=company_code)
+        if total.count <= 0:
+            total.delete()
+        elif total.last_expense_date is None or total.last_expense_date <= expense_date:
+            total.last_expense_date = Expense.objects.using(using).filter(
+                company_code=company_code
+            ).aggregate(last=Max('expense_date'))['last']
+            total.save(update_fields=['last_expense_date', 'updated_at'])
+    
+    @classmethod
+    def aggregate_expenses(cls, codes=None, using='default'):
+        """
+        Totais calculados diretamente dos lançamentos
+
+        Args:
+            codes: Só estas empresas (None = todas)
+
+        Returns:
+            {código: (total, quantidade, última data)}
+        """
+        expenses = Expense.objects.using(using).order_by()
+        if codes is not None:
+            expenses = expenses.filter(company_code__in=codes)
+        rows = expenses.values('company_code').annotate(
+            total=Sum('amount'), count=Count('id'), last=Max('expense_date')
+        ).values_list('company_code', 'total', 'count', 'last')
+        return {code: (total, count, last) for code, total, count, last in rows}
+    
+    @classmethod
+    def refresh(cls, codes, using='default', batch_size=500):
+        """
+        Recalcula os totais das empresas informadas (após inclusões em lote)
+
+        Returns:
+            {código: total} das empresas recalculadas
+        """
+        codes = sorted(set(codes))
+        result = {}
+        with transaction.atomic(using=using):
+            for start in range(0, len(codes), batch_size):
+                batch = codes[start:start + batch_size]
+                expected = cls.aggregate_expenses(batch, using=using)
+                cls.objects.using(using).filter(company_code__in=batch).delete()
+                cls.objects.using(using).bulk_create([
+                    cls(company_code=code, total=total, count=count, last_expense_date=last)
+                    for code, (total, count, last) in expected.items()
+                ])
+                result.update({code: values[0] for code, values in expected.items()})
+        return result
+    
+    @classmethod
+    def rebuild(cls, using='default') -> int:
+        """
+        Recalcula todos os totais a partir dos lançamentos
+
+        Returns:
+            Número de empresas com lançamentos
+        """
+        with transaction.atomic(using=using):
+            expected = cls.aggregate_expenses(using=using)
+            cls.objects.using(using).all().delete()
+            cls.objects.using(using).bulk_create([
+                cls(company_code=code, total=total, count=count, last_expense_date=last)
+                for code, (total, count, last) in expected.items()
+            ])
+        return len(expected)
 
 
 class CompanyAdjustment(models.Model):
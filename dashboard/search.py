@@ -0,0 +1,99 @@
+"""
+Busca de empresas e lançamentos para /api/search
+Empresas pelos índices de busca do snapshot (nome e código sem acentos);
+lançamentos pelo índice FTS5 do SQLite (descrição, observações, empresa e
+categoria), ordenados por relevância (bm25)
+"""
+
+from typing import Any, Dict, List, Optional
+import re
+
+from django.db import connection
+
+from .expense_listing import serialize_row
+from .models import Expense
+from .utils.text import normalize_text
+
+# Pesos do bm25 por coluna do índice: description, notes, company_name, category
+FTS_WEIGHTS = (4.0, 2.0, 1.0, 1.0)
+# Campos dos lançamentos devolvidos pela busca
+SEARCH_EXPENSE_FIELDS = ('id', 'company_code', 'company_name', 'description', 'amount', 'expense_date', 'category')
+
+_TOKEN = re.compile(r'\w+')
+
+# Relevância das empresas (ver CompanyIndex.search)
+COMPANY_MATCHES = ('code', 'code_prefix', 'name_prefix', 'word_prefix', 'contains')
+
+
+def search_companies(snapshot, term: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Empresas do snapshot que contêm o termo, da mais relevante à menos"""
+    return [
+        {'code': company['code'], 'name': company['name'], 'status': company.get('status'),
+         'percentage': company.get('percentage'), 'match': COMPANY_MATCHES[score]}
+        for score, company in snapshot.index.search(term, limit)
+    ]
+
+
+def fts_query(term: str) -> Optional[str]:
+    """
+    Consulta FTS5 a partir do texto digitado: todas as palavras, a última como prefixo
+
+    Cada palavra vai entre aspas, então operadores e caracteres especiais do
+    FTS5 digitados pelo usuário não são interpretados
+    """
+    tokens = _TOKEN.findall(normalize_text(term))
+    if not tokens:
+        return None
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_expenses(term: str, limit: int = 20, company_code: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Lançamentos cuja descrição, observações, empresa ou categoria contêm o termo
+
+    Args:
+        term: Texto buscado (sem diferença de acentos e maiúsculas)
+        limit: Máximo de lançamentos
+        company_code: Restringe a uma empresa
+
+    Returns:
+        Lançamentos (dicionários da API), do mais relevante ao menos
+    """
+    query = fts_query(term)
+    if query is None:
+        return []
+
+    if connection.vendor != 'sqlite':
+        # Sem FTS5: busca simples por trecho na descrição e nas observações
+        from django.db.models import Q
+        queryset = Expense.objects.order_by('-expense_date', '-id')
+        if company_code:
+            queryset = queryset.filter(company_code=company_code)
+        for token in term.split():
+            queryset = queryset.filter(Q(description__icontains=token) | Q(notes__icontains=token))
+        rows = queryset.values_list(*SEARCH_EXPENSE_FIELDS)[:limit]
+        return [serialize_row(SEARCH_EXPENSE_FIELDS, row) for row in rows]
+
+    columns = ', '.join(f'e.{field}' for field in SEARCH_EXPENSE_FIELDS)
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    sql = (
+        f'SELECT {columns} FROM expenses_fts '
+        f'JOIN expenses e ON e.id = expenses_fts.rowid '
+        f'WHERE expenses_fts MATCH %s'
+    )
+    params: List[Any] = [query]
+    if company_code:
+        sql += ' AND e.company_code = %s'
+        params.append(company_code)
+    sql += f' ORDER BY bm25(expenses_fts, {weights}), e.id DESC LIMIT %s'
+    params.append(limit)
+
+    # Valores convertidos pelos campos do modelo (datas e decimais como no ORM)
+    rows = Expense.objects.raw(sql, params)
+    return [
+        serialize_row(SEARCH_EXPENSE_FIELDS, [getattr(expense, field) for field in SEARCH_EXPENSE_FIELDS])
+        for expense in rows
+    ]
+
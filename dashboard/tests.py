@@ -1,3 +1,1403 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import jwt
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from openpyxl import Workbook
+
+from . import expense_import, expense_listing, ingest, views
+from .db import DEFAULT_SQLITE_PRAGMAS, ExpenseWriter, create_expense
+from .export_cache import ExportCache
+from .models import CompanyAdjustment, Expense, ExpenseTotal
+from .utils import aggregation, company_table, folder_ingest, inotify, parallel_ingest
+from .utils.aggregation import LiquidacaoTotals, aggregate_liquidacao
+from .utils.company_table import CompanyTable
+from .utils.excel_processor import ExcelProcessor, SHEET_VALIDACOES, SHEET_LIQUIDACAO
+from .utils.excel_schema import DEFAULT_SCHEMA, WorkbookSchema
+from .utils.file_monitor import FileMonitor
+from .utils.folder_ingest import FolderIngestor
+from .utils.ingest_scheduler import CancelToken, IngestCancelled, IngestScheduler
+from .utils.leader import LeaderLock
+from .utils.parse_cache import ParseCache
+from .utils import snapshot as snapshot_module
+from .utils.snapshot import Snapshot
+from .utils.snapshot_store import SnapshotFollower, SnapshotStore
+from .utils.xlsx_reader import XlsxReader
+
+
+def build_workbook(path, companies=60, liquidations=800, seed=7):
+    """Gera um workbook de exemplo com as abas VALIDAÇÕES e LIQUIDAÇÃO 2025"""
+    rng = random.Random(seed)
+    wb = Workbook()
+
+    ws = wb.active
+    ws.title = SHEET_VALIDACOES
+    ws.append(['Código', 'Empresa', 'Processo', 'Objeto', 'Início', 'Fim', 'Valor Contrato'])
+    for i in range(companies):
+        # Códigos numéricos e textuais, valores com tipos variados
+        code = 1000 + i if i % 3 == 0 else f'C{i:04d}'
+        value = rng.choice([rng.uniform(1000, 900000), rng.randint(1, 5000), 0, None, 'sem valor'])
+        ws.append([code, f'Empresa {rng.randint(0, 99)} Ltda', None, 'Serviços', None, None, value])
+    ws.append([None, 'Sem código', None, None, None, None, 100])
+    ws.append(['X999', 'Linha curta'])
+
+    ws = wb.create_sheet(SHEET_LIQUIDACAO)
+    ws.append(['Empenho', 'Código', 'Data', 'Histórico', 'Fonte', 'Elemento', 'Valor Liquidado'])
+    for i in range(liquidations):
+        idx = rng.randint(0, companies + 10)
+        code = 1000 + idx if idx % 3 == 0 else f'C{idx:04d}'
+        value = rng.choice([rng.uniform(1, 5000), rng.randint(1, 300), None, '', -10, True])
+        ws.append([i, code, datetime(2025, 1 + i % 12, 1), 'Liquidação', None, None, value])
+
+    # Valor com formato de data: openpyxl devolve datetime e a linha é ignorada
+    ws.append([0, 'C0001', None, None, None, None, datetime(2025, 5, 1)])
+
+    wb.create_sheet('Resumo').append(['Total', '=SUM(1,2)'])
+    wb.save(path)
+    return path
+
+
+class IngestEngineParityTests(SimpleTestCase):
+    """Os modos 'streaming' e 'xml' devem produzir o mesmo resultado do modo 'full'"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.workbooks = [
+            build_workbook(os.path.join(cls.tmpdir, 'pequeno.xlsx'), 20, 100, seed=1),
+            build_workbook(os.path.join(cls.tmpdir, 'medio.xlsx'), 150, 3000, seed=2),
+            build_workbook(os.path.join(cls.tmpdir, 'macro.xlsm'), 80, 1200, seed=3),
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_engines_match_full_load(self):
+        for path in self.workbooks:
+            expected = ExcelProcessor(mode='full').process_file(path)
+            self.assertTrue(expected)
+            for mode in ('streaming', 'xml'):
+                with self.subTest(workbook=os.path.basename(path), mode=mode):
+                    self.assertEqual(ExcelProcessor(mode=mode).process_file(path), expected)
+
+    def test_missing_sheet_returns_empty(self):
+        path = os.path.join(self.tmpdir, 'sem_liquidacao.xlsx')
+        wb = Workbook()
+        wb.active.title = SHEET_VALIDACOES
+        wb.save(path)
+        for mode in ('full', 'streaming', 'xml'):
+            with self.subTest(mode=mode):
+                self.assertEqual(ExcelProcessor(mode=mode).process_file(path), [])
+
+    def test_xml_reader_resolves_sheets_and_values(self):
+        reader = XlsxReader(self.workbooks[0])
+        try:
+            self.assertEqual(reader.sheetnames, [SHEET_VALIDACOES, SHEET_LIQUIDACAO, 'Resumo'])
+            header = next(reader.iter_rows(SHEET_LIQUIDACAO, (1, 2, 6)))
+            self.assertEqual(header, ('Código', 'Data', 'Valor Liquidado'))
+            first = next(reader.iter_rows(SHEET_LIQUIDACAO, (0, 2), min_row=2))
+            self.assertEqual(first, (0, datetime(2025, 1, 1)))
+        finally:
+            reader.close()
+
+    def test_stats_are_recorded(self):
+        processor = ExcelProcessor(mode='xml', profile=True)
+        processor.process_file(self.workbooks[1])
+        self.assertEqual(processor.last_stats['mode'], 'xml')
+        self.assertGreater(processor.last_stats['rows'], 3000)
+        self.assertIsNotNone(processor.last_stats['peak_memory'])
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            ExcelProcessor(mode='pandas')
+
+
+class ParallelIngestTests(SimpleTestCase):
+    """O modo 'parallel' deve reproduzir exatamente o resultado serial"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.path = build_workbook(os.path.join(cls.tmpdir, 'grande.xlsx'), 200, 6000, seed=11)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_parallel_matches_serial(self):
+        expected = ExcelProcessor(mode='full').process_file(self.path)
+        processor = ExcelProcessor(mode='parallel', workers=3)
+        try:
+            # Lotes pequenos: a aba de 6000 linhas é dividida em 12 lotes
+            with mock.patch.object(parallel_ingest, 'ROW_BATCH', 500):
+                self.assertEqual(processor.process_file(self.path), expected)
+        finally:
+            processor.parallel.shutdown()
+        self.assertEqual(processor.last_stats['rows'], 6000 + 1 + 200 + 2)
+
+class LiquidacaoAggregationTests(SimpleTestCase):
+    """Agregação em lote da LIQUIDAÇÃO (com e sem NumPy)"""
+
+    ROWS = [
+        ('A', 0.1), (' B ', 10), ('A', 1e16), (None, 5), ('C', ''), ('A', 1.0),
+        ('B', -3), ('A', -1e16), ('C', 'texto'), ('A', 0.3), ('B', 2.675), ('A', 0.1),
+    ]
+
+    def engines(self):
+        """Executa o bloco com NumPy e com a agregação linha a linha"""
+        yield 'numpy'
+        with mock.patch.object(aggregation, 'np', None):
+            yield 'loop'
+
+    def test_group_by_with_byproducts(self):
+        for engine in self.engines():
+            with self.subTest(engine=engine):
+                result = aggregate_liquidacao(self.ROWS)
+                self.assertEqual(result.codes, ['A', 'B'])
+                self.assertEqual(result.totals(), {
+                    'A': math.fsum([0.1, 1e16, 1.0, 0.3, 0.1]),
+                    'B': math.fsum([10, 2.675])
+                })
+                self.assertEqual(list(result.counts), [5, 2])
+                self.assertEqual(list(result.mins), [0.1, 2.675])
+                self.assertEqual(list(result.maxs), [1e16, 10.0])
+                self.assertEqual(list(result.lasts), [0.1, 2.675])
+                self.assertEqual(result.rows(), 7)
+
+    def test_chunks_merge_to_the_same_totals(self):
+        rng = random.Random(5)
+        rows = [(f'C{rng.randint(0, 30)}', rng.uniform(0.01, 1e7)) for _ in range(3000)]
+        whole = aggregate_liquidacao(rows)
+        for engine in self.engines():
+            for size in (1, 7, 500):
+                with self.subTest(engine=engine, size=size):
+                    chunks = [rows[i:i + size] for i in range(0, len(rows), size)]
+                    merged = LiquidacaoTotals.merge(aggregate_liquidacao(chunk) for chunk in chunks)
+                    self.assertEqual(merged.totals(), whole.totals())
+                    self.assertEqual(list(merged.counts), list(whole.counts))
+                    self.assertEqual(list(merged.lasts), list(whole.lasts))
+
+    def test_vectorized_sums_are_exact(self):
+        rng = random.Random(9)
+        rows = [(f'C{rng.randint(0, 20)}', rng.choice([rng.uniform(0.01, 1e7), 10 ** rng.uniform(-300, 300), 0.1]))
+                for _ in range(2000)]
+        # Valores perto do limite do float64 usam a soma grupo a grupo
+        rows += [('D', 1.5e308), ('D', 1e292)]
+        expected = {}
+        for code, value in rows:
+            expected.setdefault(code, []).append(value)
+
+        result = aggregate_liquidacao(rows)
+        self.assertEqual(result.totals(), {code: math.fsum(values) for code, values in expected.items()})
+        self.assertEqual(result.codes, list(expected))
+
+    def test_processor_keeps_byproducts(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = build_workbook(os.path.join(tmpdir, 'planilha.xlsx'), 30, 400)
+            processor = ExcelProcessor(mode='xml')
+            companies = processor.process_file(path)
+            liquidacao = processor.liquidacao_by_year[2025]
+            totals = liquidacao.totals()
+            for company in companies:
+                self.assertEqual(company['spent_value'], totals.get(company['code'], 0))
+            self.assertGreater(liquidacao.rows(), 0)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+class MultiYearSchemaTests(SimpleTestCase):
+    """Abas de LIQUIDAÇÃO de vários anos, com colunas resolvidas pelo cabeçalho"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.tmpdir, 'anos.xlsx')
+
+        wb = Workbook()
+        ws = wb.active
+        ws.title = SHEET_VALIDACOES
+        ws.append(['Código', 'Empresa', None, None, None, None, 'Valor Contrato'])
+        ws.append(['A1', 'Alfa', None, None, None, None, 1000])
+        ws.append(['B2', 'Beta', None, None, None, None, 2000])
+
+        # 2024 no layout padrão
+        ws = wb.create_sheet('LIQUIDAÇÃO 2024')
+        ws.append(['Empenho', 'Código', None, None, None, None, 'Valor Liquidado'])
+        ws.append([1, 'A1', None, None, None, None, 100.5])
+        ws.append([2, 'B2', None, None, None, None, 50])
+
+        # 2026 com as colunas em outra ordem e cabeçalho sem acento
+        ws = wb.create_sheet('LIQUIDAÇÃO 2026')
+        ws.append(['valor liquidado', 'Empenho', 'CODIGO'])
+        ws.append([10, 1, 'A1'])
+        ws.append([5.25, 2, 'A1'])
+        ws.append([99, 3, 'Z9'])
+
+        wb.create_sheet('LIQUIDAÇÃO RESUMO').append(['Código', 'Valor Liquidado'])
+        wb.save(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_year_sheets_are_summed(self):
+        expected = None
+        for mode in ('full', 'streaming', 'xml', 'parallel'):
+            with self.subTest(mode=mode):
+                processor = ExcelProcessor(mode=mode, workers=2)
+                try:
+                    table = processor.process_table(self.path)
+                finally:
+                    if processor.parallel:
+                        processor.parallel.shutdown()
+
+                self.assertEqual(table.years(), [2024, 2026])
+                self.assertEqual(sorted(processor.liquidacao_by_year), [2024, 2026])
+                companies = {c['code']: c for c in table.to_dicts()}
+                self.assertEqual(companies['A1']['spent_by_year'], {'2024': 100.5, '2026': 15.25})
+                self.assertEqual(companies['A1']['spent_value'], 115.75)
+                self.assertEqual(companies['B2']['spent_by_year'], {'2024': 50.0, '2026': 0.0})
+                self.assertEqual(table.statistics()['spent_by_year'], {'2024': 150.5, '2026': 15.25})
+
+                if expected is None:
+                    expected = table.to_dicts()
+                self.assertEqual(table.to_dicts(), expected)
+
+    def test_years_setting_limits_sheets(self):
+        schema = dict(DEFAULT_SCHEMA, liquidacao=dict(DEFAULT_SCHEMA['liquidacao'], years=[2026]))
+        table = ExcelProcessor(mode='xml', schema=WorkbookSchema(schema)).process_table(self.path)
+        self.assertEqual(table.years(), [2026])
+        self.assertEqual({c['code']: c['spent_value'] for c in table.to_dicts()}, {'A1': 15.25, 'B2': 0.0})
+
+    def test_header_resolution_falls_back_to_position(self):
+        schema = WorkbookSchema()
+        self.assertEqual(schema.liquidacao.resolve('x', ['Valor Liquidado', 'x', 'Código']), (2, 0))
+        self.assertEqual(schema.liquidacao.resolve('x', ['?'] * 7), (1, 6))
+        self.assertEqual(schema.liquidacao_sheets(['LIQUIDAÇÃO 2025', 'Resumo', 'LIQUIDAÇÃO 2023']),
+                         {2023: 'LIQUIDAÇÃO 2023', 2025: 'LIQUIDAÇÃO 2025'})
+        with self.assertRaises(ValueError):
+            WorkbookSchema(dict(DEFAULT_SCHEMA, liquidacao={'sheet': 'LIQUIDAÇÃO', 'columns': {}}))
+
+
+class FolderIngestTests(SimpleTestCase):
+    """Modo 'all': todos os workbooks da pasta combinados, reprocessando só os alterados"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = [
+            build_workbook(os.path.join(self.tmpdir, f'diretoria{i}.xlsm'), 40, 300, seed=i)
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def expected(self, paths):
+        """Combinação feita do zero, arquivo por arquivo"""
+        return FolderIngestor(mode='xml', workers=1).update(paths).to_dicts()
+
+    def test_incremental_merge_matches_full_merge(self):
+        folder = FolderIngestor(mode='xml', workers=2)
+        try:
+            merged = folder.update(self.paths)
+            self.assertEqual(merged.to_dicts(), self.expected(self.paths))
+            self.assertEqual(folder.files, sorted(self.paths))
+
+            # Códigos repetidos entre arquivos têm os valores somados
+            table = folder.tables[self.paths[0]]
+            code = table.codes[0]
+            contracts = [t.contract_values[t.index_of(code)] for t in folder.tables.values() if code in t]
+            self.assertEqual(merged.contract_values[merged.index_of(code)], math.fsum(contracts))
+
+            build_workbook(self.paths[1], 50, 400, seed=9)
+            with mock.patch('dashboard.utils.folder_ingest._parse_workbook', wraps=folder_ingest._parse_workbook) as parse:
+                folder.workers = 1
+                merged = folder.update([self.paths[1]])
+            self.assertEqual(parse.call_count, 1)
+            self.assertEqual(merged.to_dicts(), self.expected(self.paths))
+
+            merged = folder.update([], removed=[self.paths[0]])
+            self.assertEqual(merged.to_dicts(), self.expected(self.paths[1:]))
+        finally:
+            folder.shutdown()
+
+    def test_cancelled_update_leaves_tables_untouched(self):
+        folder = FolderIngestor(mode='xml', workers=1)
+        folder.update(self.paths[:1])
+        cancel = CancelToken()
+        cancel.set()
+        with mock.patch('dashboard.utils.folder_ingest._parse_workbook', wraps=folder_ingest._parse_workbook) as parse:
+            with self.assertRaises(IngestCancelled):
+                folder.update(self.paths[1:], removed=self.paths[:1], cancel=cancel)
+        parse.assert_not_called()
+        self.assertEqual(folder.files, self.paths[:1])
+
+    def test_monitor_reports_changed_and_removed_files(self):
+        calls = []
+        monitor = FileMonitor(self.tmpdir, '*.xlsm', mode='all')
+        monitor.on_file_changed = lambda changed, removed: calls.append((changed, removed))
+        open(os.path.join(self.tmpdir, '~$diretoria0.xlsm'), 'wb').close()
+
+        with mock.patch('dashboard.utils.file_monitor.time.sleep'):
+            monitor._check_folder()
+            monitor._check_folder()
+            os.remove(self.paths[2])
+            os.utime(self.paths[0], ns=(1, 1))
+            monitor._check_folder()
+
+        self.assertEqual(calls, [(sorted(self.paths), []), ([self.paths[0]], [self.paths[2]])])
+
+
+@skipUnless(inotify.inotify_available(), 'inotify disponível apenas no Linux')
+class InotifyMonitorTests(SimpleTestCase):
+    """Backend de eventos do FileMonitor"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.events = []
+        self.received = threading.Event()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def callback(self, *args):
+        self.events.append(args)
+        self.received.set()
+
+    def wait_event(self):
+        self.assertTrue(self.received.wait(5), 'evento não recebido')
+        self.received.clear()
+
+    def write_atomic(self, name, data):
+        """Grava em um temporário e renomeia (como os editores fazem)"""
+        tmp_path = os.path.join(self.tmpdir, f'.{name}.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(self.tmpdir, name))
+
+    def test_latest_mode_reacts_to_writes_and_renames(self):
+        monitor = FileMonitor(self.tmpdir, '*.xlsm', backend='inotify', rescan_interval=0)
+        self.assertTrue(monitor.start(self.callback))
+        try:
+            self.assertEqual(monitor.active_backend, 'inotify')
+            with open(os.path.join(self.tmpdir, 'a.xlsm'), 'wb') as f:
+                f.write(b'1')
+            self.wait_event()
+            self.write_atomic('b.xlsm', b'22')
+            self.wait_event()
+            # Arquivos fora do padrão e de bloqueio do Excel são ignorados
+            self.write_atomic('~$b.xlsm', b'x')
+            self.write_atomic('notas.txt', b'x')
+        finally:
+            monitor.stop()
+
+        self.assertEqual(self.events, [
+            (os.path.join(self.tmpdir, 'a.xlsm'),),
+            (os.path.join(self.tmpdir, 'b.xlsm'),),
+        ])
+
+    def test_all_mode_reports_removals(self):
+        path = os.path.join(self.tmpdir, 'a.xlsm')
+        with open(path, 'wb') as f:
+            f.write(b'1')
+        monitor = FileMonitor(self.tmpdir, '*.xlsm', mode='all', backend='inotify', rescan_interval=0)
+        with mock.patch('dashboard.utils.file_monitor.time.sleep'):
+            self.assertTrue(monitor.start(self.callback))
+            try:
+                self.wait_event()
+                os.remove(path)
+                self.wait_event()
+            finally:
+                monitor.stop()
+
+        self.assertEqual(self.events, [([path], []), ([], [path])])
+
+    def test_polling_backend_is_kept_when_requested(self):
+        monitor = FileMonitor(self.tmpdir, '*.xlsm', backend='polling')
+        self.assertIsNone(monitor._create_watcher())
+        with self.assertRaises(ValueError):
+            FileMonitor(self.tmpdir, backend='fsevents')
+
+
+    def test_network_folder_falls_back_to_polling(self):
+        mounts = os.path.join(self.tmpdir, 'mounts')
+        share = os.path.join(self.tmpdir, 'pasta compartilhada')
+        os.mkdir(share)
+        with open(mounts, 'w') as f:
+            f.write('/dev/sda1 / ext4 rw 0 0\n')
+            f.write('//servidor/dados ' + share.replace(' ', '\\040') + ' cifs rw 0 0\n')
+
+        with mock.patch.object(inotify, 'MOUNTS_FILE', mounts):
+            self.assertEqual(inotify.filesystem_type(os.path.join(share, 'a.xlsm')), 'cifs')
+            self.assertIsNone(FileMonitor(share, '*.xlsm')._create_watcher())
+            self.assertFalse(inotify.is_network_filesystem(self.tmpdir))
+
+class IngestSchedulerTests(SimpleTestCase):
+    """Fila de ingestão com agrupamento, cancelamento e contrapressão"""
+
+    def setUp(self):
+        self.calls = []
+        self.done = threading.Event()
+
+    def test_burst_is_coalesced_into_one_ingest(self):
+        def handler(payload, cancel):
+            self.calls.append(payload)
+            self.done.set()
+
+        scheduler = IngestScheduler(handler, debounce=0.05)
+        scheduler.start()
+        try:
+            for version in range(5):
+                scheduler.submit('latest', f'v{version}')
+            self.assertTrue(self.done.wait(5))
+        finally:
+            scheduler.stop()
+
+        self.assertEqual(self.calls, ['v4'])
+        stats = scheduler.stats()
+        self.assertEqual((stats['submitted'], stats['coalesced'], stats['completed']), (5, 4, 1))
+        self.assertGreaterEqual(stats['last_wait'], 0.05)
+
+    def test_newer_version_cancels_in_flight_ingest(self):
+        started = threading.Event()
+
+        def handler(payload, cancel):
+            if payload == 'lento':
+                started.set()
+                cancel.wait(5)
+                cancel.check()
+            self.calls.append(payload)
+            self.done.set()
+
+        scheduler = IngestScheduler(handler, debounce=0)
+        scheduler.start()
+        try:
+            scheduler.submit('latest', 'lento')
+            self.assertTrue(started.wait(5))
+            scheduler.submit('latest', 'novo')
+            self.assertTrue(self.done.wait(5))
+        finally:
+            scheduler.stop()
+
+        self.assertEqual(self.calls, ['novo'])
+        self.assertEqual(scheduler.stats()['cancelled'], 1)
+
+    def test_cancelled_batch_is_merged_into_the_next_one(self):
+        started = threading.Event()
+
+        def handler(payload, cancel):
+            if payload == ['a']:
+                started.set()
+                cancel.wait(5)
+                cancel.check()
+            self.calls.append(payload)
+            self.done.set()
+
+        scheduler = IngestScheduler(handler, debounce=0, merge=lambda pending, new: sorted(set(pending) | set(new)))
+        scheduler.start()
+        try:
+            scheduler.submit('pasta', ['a'])
+            self.assertTrue(started.wait(5))
+            scheduler.submit('pasta', ['b'])
+            self.assertTrue(self.done.wait(5))
+        finally:
+            scheduler.stop()
+
+        # O arquivo do lote cancelado não se perde
+        self.assertEqual(self.calls, [['a', 'b']])
+
+    def test_full_queue_applies_backpressure(self):
+        scheduler = IngestScheduler(lambda payload, cancel: None, debounce=60, max_pending=1)
+        scheduler.start()
+        try:
+            self.assertTrue(scheduler.submit('a', 1))
+            self.assertTrue(scheduler.submit('a', 2))
+            self.assertFalse(scheduler.submit('b', 1, timeout=0.05))
+            self.assertEqual(scheduler.stats()['pending'], 1)
+            self.assertEqual(scheduler.stats()['rejected'], 1)
+        finally:
+            scheduler.stop()
+
+    def test_processor_honours_cancel_token(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = build_workbook(os.path.join(tmpdir, 'planilha.xlsx'), 30, 5000)
+            cancel = CancelToken()
+            cancel.set()
+            for mode in ('xml', 'streaming'):
+                with self.subTest(mode=mode), self.assertRaises(IngestCancelled):
+                    ExcelProcessor(mode=mode).process_table(path, cancel=cancel)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+class LeaderElectionTests(SimpleTestCase):
+    """Um só processo de ingestão; os demais usam os dados publicados"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+
+    def test_single_leader_until_release(self):
+        path = os.path.join(self.tmp, 'ingestor.lock')
+        leader, standby = LeaderLock(path), LeaderLock(path)
+
+        self.assertTrue(leader.acquire())
+        self.assertFalse(standby.acquire())
+        self.assertFalse(standby.acquire(blocking=True, timeout=0.2, interval=0.05))
+        self.assertEqual(standby.holder()['pid'], os.getpid())
+
+        leader.release()
+        self.assertTrue(standby.acquire())
+        self.assertTrue(standby.is_leader)
+        standby.release()
+
+    def test_follower_receives_each_published_version(self):
+        path = os.path.join(self.tmp, 'snapshot.sqlite3')
+        publisher, reader = SnapshotStore(path), SnapshotStore(path)
+        received = []
+        follower = SnapshotFollower(reader, lambda version, payload: received.append((version, json.loads(payload))))
+
+        self.assertFalse(follower.poll())
+        version, payload = publisher.publish({'companies': [], 'file_path': 'a.xlsm'})
+        self.assertEqual(version, 1)
+        self.assertEqual(reader.load(), (1, payload))
+        self.assertTrue(follower.poll())
+        self.assertFalse(follower.poll())
+        self.assertEqual(publisher.publish({'companies': [], 'file_path': 'b.xlsm'})[0], 2)
+        self.assertEqual(reader.version(), 2)
+        self.assertTrue(follower.poll())
+
+        self.assertEqual([(v, d['file_path'], d['version']) for v, d in received],
+                         [(1, 'a.xlsm', 1), (2, 'b.xlsm', 2)])
+
+
+class SnapshotTests(SimpleTestCase):
+    """Versões imutáveis trocadas por inteiro; cada arquivo começa do zero"""
+
+    def setUp(self):
+        patcher = mock.patch.object(views, 'current_snapshot', Snapshot.empty())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ingest, 'broadcast')
+        self.broadcast = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_snapshot_is_immutable_and_serialized_once(self):
+        snapshot = Snapshot(3, [{'code': 'A', 'name': 'Alfa'}], {'companies_count': 1}, 'a.xlsm', '2025-01-01T00:00:00')
+
+        with self.assertRaises(AttributeError):
+            snapshot.companies = []
+        self.assertIs(snapshot.payload, snapshot.payload)
+        self.assertEqual(Snapshot.from_payload(snapshot.payload).to_dict(), snapshot.to_dict())
+
+    def test_only_newer_versions_are_swapped_in(self):
+        newer = Snapshot(2, [], {}, 'b.xlsm')
+        self.assertTrue(ingest.apply_snapshot(newer))
+        self.assertFalse(ingest.apply_snapshot(Snapshot(1, [], {}, 'a.xlsm')))
+        self.assertIs(views.current_snapshot, newer)
+        self.broadcast.assert_called_once_with(newer)
+
+    def test_followers_load_encodings_published_by_the_leader(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        path = os.path.join(tmp, 'snapshot.sqlite3')
+        table = CompanyTable(['A'], ['Alfa'], [10.0], [5.0])
+        published = ingest.publish_table(SnapshotStore(path), table, 'a.xlsm')
+
+        # Outro processo web: nada em uso e o store aponta para o mesmo arquivo
+        with self.settings(SNAPSHOT_DB=path), \
+                mock.patch.object(views, 'current_snapshot', Snapshot.empty()), \
+                mock.patch.object(ingest, '_follower', None), \
+                mock.patch.object(SnapshotFollower, 'start'), \
+                mock.patch.object(snapshot_module.gzip, 'compress', side_effect=AssertionError('comprimido de novo')), \
+                mock.patch.object(Snapshot, 'columnar', side_effect=AssertionError('serializado de novo')):
+            self.assertTrue(ingest.start_snapshot_follower().poll())
+            loaded = views.current_snapshot
+
+        self.assertEqual(loaded.version, published.version)
+        self.assertEqual(loaded.encodings(), published.encodings())
+        self.assertEqual(loaded.encoded('gzip', 'columnar'), published.encoded('gzip', 'columnar'))
+
+    def test_data_endpoint_serves_precompressed_payload_with_etag(self):
+        snapshot = Snapshot(5, [{'code': 'A', 'name': 'Alfa'}] * 50, {'companies_count': 50})
+        ingest.apply_snapshot(snapshot)
+
+        response = self.client.get('/api/data', HTTP_ACCEPT_ENCODING='gzip;q=0.8, deflate, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), snapshot.payload)
+        self.assertIs(response.content, snapshot.encoded('gzip'))
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/data', HTTP_IF_NONE_MATCH=f'W/{etag}').status_code, 304)
+
+        response = self.client.get('/api/data', HTTP_IF_NONE_MATCH='"4-0"')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(json.loads(response.content)['version'], 5)
+
+    def test_columnar_and_msgpack_formats(self):
+        table = CompanyTable([f'C{i}' for i in range(200)], [f'Empresa {i}' for i in range(200)],
+                             [1000.0] * 200, [float(i * 5) for i in range(200)], {2025: [1.0] * 200})
+        snapshot = Snapshot(2, table.to_dicts(), table.statistics(), 'a.xlsm')
+        ingest.apply_snapshot(snapshot)
+
+        response = self.client.get('/api/data?format=columnar')
+        columnar = json.loads(response.content)
+        self.assertLess(len(response.content), len(snapshot.payload) / 2)
+        self.assertNotEqual(response['ETag'], snapshot.etag)
+        self.assertEqual(columnar['companies']['code'][199], 'C199')
+        self.assertEqual(columnar['statuses'][columnar['companies']['status'][199]], 'critical')
+        self.assertEqual(columnar['companies']['spent_by_year']['2025'][0], 1.0)
+        self.assertEqual(self.client.get('/api/data?format=xml').status_code, 400)
+
+        if snapshot_module.msgpack is not None:
+            response = self.client.get('/api/data?format=msgpack')
+            self.assertEqual(response['Content-Type'], 'application/x-msgpack')
+            self.assertEqual(snapshot_module.msgpack.unpackb(response.content), columnar)
+
+    @skipUnless(snapshot_module.msgpack, 'msgpack não instalado')
+    def test_consumer_sends_msgpack_frames(self):
+        from channels.testing import WebsocketCommunicator
+        from .consumers import DashboardConsumer
+
+        snapshot = Snapshot(3, [{'code': 'A', 'name': 'Alfa', 'contract_value': 10.0, 'spent_value': 5.0,
+                                 'percentage': 50.0, 'status': 'ok'}], {})
+        ingest.apply_snapshot(snapshot)
+
+        async def receive():
+            communicator = WebsocketCommunicator(DashboardConsumer.as_asgi(), '/ws/dashboard/?format=msgpack')
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            frame = await communicator.receive_from()
+            await communicator.disconnect()
+            return frame
+
+        message = snapshot_module.msgpack.unpackb(asyncio.run(receive()))
+        self.assertEqual(message['type'], 'update')
+        self.assertEqual(message['data'], snapshot.columnar())
+
+    def test_consumer_sends_bytes_prepared_at_publish(self):
+        from channels.testing import WebsocketCommunicator
+        from .consumers import DashboardConsumer
+
+        snapshot = Snapshot(4, [{'code': 'A', 'name': 'Alfa', 'contract_value': 10.0, 'spent_value': 5.0,
+                                 'percentage': 50.0, 'status': 'ok'}], {})
+        ingest.apply_snapshot(snapshot)
+
+        async def receive():
+            communicator = WebsocketCommunicator(DashboardConsumer.as_asgi(), '/ws/dashboard/?format=columnar')
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            initial = await communicator.receive_from()
+            # Notificação de uma versão já substituída: nada é enviado
+            await communicator.send_input({'type': 'dashboard_update', 'version': 3})
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.send_input({'type': 'dashboard_update', 'version': 4})
+            update = await communicator.receive_from()
+            await communicator.disconnect()
+            return initial, update
+
+        # Tudo já foi serializado por apply_snapshot: o consumer só copia bytes
+        with mock.patch.object(Snapshot, 'columnar', side_effect=AssertionError('serializado no envio')):
+            initial, update = asyncio.run(receive())
+        self.assertEqual(initial, update)
+        self.assertEqual(json.loads(update)['data'], json.loads(snapshot.body('columnar')))
+
+    def test_processor_does_not_accumulate_across_files(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        first = build_workbook(os.path.join(tmp, 'a.xlsx'), 30, 50, seed=1)
+        second = build_workbook(os.path.join(tmp, 'b.xlsx'), 5, 50, seed=2)
+
+        processor = ExcelProcessor(mode='xml')
+        processor.process_table(first)
+        self.assertEqual(processor.process_file(second), ExcelProcessor(mode='xml').process_file(second))
+
+
+class CompanyQueryTests(SimpleTestCase):
+    """/api/companies respondido pelos índices do snapshot"""
+
+    def setUp(self):
+        patcher = mock.patch.object(views, 'current_snapshot', Snapshot.empty())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ingest, 'broadcast')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        rng = random.Random(3)
+        names = ['Álvaro', 'alfa', 'Beta', 'Gama', 'Ômega', 'Construtora']
+        table = CompanyTable(
+            [f'{rng.randint(100, 999)}-{i}' for i in range(300)],
+            [f'{rng.choice(names)} {i}' for i in range(300)],
+            [rng.choice([0.0, 1000.0, 5000.0]) for _ in range(300)],
+            [float(rng.randint(0, 6000)) for _ in range(300)]
+        )
+        self.snapshot = Snapshot(4, table.to_dicts(), table.statistics())
+        ingest.apply_snapshot(self.snapshot)
+
+    def brute_force(self, keep, key, descending=False):
+        companies = sorted((c for c in self.snapshot.companies if keep(c)), key=lambda c: (key(c), c['code']),
+                           reverse=descending)
+        return [c['code'] for c in companies]
+
+    def codes(self, query):
+        response = self.client.get('/api/companies?' + query)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        return data['total'], [c['code'] for c in data['results']]
+
+    def test_filters_sorting_and_pages_match_full_scan(self):
+        expected = self.brute_force(lambda c: c['status'] in ('warning', 'critical') and c['percentage'] >= 80,
+                                    lambda c: c['percentage'], descending=True)
+        self.assertEqual(self.codes('status=warning,critical&pct_min=80&sort=-percentage&limit=1000'),
+                         (len(expected), expected))
+
+        # Prefixo sem acentos e maiúsculas, no nome ou no código
+        expected = self.brute_force(lambda c: c['name'].startswith(('Álvaro', 'alfa')), lambda c: c['spent_value'])
+        self.assertEqual(self.codes('q=AL&sort=spent_value&limit=1000'), (len(expected), expected))
+        expected = self.brute_force(lambda c: c['code'].startswith('5'), lambda c: c['code'])
+        self.assertEqual(self.codes('q=5&sort=code&limit=1000'), (len(expected), expected))
+
+        # Páginas sem filtro, nas duas direções
+        expected = self.brute_force(lambda c: True, lambda c: c['contract_value'] - c['spent_value'], descending=True)
+        self.assertEqual(self.codes('sort=-available&offset=290&limit=20'), (300, expected[290:]))
+        self.assertEqual(self.codes('sort=-available&offset=10&limit=5'), (300, expected[10:15]))
+
+    def test_company_by_code_and_invalid_parameters(self):
+        company = self.snapshot.companies[7]
+        response = self.client.get(f"/api/companies/{company['code']}")
+        self.assertEqual(response.json()['company'], company)
+        self.assertEqual(self.client.get('/api/companies/nao-existe').status_code, 404)
+        self.assertEqual(self.client.get('/api/companies?sort=idade').status_code, 400)
+        self.assertEqual(self.client.get('/api/companies?status=ruim').status_code, 400)
+
+
+class ParseCacheTests(SimpleTestCase):
+    """Snapshots em disco indexados pelo conteúdo do workbook"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = build_workbook(os.path.join(self.tmpdir, 'planilha.xlsx'), 30, 200)
+        self.cache = ParseCache(os.path.join(self.tmpdir, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_identical_bytes_are_not_parsed_twice(self):
+        parse = mock.Mock(side_effect=lambda path: ExcelProcessor(mode='xml').process_table(path))
+        first = self.cache.get_or_parse(self.path, parse)
+
+        # Arquivo "salvo" de novo sem alterações: mtime muda, conteúdo não
+        os.utime(self.path, (0, 0))
+        second = self.cache.get_or_parse(self.path, parse)
+
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(second.to_dicts(), first.to_dicts())
+
+    def test_latest_snapshot_survives_restart(self):
+        table = self.cache.get_or_parse(self.path, ExcelProcessor(mode='xml').process_table)
+        latest = ParseCache(self.cache.cache_dir).load_latest()
+        self.assertEqual(latest['table'].to_dicts(), table.to_dicts())
+        self.assertEqual(latest['file_path'], self.path)
+
+    def test_schema_change_is_not_served_from_old_snapshots(self):
+        self.cache.get_or_parse(self.path, ExcelProcessor(mode='xml').process_table)
+
+        validacoes = DEFAULT_SCHEMA['validacoes']
+        schema = {**DEFAULT_SCHEMA, 'validacoes': {
+            **validacoes, 'columns': {**validacoes['columns'], 'name': {'headers': ['Objeto'], 'index': 3}}
+        }}
+        self.assertNotEqual(WorkbookSchema(schema).fingerprint(), WorkbookSchema().fingerprint())
+        cache = ParseCache(self.cache.cache_dir, variant=WorkbookSchema(schema).fingerprint())
+        self.assertIsNone(cache.load_latest())
+
+        parse = mock.Mock(side_effect=ExcelProcessor(mode='xml', schema=WorkbookSchema(schema)).process_table)
+        table = cache.get_or_parse(self.path, parse)
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(set(table.names), {'Serviços'})
+        self.assertEqual(cache.load_latest()['table'].to_dicts(), table.to_dicts())
+
+    def test_eviction_respects_size_limit(self):
+        table = ExcelProcessor(mode='xml').process_table(self.path)
+        cache = ParseCache(self.cache.cache_dir, max_bytes=1)
+        for i in range(3):
+            cache.put(f'{i:064x}', table, self.path)
+        # Só o snapshot mais recente é mantido
+        self.assertEqual(len(list(cache.cache_dir.glob('*.json.gz'))), 1)
+        self.assertEqual(cache.load_latest()['table'].to_dicts(), table.to_dicts())
+
+
+class CompanyTableTests(SimpleTestCase):
+    """Percentual e status calculados em colunas, com e sem NumPy"""
+
+    def setUp(self):
+        self.table = CompanyTable(
+            ['A', 'B', 'C', 'D', 'E'],
+            ['Zeta', 'Alfa', 'Beta', 'Alfa', 'Gama'],
+            [1000.0, 200.0, 3.0, 50.0, 0.0],
+            [950.0, 150.0, 2.675, 0.0, 10.0]
+        )
+
+    def test_percentages_and_statuses(self):
+        for numpy_module in (company_table.np, None):
+            with self.subTest(numpy=numpy_module is not None), \
+                    mock.patch.object(company_table, 'np', numpy_module):
+                table = self.table.copy()
+                table.set_spent(0, 950.0)
+                self.assertEqual(list(table.percentages()), [95.0, 75.0, 89.17, 0.0, 0.0])
+                self.assertEqual(table.statuses(), ['critical', 'warning', 'warning', 'ok', 'ok'])
+
+    def test_sorted_by_name_is_stable(self):
+        table = self.table.sorted_by_name()
+        self.assertEqual(table.codes, ['B', 'D', 'C', 'E', 'A'])
+        self.assertEqual(table.index_of('C'), 2)
+
+    def test_set_replaces_existing_code_in_place(self):
+        self.table.set('C', 'Beta Nova', 10.0)
+        self.assertEqual(self.table.index_of('C'), 2)
+        self.assertEqual(self.table.to_dicts()[2]['name'], 'Beta Nova')
+        self.assertEqual(self.table.to_dicts()[2]['spent_value'], 0.0)
+
+    def test_statistics(self):
+        stats = self.table.statistics()
+        self.assertEqual(stats['companies_count'], 5)
+        self.assertEqual(stats['total_contracted'], 1253.0)
+        self.assertEqual(stats['average_utilization'], round(1112.675 / 1253.0 * 100, 2))
+
+
+class ApplyAdjustmentsTests(TestCase):
+    """Ajustes e lançamentos do banco aplicados à tabela de empresas"""
+
+    def setUp(self):
+        self.table = CompanyTable(
+            ['A', 'B', 'C'], ['Alfa', 'Beta', 'Gama'],
+            [1000.0, 1000.0, 1000.0], [100.0, 100.0, 100.0]
+        )
+        CompanyAdjustment.objects.create(company_code='A', company_name='Alfa', contract_value=2000)
+        CompanyAdjustment.objects.create(company_code='B', company_name='Beta', spent_value=950)
+        Expense.objects.create(company_code='A', company_name='Alfa', amount=300, expense_date='2025-01-10')
+        Expense.objects.create(company_code='C', company_name='Gama', amount=720.5, expense_date='2025-02-01')
+
+    def test_adjustments_and_expense_totals(self):
+        # Ajustes e totais de lançamentos em duas consultas, independente do número de empresas
+        with self.assertNumQueries(2):
+            adjusted = views.apply_adjustments_to_companies(self.table)
+        companies = {c['code']: c for c in adjusted.to_dicts()}
+
+        self.assertEqual(companies['A']['contract_value'], 2000.0)
+        self.assertEqual(companies['A']['spent_value'], 300.0)
+        self.assertEqual(companies['A']['percentage'], 15.0)
+        self.assertEqual(companies['B']['spent_value'], 950.0)
+        self.assertEqual(companies['B']['status'], 'critical')
+        self.assertEqual(companies['C']['spent_value'], 720.5)
+        self.assertEqual(companies['C']['status'], 'warning')
+
+        # A tabela original não é alterada
+        self.assertEqual(list(self.table.spent_values), [100.0, 100.0, 100.0])
+
+    def test_query_count_does_not_grow_with_companies(self):
+        codes = [f'E{i:03d}' for i in range(200)]
+        table = CompanyTable(codes, codes, [100.0] * len(codes), [0.0] * len(codes))
+        Expense.objects.create(company_code='E007', company_name='E007', amount=10, expense_date='2025-03-01')
+        Expense.objects.create(company_code='E007', company_name='E007', amount=15.25, expense_date='2025-03-02')
+
+        with self.assertNumQueries(2):
+            adjusted = views.apply_adjustments_to_companies(table)
+
+        self.assertEqual(adjusted.spent_values[7], 25.25)
+        self.assertEqual(adjusted.spent_values[8], 0.0)
+
+
+class ExpenseTotalTests(TestCase):
+    """Totais por empresa mantidos a cada inclusão, alteração e remoção de lançamento"""
+
+    def totals(self, code):
+        total = ExpenseTotal.objects.filter(company_code=code).first()
+        return (float(total.total), total.count, str(total.last_expense_date)) if total else None
+
+    def test_create_update_and_delete_keep_totals(self):
+        first = Expense.objects.create(company_code='A', company_name='Alfa', amount=100, expense_date='2025-01-10')
+        second = Expense.objects.create(company_code='A', company_name='Alfa', amount='50.25', expense_date='2025-03-01')
+        self.assertEqual(self.totals('A'), (150.25, 2, '2025-03-01'))
+
+        # Alteração de valor e troca de empresa
+        second.amount = 70
+        second.save()
+        self.assertEqual(self.totals('A'), (170.0, 2, '2025-03-01'))
+        second.company_code = 'B'
+        second.save()
+        self.assertEqual(self.totals('A'), (100.0, 1, '2025-01-10'))
+        self.assertEqual(self.totals('B'), (70.0, 1, '2025-03-01'))
+
+        first.delete()
+        self.assertIsNone(self.totals('A'))
+        Expense.objects.filter(company_code='B').delete()
+        self.assertFalse(ExpenseTotal.objects.exists())
+
+    def test_delete_view_refreshes_adjusted_spent_value(self):
+        Expense.objects.create(company_code='A', company_name='Alfa', amount=100, expense_date='2025-01-10')
+        expense = Expense.objects.create(company_code='A', company_name='Alfa', amount=40, expense_date='2025-01-11')
+        CompanyAdjustment.objects.create(company_code='A', company_name='Alfa', spent_value=140)
+
+        adjusted_at = CompanyAdjustment.objects.get(company_code='A').updated_at
+
+        response = self.client.delete(f'/api/expenses/{expense.id}')
+
+        self.assertEqual(response.status_code, 200)
+        adjustment = CompanyAdjustment.objects.get(company_code='A')
+        self.assertEqual(adjustment.spent_value, 100)
+        self.assertGreater(adjustment.updated_at, adjusted_at)
+
+        # Sem lançamentos, o ajuste é limpo e volta a valer o valor gasto do Excel
+        self.client.delete(f'/api/expenses/{Expense.objects.get().id}')
+        self.assertIsNone(CompanyAdjustment.objects.get(company_code='A').spent_value)
+        self.assertIsNone(self.totals('A'))
+        self.assertEqual(self.client.delete(f'/api/expenses/{expense.id}').status_code, 404)
+
+    def test_check_and_rebuild_command(self):
+        Expense.objects.create(company_code='A', company_name='Alfa', amount=100, expense_date='2025-01-10')
+        Expense.objects.create(company_code='B', company_name='Beta', amount=5, expense_date='2025-01-12')
+        call_command('rebuild_expense_totals', '--check', stdout=io.StringIO())
+
+        # Divergência introduzida por fora (ex: SQL direto no banco)
+        ExpenseTotal.objects.filter(company_code='A').update(total=1, count=9)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_expense_totals', '--check', stdout=io.StringIO())
+
+        call_command('rebuild_expense_totals', stdout=io.StringIO())
+        self.assertEqual(self.totals('A'), (100.0, 1, '2025-01-10'))
+        call_command('rebuild_expense_totals', '--check', stdout=io.StringIO())
+
+    def test_hot_queries_use_indexes(self):
+        Expense.objects.create(company_code='A', company_name='Alfa', amount=100, expense_date='2025-01-10')
+        out = io.StringIO()
+        call_command('explain_queries', stdout=out)
+        self.assertIn('expenses_company_date_idx', out.getvalue())
+        self.assertTrue(out.getvalue().endswith('Nenhuma consulta sem índice\n'))
+
+
+class ExpenseListingTests(TestCase):
+    """Paginação por cursor, projeção de campos e filtros de /api/expenses"""
+
+    def setUp(self):
+        # Várias datas repetidas: o id desempata a ordem
+        for i in range(25):
+            Expense.objects.create(company_code='A' if i % 5 else 'B', company_name='Alfa', amount=10 + i,
+                                   expense_date=f'2025-0{1 + i % 3}-1{i % 2}')
+
+    def fetch_all(self, **params):
+        ids, cursor = [], None
+        while True:
+            query = dict(params, **({'cursor': cursor} if cursor else {}))
+            response = self.client.get('/api/expenses', query)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            ids += [row['id'] for row in page['results']]
+            cursor = page['next_cursor']
+            if not cursor:
+                return ids, page
+
+    def test_pages_cover_legacy_order_without_gaps(self):
+        legacy = [row['id'] for row in self.client.get('/api/expenses', {'all': '1'}).json()]
+        expected = list(Expense.objects.order_by('-expense_date', '-id').values_list('id', flat=True))
+
+        ids, _ = self.fetch_all(limit=4)
+        self.assertEqual(ids, expected)
+        self.assertEqual(sorted(legacy), sorted(expected))
+
+    def test_fields_and_filters(self):
+        ids, page = self.fetch_all(company_code='A', fields='id,amount', date_from='2025-02-01', amount_min='20')
+        expected = Expense.objects.filter(company_code='A', expense_date__gte='2025-02-01', amount__gte=20)
+
+        self.assertEqual(sorted(ids), sorted(expected.values_list('id', flat=True)))
+        self.assertEqual(set(page['results'][0]), {'id', 'amount'})
+
+    def test_invalid_parameters(self):
+        for params in ({'fields': 'id,senha'}, {'cursor': '!!'}, {'limit': '0'}, {'date_to': '31/12/2025'},
+                       {'amount_min': 'NaN'}, {'amount_max': 'Infinity'}, {'amount_min': '-inf'}):
+            self.assertEqual(self.client.get('/api/expenses', params).status_code, 400)
+
+    def test_streaming_formats_match_paginated_listing(self):
+        expected, _ = self.fetch_all(company_code='A', limit=1000)
+
+        response = self.client.get('/api/expenses', {'stream': 'json', 'company_code': 'A'})
+        self.assertTrue(response.streaming)
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([row['id'] for row in rows], expected)
+
+        response = self.client.get('/api/expenses', {'stream': 'ndjson', 'company_code': 'A', 'fields': 'id'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [{'id': i} for i in expected])
+
+        empty = self.client.get('/api/expenses', {'stream': 'json', 'company_code': 'Z'})
+        self.assertEqual(b''.join(empty.streaming_content), b'[]')
+        self.assertEqual(self.client.get('/api/expenses', {'stream': 'xml'}).status_code, 400)
+
+    def test_async_iteration_consumes_in_batches(self):
+        consumed = []
+
+        def parts():
+            for i in range(5):
+                consumed.append(i)
+                yield str(i).encode()
+
+        async def collect():
+            received = []
+            async for part in expense_listing.aiterate(parts(), batch=2):
+                # Lotes de 2: o gerador nunca está mais de um lote à frente
+                self.assertLessEqual(len(consumed) - len(received), 2)
+                received.append(part)
+            return received
+
+        self.assertEqual(asyncio.run(collect()), [b'0', b'1', b'2', b'3', b'4'])
+
+
+class ExpenseWriterTests(TransactionTestCase):
+    """Gravação agrupada de lançamentos e PRAGMAs das conexões SQLite"""
+
+    def test_connections_receive_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], DEFAULT_SQLITE_PRAGMAS['busy_timeout'])
+
+    def test_concurrent_writes_share_transactions(self):
+        writer = ExpenseWriter(window=0.05)
+        self.addCleanup(writer.stop)
+        futures = [
+            writer.submit(company_code=code, company_name=f'Empresa {code}', amount=10,
+                          expense_date='2025-01-10', created_by='teste')
+            for code in ['A'] * 30 + ['B'] * 10
+        ]
+        results = [future.result(timeout=10) for future in futures]
+
+        self.assertLess(writer.batches, len(futures))
+        self.assertEqual(Expense.objects.count(), 40)
+        self.assertEqual(results[-1][1], 100)
+        self.assertEqual(ExpenseTotal.objects.get(company_code='A').count, 30)
+        self.assertEqual(CompanyAdjustment.objects.get(company_code='A').spent_value, 300)
+        self.assertEqual(CompanyAdjustment.objects.get(company_code='B').spent_value, 100)
+
+        # Valor inválido falha sozinho; os demais lançamentos do lote são gravados
+        invalid = writer.submit(company_code='A', company_name='Empresa A', amount='x', expense_date='2025-01-10')
+        valid = writer.submit(company_code='B', company_name='Empresa B', amount=5, expense_date='2025-01-10')
+        with self.assertRaises(Exception):
+            invalid.result(timeout=10)
+        self.assertEqual(valid.result(timeout=10)[1], 105)
+
+    def test_concurrent_inserts_do_not_fail_with_database_locked(self):
+        # Banco em arquivo (o de testes fica em memória) com as mesmas OPTIONS e PRAGMAs do padrão
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        alias = 'concurrent_inserts'
+        settings_dict = dict(connections.databases['default'])
+        settings_dict.update({'NAME': os.path.join(tmp, 'db.sqlite3'), 'PRAGMAS': DEFAULT_SQLITE_PRAGMAS})
+        connections.databases[alias] = settings_dict
+        self.addCleanup(connections.databases.pop, alias)
+        patcher = mock.patch.object(type(self), 'databases', self.databases | {alias})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        call_command('migrate', database=alias, verbosity=0)
+        connections[alias].close()
+
+        errors = []
+
+        def write(numbers):
+            for number in numbers:
+                try:
+                    create_expense(using=alias, company_code=f'{number % 4}', company_name='Empresa',
+                                   amount=10, expense_date='2025-01-10', description=f'Lançamento {number}')
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    # Como ao fim de uma requisição (CONN_MAX_AGE = 0)
+                    connections[alias].close()
+
+        threads = [threading.Thread(target=write, args=(range(start, 160, 8),)) for start in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Expense.objects.using(alias).count(), 160)
+        self.assertEqual(ExpenseTotal.objects.using(alias).get(company_code='0').count, 40)
+        self.assertEqual(CompanyAdjustment.objects.using(alias).get(company_code='0').spent_value, 400)
+        connections[alias].close()
+
+
+class ExpenseImportTests(TestCase):
+    """Importação em lote: tudo ou nada, totais recalculados e uma só publicação"""
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        self.tmp = tmp
+        override = self.settings(SNAPSHOT_DB=os.path.join(tmp, 'snapshot.sqlite3'))
+        override.enable()
+        self.addCleanup(override.disable)
+
+        patcher = mock.patch.object(views, 'current_snapshot', Snapshot.empty())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ingest, 'broadcast')
+        self.broadcast = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        table = CompanyTable(['A', 'B'], ['Alfa', 'Beta'], [1000.0, 1000.0], [0.0, 0.0])
+        ingest.publish_table(ingest.get_snapshot_store(), table, 'a.xlsm')
+        self.broadcast.reset_mock()
+
+        token = jwt.encode({'user_id': 1, 'username': 'ana', 'full_name': 'Ana'}, settings.SECRET_KEY, algorithm='HS256')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def test_csv_upload_recomputes_totals_and_publishes_once(self):
+        content = (
+            'Código;Empresa;Valor;Data;Descrição\n'
+            'A;Alfa;1.234,50;10/01/2025;Material\n'
+            'A;Alfa;100;2025-02-01;\n'
+            '\n'
+            'B;Beta;900,00;2025-01-05;Serviço\n'
+        ).encode('utf-8')
+        upload = SimpleUploadedFile('lancamentos.csv', content, content_type='text/csv')
+
+        response = self.client.post('/api/expenses/import', {'file': upload}, **self.auth)
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['imported'], 3)
+        self.assertEqual(ExpenseTotal.objects.get(company_code='A').total, Decimal('1334.50'))
+        self.assertEqual(CompanyAdjustment.objects.get(company_code='B').spent_value, 900)
+        self.assertEqual(Expense.objects.filter(created_by='Ana').count(), 3)
+
+        self.broadcast.assert_called_once()
+        companies = {c['code']: c for c in views.current_snapshot.companies}
+        self.assertEqual(companies['A']['spent_value'], 1334.5)
+        self.assertEqual(companies['B']['status'], 'warning')
+
+    def test_invalid_rows_import_nothing(self):
+        content = json.dumps([
+            {'company_code': 'A', 'company_name': 'Alfa', 'amount': 10, 'expense_date': '2025-01-01'},
+            {'company_code': 'A', 'company_name': 'Alfa', 'amount': 'dez', 'expense_date': '2025-01-01'},
+            {'company_code': '', 'company_name': 'Beta', 'amount': 5, 'expense_date': '31/02/2025'},
+        ])
+
+        response = self.client.post('/api/expenses/import', content, content_type='application/json', **self.auth)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['line'] for error in response.json()['errors']], [2, 3])
+        self.assertFalse(Expense.objects.exists())
+        self.assertFalse(ExpenseTotal.objects.exists())
+        self.broadcast.assert_not_called()
+
+    def test_thousands_without_decimal_comma_are_rejected(self):
+        parse = expense_import._parse_amount
+        self.assertEqual(parse('1.234,00'), Decimal('1234.00'))
+        self.assertEqual(parse('1234'), Decimal('1234.00'))
+        self.assertEqual(parse('12.5'), Decimal('12.50'))
+        for value in ('1.234', 'R$ 1.234', '-12.345.678'):
+            with self.assertRaisesRegex(ValueError, 'ambíguo'):
+                parse(value)
+
+    def test_rows_are_validated_before_the_transaction(self):
+        consumed = []
+
+        def rows():
+            for i in range(5):
+                consumed.append(i)
+                yield i + 1, {'company_code': 'A', 'company_name': 'Alfa', 'amount': 10, 'expense_date': '2025-01-01'}
+
+        atomic = transaction.atomic
+
+        def checked_atomic(*args, **kwargs):
+            # A trava de escrita só é pedida depois de o arquivo inteiro ser validado
+            self.assertEqual(len(consumed), 5)
+            return atomic(*args, **kwargs)
+
+        with mock.patch.object(expense_import.transaction, 'atomic', side_effect=checked_atomic) as opened:
+            result = expense_import.import_expenses(rows(), dry_run=True)
+            opened.assert_not_called()
+            self.assertEqual(result, {'imported': 0, 'companies': {}, 'rows': 5})
+
+            consumed.clear()
+            result = expense_import.import_expenses(rows(), chunk_size=2)
+        self.assertEqual(result['imported'], 5)
+        self.assertEqual(ExpenseTotal.objects.get(company_code='A').total, Decimal('50.00'))
+
+    def test_json_array_is_read_in_blocks(self):
+        items = [{'Código': f'C{i}', 'Empresa': 'Ação', 'Valor': 10 ** 12 + i, 'Data': '2025-01-01'} for i in range(40)]
+        content = json.dumps(items, ensure_ascii=False, indent=1).encode('utf-8')
+        with mock.patch.object(expense_import, 'JSON_BLOCK_SIZE', 7):
+            rows = list(expense_import.read_rows(io.BytesIO(content), 'json'))
+            self.assertEqual([line for line, _ in rows], list(range(1, 41)))
+            self.assertEqual(rows[-1][1], {'company_code': 'C39', 'company_name': 'Ação',
+                                           'amount': 10 ** 12 + 39, 'expense_date': '2025-01-01'})
+
+            with self.assertRaises(expense_import.ImportValidationError) as raised:
+                list(expense_import.read_rows(io.BytesIO(b'[{"amount": 1}, {"amount": ]'), 'json'))
+            self.assertEqual(raised.exception.errors[0][0], 2)
+
+    def test_spent_values_are_reapplied_over_concurrent_publish(self):
+        publish_table = ingest.publish_table
+        newer = CompanyTable(['A', 'B', 'C'], ['Alfa', 'Beta', 'Gama'], [1000.0] * 3, [0.0] * 3)
+
+        def publish_with_race(store, table, file_path, expected_version=None):
+            # Um workbook novo é publicado entre a leitura e a publicação da importação
+            if publish.call_count == 1:
+                publish_table(store, newer, 'b.xlsm')
+            return publish_table(store, table, file_path, expected_version)
+
+        with mock.patch.object(ingest, 'publish_table', side_effect=publish_with_race) as publish:
+            self.assertTrue(ingest.publish_spent_values({'A': 250}))
+
+        self.assertEqual(publish.call_count, 2)
+        companies = {c['code']: c for c in views.current_snapshot.companies}
+        self.assertEqual(sorted(companies), ['A', 'B', 'C'])
+        self.assertEqual(companies['A']['spent_value'], 250)
+        self.assertEqual(views.current_snapshot.file_path, 'b.xlsm')
+
+    def test_command_imports_xlsx_in_chunks(self):
+        path = os.path.join(self.tmp, 'lancamentos.xlsx')
+        wb = Workbook()
+        wb.active.append(['company_code', 'company_name', 'amount', 'expense_date', 'notes'])
+        for i in range(25):
+            wb.active.append([1000 + i % 3, f'Empresa {i % 3}', 2.5, datetime(2025, 3, 1 + i), None])
+        wb.save(path)
+
+        call_command('import_expenses', path, '--dry-run', stdout=io.StringIO())
+        self.assertFalse(Expense.objects.exists())
+
+        call_command('import_expenses', path, '--chunk-size', '10', stdout=io.StringIO())
+        self.assertEqual(Expense.objects.count(), 25)
+        self.assertEqual(ExpenseTotal.objects.get(company_code='1000').count, 9)
+        self.assertEqual(ExpenseTotal.objects.get(company_code='1000').last_expense_date.isoformat(), '2025-03-25')
+
+
+class SearchTests(TestCase):
+    """Busca sem acentos em empresas (índice do snapshot) e lançamentos (FTS5)"""
+
+    def setUp(self):
+        patcher = mock.patch.object(views, 'current_snapshot', Snapshot.empty())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ingest, 'broadcast')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        table = CompanyTable(
+            ['SAO1', '2001', '3001', '4001'],
+            ['Construtora São João', 'Associação Comercial', 'João Serviços', 'Limpeza Ltda'],
+            [100.0] * 4, [10.0] * 4
+        )
+        ingest.apply_snapshot(Snapshot(1, table.to_dicts(), table.statistics()))
+
+    def test_company_search_is_accent_folded_and_ranked(self):
+        data = self.client.get('/api/search?q=joao&type=companies').json()
+        self.assertEqual([(c['code'], c['match']) for c in data['companies']],
+                         [('3001', 'name_prefix'), ('SAO1', 'word_prefix')])
+
+        data = self.client.get('/api/search?q=SAO&type=companies').json()
+        self.assertEqual([(c['code'], c['match']) for c in data['companies']], [('SAO1', 'code_prefix')])
+        self.assertEqual(self.client.get('/api/search?q=ciação com&type=companies').json()['companies'][0]['code'], '2001')
+        self.assertEqual(self.client.get('/api/search?q=').status_code, 400)
+
+    def test_expense_search_follows_writes(self):
+        first = Expense.objects.create(company_code='A', company_name='Alfa', amount=10, expense_date='2025-01-10',
+                                       description='Manutenção do elevador')
+        Expense.objects.create(company_code='A', company_name='Alfa', amount=20, expense_date='2025-01-11',
+                               description='Peças', notes='manutenção preventiva')
+        Expense.objects.bulk_create([
+            Expense(company_code='B', company_name='Beta', amount=5, expense_date='2025-02-01',
+                    description='Manutenções diversas "urgente" OR*')
+        ])
+
+        search = lambda query: [e['description'] for e in
+                                self.client.get('/api/search', {'q': query, 'type': 'expenses'}).json()['expenses']]
+        # Prefixo na última palavra, sem acentos; descrição pesa mais que observações
+        self.assertEqual(search('manutenc'), ['Manutenção do elevador', 'Manutenções diversas "urgente" OR*', 'Peças'])
+        self.assertEqual(search('"urgente" OR'), ['Manutenções diversas "urgente" OR*'])
+
+        first.description = 'Troca de lâmpadas'
+        first.save()
+        self.assertEqual(search('lampada'), ['Troca de lâmpadas'])
+        first.delete()
+        self.assertEqual(search('lampada'), [])
+
+
+class ExportCacheTests(TestCase):
+    """Relatórios reaproveitados por versão dos dados da empresa e pasta limitada"""
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        self.tmp = tmp
+        override = self.settings(EXPORT_CACHE_DIR=tmp)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        table = CompanyTable(['A'], ['Alfa'], [1000.0], [0.0])
+        patcher = mock.patch.object(views, 'current_snapshot', Snapshot(1, table.to_dicts(), table.statistics()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _download(self):
+        with mock.patch.object(views.exporter, 'export_company_expenses',
+                               wraps=views.exporter.export_company_expenses) as export:
+            response = self.client.get('/api/download/expenses/A')
+            self.assertEqual(response.status_code, 200)
+            b''.join(response.streaming_content)
+            response.close()
+        return export.call_count
+
+    def test_repeated_download_reuses_file_until_data_changes(self):
+        Expense.objects.create(company_code='A', company_name='Alfa', amount=10, expense_date='2025-01-10')
+        self.assertEqual(self._download(), 1)
+        self.assertEqual(self._download(), 0)
+        self.assertEqual(len(os.listdir(self.tmp)), 1)
+
+        expense = Expense.objects.create(company_code='A', company_name='Alfa', amount=5, expense_date='2025-01-11')
+        self.assertEqual(self._download(), 1)
+        expense.description = 'Corrigido'
+        expense.save()
+        self.assertEqual(self._download(), 1)
+        CompanyAdjustment.objects.create(company_code='A', company_name='Alfa', contract_value=2000)
+        self.assertEqual(self._download(), 1)
+        self.assertEqual(self._download(), 0)
+
+    def test_prune_removes_stale_and_least_recently_used(self):
+        cache = ExportCache(self.tmp, max_bytes=250, max_age=3600)
+        now = datetime.now().timestamp()
+        for name, age in (('Movimentos_A_20240101_000000.xlsx', 7200), ('Movimentos_B_1.xlsx', 30),
+                          ('Movimentos_C_1.xlsx', 20), ('Movimentos_D_1.xlsx', 10), ('outro.txt', 7200)):
+            path = os.path.join(self.tmp, name)
+            with open(path, 'wb') as f:
+                f.write(b'x' * 100)
+            os.utime(path, (now - age, now - age))
+
+        self.assertEqual(cache.prune(), 2)
+        self.assertEqual(sorted(os.listdir(self.tmp)), ['Movimentos_C_1.xlsx', 'Movimentos_D_1.xlsx', 'outro.txt'])
@@ -29,9 +29,14 @@ urlpatterns = [
     
     # API - Data
     path('api/data', views.get_data, name='api_data'),
+    path('api/ingest/status', views.get_ingest_status, name='api_ingest_status'),
+    path('api/companies', views.get_companies, name='api_companies'),
+    path('api/companies/<str:company_code>', views.get_company, name='api_company'),
+    path('api/search', views.search, name='api_search'),
     
     # API - Expenses
     path('api/expenses', expenses_view, name='api_expenses'),
+    path('api/expenses/import', views.import_expenses, name='api_import_expenses'),
     path('api/expenses/<int:expense_id>', views.delete_expense, name='api_delete_expense'),
     path('api/download/expenses/<str:company_code>', views.download_expenses, name='api_download_expenses'),
     
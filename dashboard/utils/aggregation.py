@@ -0,0 +1,278 @@
+"""
+Agregação dos valores liquidados por código
+Soma exata, quantidade de linhas, mínimo, máximo e último valor de cada código,
+calculados em lote (NumPy) sobre as colunas de código e valor
+"""
+
+from array import array
+from itertools import repeat
+from typing import Any, Dict, Iterable, List, Tuple
+import math
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele a agregação é feita linha a linha
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+def add_exact(partials: List[float], value: float) -> None:
+    """
+    Acumula um valor em uma soma exata (algoritmo de Shewchuk, o mesmo do
+    math.fsum). O total é math.fsum(partials) e não depende da ordem em que
+    os valores e as somas parciais são combinados.
+    """
+    i = 0
+    for partial in partials:
+        if abs(value) < abs(partial):
+            value, partial = partial, value
+        high = value + partial
+        low = partial - (high - value)
+        if low:
+            partials[i] = low
+            i += 1
+        value = high
+    partials[i:] = [value]
+
+
+def exact_partials(values: List[float]) -> List[float]:
+    """
+    Soma exata de uma lista de valores como lista de parcelas cuja soma real
+    é exatamente a soma dos valores (mesmo contrato de add_exact)
+
+    Cada math.fsum é correto até o arredondamento; o resíduo é somado de novo
+    até zerar, o que em geral leva uma ou duas passadas.
+    """
+    partials: List[float] = []
+    remaining = list(values)
+    while True:
+        total = math.fsum(remaining)
+        if not total:
+            return partials
+        partials.append(total)
+        remaining.append(-total)
+
+
+class LiquidacaoTotals:
+    """Agregados por código (colunas paralelas, na ordem de primeira aparição)"""
+
+    def __init__(self):
+        self.codes: List[str] = []
+        self.partials: List[List[float]] = []
+        self.counts = array('q')
+        self.mins = array('d')
+        self.maxs = array('d')
+        self.lasts = array('d')
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def totals(self) -> Dict[str, float]:
+        """Dicionário código -> total liquidado"""
+        return {code: math.fsum(partials) for code, partials in zip(self.codes, self.partials)}
+
+    def rows(self) -> int:
+        """Quantidade de linhas válidas agregadas"""
+        return sum(self.counts)
+
+    @classmethod
+    def merge(cls, parts: Iterable['LiquidacaoTotals']) -> 'LiquidacaoTotals':
+        """
+        Combina agregados de faixas de linhas (etapa de redução)
+
+        Args:
+            parts: Agregados na ordem das linhas da aba
+
+        Returns:
+            Agregado equivalente ao de todas as linhas de uma vez
+        """
+        merged = cls()
+        index: Dict[str, int] = {}
+        for part in parts:
+            for i, code in enumerate(part.codes):
+                row = index.get(code)
+                if row is None:
+                    index[code] = len(merged.codes)
+                    merged.codes.append(code)
+                    merged.partials.append(list(part.partials[i]))
+                    merged.counts.append(part.counts[i])
+                    merged.mins.append(part.mins[i])
+                    merged.maxs.append(part.maxs[i])
+                    merged.lasts.append(part.lasts[i])
+                else:
+                    merged.partials[row].extend(part.partials[i])
+                    merged.counts[row] += part.counts[i]
+                    merged.mins[row] = min(merged.mins[row], part.mins[i])
+                    merged.maxs[row] = max(merged.maxs[row], part.maxs[i])
+                    merged.lasts[row] = part.lasts[i]
+        return merged
+
+
+def collect_liquidacao(rows: Iterable[Tuple[Any, ...]]) -> Tuple[List[str], array, array]:
+    """
+    Normaliza as linhas (Código, Valor Liquidado) em colunas
+
+    Returns:
+        Tupla (códigos distintos na ordem de aparição, id do código por
+        linha, valor por linha) apenas para linhas com código e valor > 0
+    """
+    index: Dict[str, int] = {}
+    ids = array('q')
+    values = array('d')
+
+    for codigo, valor in rows:
+        # Pular linhas vazias
+        if not codigo or not valor:
+            continue
+        codigo = str(codigo).strip()
+        if not codigo or not isinstance(valor, (int, float)):
+            continue
+
+        try:
+            valor_float = float(valor)
+        except (ValueError, TypeError) as e:
+            logger.debug(f"Erro ao processar valor: {e}")
+            continue
+        if valor_float > 0:
+            code_id = index.get(codigo)
+            if code_id is None:
+                code_id = index[codigo] = len(index)
+            ids.append(code_id)
+            values.append(valor_float)
+
+    return list(index), ids, values
+
+
+def aggregate_liquidacao(rows: Iterable[Tuple[Any, ...]]) -> LiquidacaoTotals:
+    """
+    Agrega os valores liquidados por código
+
+    Args:
+        rows: Linhas projetadas (Código, Valor Liquidado)
+
+    Returns:
+        Agregados por código
+    """
+    if np is None:
+        codes, ids, values = collect_liquidacao(rows)
+    else:
+        codes, ids, values = _collect_numpy(rows)
+    result = LiquidacaoTotals()
+    result.codes = codes
+    if not codes:
+        return result
+
+    if np is None:
+        _aggregate_loop(result, ids, values)
+    else:
+        _aggregate_numpy(result, ids, values)
+
+    logger.debug(f"Liquidação agregada: {len(values)} lançamentos em {len(codes)} códigos")
+    return result
+
+
+def _collect_numpy(rows: Iterable[Tuple[Any, ...]]):
+    """
+    Mesmo resultado de collect_liquidacao, com as colunas filtradas e os
+    códigos fatorados (np.unique) em lote
+
+    Returns:
+        Tupla (códigos distintos na ordem de aparição, id do código por linha
+        em int64, valor por linha em float64)
+    """
+    table = np.array(list(rows), dtype=object)
+    if not table.size:
+        return [], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    codes, values = table[:, 0], table[:, 1]
+
+    # Código presente e valor numérico (int/float, como em collect_liquidacao)
+    numeric = np.fromiter(map(isinstance, values, repeat((int, float))), dtype=bool, count=len(values))
+    keep = np.fromiter(map(bool, codes), dtype=bool, count=len(codes)) & numeric
+    amounts = values[keep].astype(np.float64)
+    positive = amounts > 0
+    labels = np.char.strip(codes[keep][positive].astype(str))
+    filled = labels != ''
+    labels, amounts = labels[filled], amounts[positive][filled]
+    if not labels.size:
+        return [], np.empty(0, dtype=np.int64), amounts
+
+    # np.unique ordena os códigos; renumerar na ordem de primeira aparição
+    unique, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return unique[order].tolist(), rank[inverse.ravel()], amounts
+
+
+def _aggregate_numpy(result: LiquidacaoTotals, ids, values) -> None:
+    """Agregação vetorizada: ordena por código e reduz cada grupo de uma vez"""
+    code_ids = np.asarray(ids, dtype=np.int64)
+    amounts = np.asarray(values, dtype=np.float64)
+
+    counts = np.bincount(code_ids, minlength=len(result.codes))
+    order = np.argsort(code_ids, kind='stable')
+    grouped = amounts[order]
+    ends = np.cumsum(counts)
+    starts = ends - counts
+
+    result.counts = array('q', counts.astype(np.int64).tobytes())
+    result.mins = array('d', np.minimum.reduceat(grouped, starts).tobytes())
+    result.maxs = array('d', np.maximum.reduceat(grouped, starts).tobytes())
+    # Ordenação estável: o último de cada grupo é o último na ordem das linhas
+    result.lasts = array('d', grouped[ends - 1].tobytes())
+    result.partials = _exact_sums_numpy(grouped, starts, counts)
+
+
+def _exact_sums_numpy(grouped, starts, counts) -> List[List[float]]:
+    """
+    Soma exata de cada grupo (valores já ordenados por código) como parcelas,
+    com o mesmo contrato de exact_partials
+
+    Extração de Rump, Ogita e Oishi (AccSum): com sigma = 2^k >= (n + 2) *
+    max|x| do grupo, q = (sigma + x) - sigma é a parte alta de x e a soma dos
+    q (np.add.reduceat) não tem erro de arredondamento; o resto x - q também
+    é exato e é somado na passada seguinte, até zerar. Cada passada é
+    vetorizada sobre todos os grupos.
+    """
+    bits = np.ceil(np.log2(counts + 2)).astype(np.int64)
+    residual = grouped
+    sums = []
+    while True:
+        largest = np.maximum.reduceat(np.abs(residual), starts)
+        if not largest.any():
+            break
+        _, exponent = np.frexp(largest)
+        if (exponent + bits).max() >= 1024:
+            # sigma não cabe em float64 (valores perto do limite): soma exata grupo a grupo
+            values = grouped.tolist()
+            return [exact_partials(values[start:start + count])
+                    for start, count in zip(starts.tolist(), counts.tolist())]
+        sigma = np.repeat(np.where(largest > 0, np.ldexp(1.0, exponent + bits), 0.0), counts)
+        high = (sigma + residual) - sigma
+        sums.append(np.add.reduceat(high, starts))
+        residual = residual - high
+
+    if not sums:
+        return [[] for _ in range(len(counts))]
+    return [[value for value in column if value] for column in np.column_stack(sums).tolist()]
+
+
+def _aggregate_loop(result: LiquidacaoTotals, ids: array, values: array) -> None:
+    """Agregação linha a linha (sem NumPy)"""
+    size = len(result.codes)
+    result.partials = [[] for _ in range(size)]
+    result.counts = array('q', [0] * size)
+    result.mins = array('d', [math.inf] * size)
+    result.maxs = array('d', [-math.inf] * size)
+    result.lasts = array('d', [0.0] * size)
+
+    for code_id, value in zip(ids, values):
+        add_exact(result.partials[code_id], value)
+        result.counts[code_id] += 1
+        if value < result.mins[code_id]:
+            result.mins[code_id] = value
+        if value > result.maxs[code_id]:
+            result.maxs[code_id] = value
+        result.lasts[code_id] = value
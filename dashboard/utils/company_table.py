@@ -0,0 +1,225 @@
+"""
+Tabela colunar de empresas
+Códigos e nomes internados e valores em array('d'); os dicionários por
+empresa só são montados na borda da API (to_dicts)
+"""
+
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+import math
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele os cálculos usam laços simples
+    np = None
+
+# Limites (percentual utilizado) de cada status
+STATUS_CRITICAL_ABOVE = 90
+STATUS_WARNING_ABOVE = 70
+
+STATUSES = ('ok', 'warning', 'critical')
+
+
+class CompanyTable:
+    """Empresas em colunas paralelas (código, nome, valor do contrato, valor gasto)"""
+
+    def __init__(self, codes: Optional[Iterable[str]] = None, names: Optional[Iterable[str]] = None,
+                 contract_values: Optional[Iterable[float]] = None, spent_values: Optional[Iterable[float]] = None,
+                 spent_by_year: Optional[Dict[int, Iterable[float]]] = None):
+        self.codes: List[str] = [sys.intern(str(code)) for code in codes or ()]
+        self.names: List[str] = [sys.intern(str(name)) for name in names or ()]
+        self.contract_values = array('d', contract_values or ())
+        self.spent_values = array('d', spent_values or ())
+        # Valor liquidado de cada ano (uma coluna por aba LIQUIDAÇÃO)
+        self.spent_by_year: Dict[int, array] = {
+            int(year): array('d', values) for year, values in sorted((spent_by_year or {}).items())
+        }
+        if not (len(self.codes) == len(self.names) == len(self.contract_values) == len(self.spent_values)):
+            raise ValueError("Colunas da tabela de empresas com tamanhos diferentes")
+        if any(len(values) != len(self.codes) for values in self.spent_by_year.values()):
+            raise ValueError("Colunas da tabela de empresas com tamanhos diferentes")
+
+        self._index: Dict[str, int] = {code: row for row, code in enumerate(self.codes)}
+        self._percentages: Optional[array] = None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._index
+
+    def index_of(self, code: str) -> Optional[int]:
+        """Linha da empresa com o código informado (ou None)"""
+        return self._index.get(code)
+
+    def set(self, code: str, name: str, contract_value: float, spent_value: float = 0) -> None:
+        """Inclui a empresa ou substitui os dados de um código já existente (mantendo a posição)"""
+        row = self._index.get(code)
+        if row is None:
+            self._index[sys.intern(code)] = len(self.codes)
+            self.codes.append(sys.intern(code))
+            self.names.append(sys.intern(name))
+            self.contract_values.append(contract_value)
+            self.spent_values.append(spent_value)
+            for values in self.spent_by_year.values():
+                values.append(0.0)
+        else:
+            self.names[row] = sys.intern(name)
+            self.contract_values[row] = contract_value
+            self.spent_values[row] = spent_value
+        self._percentages = None
+
+    def set_contract(self, row: int, contract_value: float) -> None:
+        """Atualiza o valor do contrato de uma linha"""
+        self.contract_values[row] = contract_value
+        self._percentages = None
+
+    def set_spent(self, row: int, spent_value: float) -> None:
+        """Atualiza o valor gasto de uma linha"""
+        self.spent_values[row] = spent_value
+        self._percentages = None
+
+    def add_year(self, year: int) -> None:
+        """Cria a coluna (zerada) de valores liquidados do ano, se ainda não existir"""
+        if year not in self.spent_by_year:
+            self.spent_by_year[year] = array('d', bytes(8 * len(self.codes)))
+            self.spent_by_year = dict(sorted(self.spent_by_year.items()))
+
+    def remove_year(self, year: int) -> None:
+        """Remove a coluna de valores liquidados do ano"""
+        self.spent_by_year.pop(year, None)
+
+    def set_year_spent(self, row: int, year: int, spent_value: float) -> None:
+        """Atualiza o valor liquidado de uma linha em um ano"""
+        self.add_year(year)
+        self.spent_by_year[year][row] = spent_value
+
+    def copy(self) -> 'CompanyTable':
+        """Cópia da tabela (as colunas de valores são copiadas; strings são compartilhadas)"""
+        table = CompanyTable.__new__(CompanyTable)
+        table.codes = list(self.codes)
+        table.names = list(self.names)
+        table.contract_values = array('d', self.contract_values)
+        table.spent_values = array('d', self.spent_values)
+        table.spent_by_year = {year: array('d', values) for year, values in self.spent_by_year.items()}
+        table._index = dict(self._index)
+        table._percentages = self._percentages
+        return table
+
+    def sorted_by_name(self) -> 'CompanyTable':
+        """Nova tabela ordenada por nome (ordenação estável)"""
+        order = sorted(range(len(self.codes)), key=self.names.__getitem__)
+        return self.take(order)
+
+    def take(self, rows: Iterable[int]) -> 'CompanyTable':
+        """Nova tabela apenas com as linhas informadas, na ordem dada"""
+        rows = list(rows)
+        codes, names = self.codes, self.names
+        contract_values, spent_values = self.contract_values, self.spent_values
+        return CompanyTable(
+            [codes[row] for row in rows],
+            [names[row] for row in rows],
+            [contract_values[row] for row in rows],
+            [spent_values[row] for row in rows],
+            {year: [values[row] for row in rows] for year, values in self.spent_by_year.items()}
+        )
+
+    def percentages(self) -> array:
+        """
+        Percentual utilizado de cada empresa, arredondado em 2 casas
+
+        A divisão é vetorizada (NumPy, quando disponível); o arredondamento usa
+        round() para manter exatamente os valores exibidos até aqui.
+        """
+        if self._percentages is None:
+            if np is not None and len(self.codes):
+                contract = np.frombuffer(self.contract_values, dtype=np.float64)
+                spent = np.frombuffer(self.spent_values, dtype=np.float64)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    raw = np.where(contract > 0, spent / contract * 100, 0.0).tolist()
+            else:
+                raw = [
+                    spent / contract * 100 if contract > 0 else 0.0
+                    for contract, spent in zip(self.contract_values, self.spent_values)
+                ]
+            self._percentages = array('d', [round(value, 2) for value in raw])
+        return self._percentages
+
+    def status_codes(self) -> array:
+        """Status de cada empresa como índice em STATUSES (0=ok, 1=warning, 2=critical)"""
+        percentages = self.percentages()
+        if np is not None and len(percentages):
+            values = np.frombuffer(percentages, dtype=np.float64)
+            codes = (values > STATUS_WARNING_ABOVE).astype(np.int8) + (values > STATUS_CRITICAL_ABOVE)
+            return array('b', codes.tobytes())
+        return array('b', [
+            2 if value > STATUS_CRITICAL_ABOVE else 1 if value > STATUS_WARNING_ABOVE else 0
+            for value in percentages
+        ])
+
+    def statuses(self) -> List[str]:
+        """Status de cada empresa ('ok', 'warning' ou 'critical')"""
+        return [STATUSES[code] for code in self.status_codes()]
+
+    def years(self) -> List[int]:
+        """Anos com valores liquidados, em ordem crescente"""
+        return list(self.spent_by_year)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Lista de dicionários por empresa (formato da API)"""
+        years = [str(year) for year in self.spent_by_year]
+        by_year = list(zip(*self.spent_by_year.values())) if years else [()] * len(self.codes)
+        return [
+            {
+                'code': code,
+                'name': name,
+                'contract_value': contract_value,
+                'spent_value': spent_value,
+                'spent_by_year': dict(zip(years, year_values)),
+                'percentage': percentage,
+                'status': status
+            }
+            for code, name, contract_value, spent_value, year_values, percentage, status in zip(
+                self.codes, self.names, self.contract_values, self.spent_values, by_year,
+                self.percentages(), self.statuses()
+            )
+        ]
+
+    def statistics(self) -> Dict[str, Any]:
+        """Estatísticas gerais (formato de ExcelProcessor.get_statistics mais o total gasto por ano)"""
+        if not self.codes:
+            return {
+                'total_contracted': 0,
+                'total_spent': 0,
+                'average_utilization': 0,
+                'companies_count': 0,
+                'spent_by_year': {}
+            }
+
+        total_contracted = math.fsum(self.contract_values)
+        total_spent = math.fsum(self.spent_values)
+        average_utilization = (total_spent / total_contracted * 100) if total_contracted > 0 else 0
+
+        return {
+            'total_contracted': total_contracted,
+            'total_spent': total_spent,
+            'average_utilization': round(average_utilization, 2),
+            'companies_count': len(self.codes),
+            'spent_by_year': {str(year): math.fsum(values) for year, values in self.spent_by_year.items()}
+        }
+
+    @classmethod
+    def from_dicts(cls, companies: Iterable[Dict[str, Any]]) -> 'CompanyTable':
+        """Monta a tabela a partir de dicionários no formato da API"""
+        companies = list(companies)
+        return cls(
+            [c['code'] for c in companies],
+            [c['name'] for c in companies],
+            [c['contract_value'] for c in companies],
+            [c['spent_value'] for c in companies],
+            {
+                int(year): [c.get('spent_by_year', {}).get(year, 0.0) for c in companies]
+                for year in sorted({year for c in companies for year in c.get('spent_by_year', {})})
+            }
+        )
@@ -4,53 +4,73 @@ Adaptado do excel_processor.py original
 """
 
 from openpyxl import load_workbook
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
+from operator import itemgetter
 from pathlib import Path
 import logging
+import time
+import tracemalloc
+
+from .aggregation import LiquidacaoTotals, aggregate_liquidacao
+from .company_table import CompanyTable
+from .excel_schema import WorkbookSchema
+from .ingest_scheduler import CancelToken, IngestCancelled
+from .xlsx_reader import XlsxReader
 
 logger = logging.getLogger(__name__)
 
+# Nomes das abas no layout padrão (as abas lidas vêm de settings.EXCEL_SCHEMA)
+SHEET_VALIDACOES = 'VALIDAÇÕES'
+SHEET_LIQUIDACAO = 'LIQUIDAÇÃO 2025'
 
-class CompanyData:
-    """Classe para armazenar dados de uma empresa"""
-    def __init__(self, code: str, name: str, contract_value: float, spent_value: float):
-        self.code = code
-        self.name = name
-        self.contract_value = contract_value
-        self.spent_value = spent_value
+# Colunas lidas da linha de cabeçalho para resolver a posição de cada campo
+HEADER_COLUMNS = 64
 
-    def to_dict(self) -> Dict[str, Any]:
-        """Converte para dicionário"""
-        percentage = (self.spent_value / self.contract_value * 100) if self.contract_value > 0 else 0
-        return {
-            'code': self.code,
-            'name': self.name,
-            'contract_value': self.contract_value,
-            'spent_value': self.spent_value,
-            'percentage': round(percentage, 2),
-            'status': self._get_status(percentage)
-        }
+# A cada quantas linhas o pedido de cancelamento é verificado
+CANCEL_CHECK_ROWS = 4096
 
-    @staticmethod
-    def _get_status(percentage: float) -> str:
-        """Retorna status baseado no percentual"""
-        if percentage > 90:
-            return 'critical'
-        elif percentage > 70:
-            return 'warning'
-        else:
-            return 'ok'
+# Modos de leitura suportados
+INGEST_MODES = ('full', 'streaming', 'xml', 'parallel')
 
 
 class ExcelProcessor:
     """Processador de arquivos Excel usando openpyxl"""
 
-    def __init__(self):
-        self.companies: Dict[str, CompanyData] = {}
+    def __init__(self, mode: str = 'full', profile: bool = False, workers: Optional[int] = None,
+                 schema: Optional[WorkbookSchema] = None):
+        """
+        Inicializa o processador
+
+        Args:
+            mode: 'full' carrega o workbook inteiro; 'streaming' abre em modo
+                somente leitura e percorre apenas as abas e colunas usadas;
+                'xml' lê o zip/XML diretamente, sem criar células do openpyxl;
+                'parallel' usa o leitor 'xml' em um pool de processos
+            profile: Se True, mede o pico de memória da ingestão (tracemalloc)
+            workers: Processos do modo 'parallel' (padrão: número de CPUs)
+            schema: Abas e colunas lidas (padrão: settings.EXCEL_SCHEMA)
+        """
+        if mode not in INGEST_MODES:
+            raise ValueError(f"Modo de leitura inválido: {mode}. Use um de {INGEST_MODES}")
+
+        self.mode = mode
+        self.profile = profile
+        self.schema = schema or WorkbookSchema.from_settings()
+        self.table = CompanyTable()
         self.last_data = {
             'companies': [],
             'statistics': {}
         }
+        self.last_stats: Dict[str, Any] = {}
+        # Agregados da última LIQUIDAÇÃO por ano (linhas, mínimo, máximo e último valor por código)
+        self.liquidacao_by_year: Dict[int, LiquidacaoTotals] = {}
+        self._rows_read = 0
+        self._cancel: Optional[CancelToken] = None
+        self.parallel = None
+
+        if mode == 'parallel':
+            from .parallel_ingest import ParallelIngestor
+            self.parallel = ParallelIngestor(workers)
 
     def process_file(self, file_path: str) -> List[Dict[str, Any]]:
         """
@@ -62,61 +82,201 @@ class ExcelProcessor:
         Returns:
             Lista de dicionários com dados das empresas
         """
-        try:
-            if not Path(file_path).exists():
-                logger.error(f"Arquivo não encontrado: {file_path}")
-                return []
+        return self.process_table(file_path).to_dicts()
 
-            # Carregar workbook
-            wb = load_workbook(file_path, data_only=True)
+    def process_table(self, file_path: str, cancel: Optional[CancelToken] = None) -> CompanyTable:
+        """
+        Processa arquivo Excel e retorna a tabela colunar de empresas
 
-            # Verificar se as abas existem
-            sheet_names = wb.sheetnames
-            
-            if 'VALIDAÇÕES' not in sheet_names:
-                logger.error(f"Aba 'VALIDAÇÕES' não encontrada. Abas disponíveis: {sheet_names}")
-                return []
+        Args:
+            file_path: Caminho do arquivo Excel
+            cancel: Token consultado durante a leitura (ver IngestScheduler)
 
-            if 'LIQUIDAÇÃO 2025' not in sheet_names:
-                logger.error(f"Aba 'LIQUIDAÇÃO 2025' não encontrada. Abas disponíveis: {sheet_names}")
-                return []
+        Returns:
+            Tabela de empresas ordenada por nome (vazia em caso de erro)
 
-            # Processar abas
-            self._process_validacoes(wb['VALIDAÇÕES'])
-            self._process_liquidacao(wb['LIQUIDAÇÃO 2025'])
+        Raises:
+            IngestCancelled: Se o cancelamento foi pedido durante a leitura
+        """
+        started_tracing = False
+        if self.profile and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        if self.profile:
+            tracemalloc.reset_peak()
 
-            # Converter para lista de dicionários
-            result = [company.to_dict() for company in self.companies.values()]
+        start = time.perf_counter()
+        self._rows_read = 0
+        self._cancel = cancel
+
+        try:
+            if not Path(file_path).exists():
+                logger.error(f"Arquivo não encontrado: {file_path}")
+                return CompanyTable()
+
+            # Carregar workbook
+            if self.mode in ('xml', 'parallel'):
+                wb = XlsxReader(file_path)
+            elif self.mode == 'streaming':
+                # Somente leitura: as abas são lidas linha a linha sob demanda
+                wb = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+            else:
+                wb = load_workbook(file_path, data_only=True)
+
+            try:
+                # Localizar as abas pelos padrões do esquema
+                sheet_names = wb.sheetnames
+                validacoes = self.schema.validacoes_sheet(sheet_names)
+                liquidacoes = self.schema.liquidacao_sheets(sheet_names)
+
+                if validacoes is None:
+                    logger.error(f"Aba '{self.schema.validacoes.pattern.pattern}' não encontrada. Abas disponíveis: {sheet_names}")
+                    return CompanyTable()
+
+                if not liquidacoes:
+                    logger.error(f"Aba '{self.schema.liquidacao.pattern.pattern}' não encontrada. Abas disponíveis: {sheet_names}")
+                    return CompanyTable()
+
+                # Colunas resolvidas pelo cabeçalho, uma vez por aba
+                validacoes_columns = self.schema.validacoes.resolve(validacoes, self._read_header(wb, validacoes))
+                if validacoes_columns is None:
+                    return CompanyTable()
+
+                plan = {}
+                for year, sheet_name in liquidacoes.items():
+                    columns = self.schema.liquidacao.resolve(sheet_name, self._read_header(wb, sheet_name))
+                    if columns is not None:
+                        plan[year] = (sheet_name, columns)
+
+                # Processar abas em uma tabela nova: cada arquivo começa do zero
+                table = CompanyTable()
+                if self.mode == 'parallel':
+                    self._process_parallel(file_path, (validacoes, validacoes_columns), plan, table)
+                else:
+                    # Modos seriais: as abas de anos uma depois da outra (threads não
+                    # aceleram a leitura, que mantém o GIL; ver modo 'parallel')
+                    self._process_validacoes(self._iter_rows(wb, validacoes, validacoes_columns), table)
+                    self._apply_liquidacao({
+                        year: self._process_liquidacao(sheet_name, self._iter_rows(wb, sheet_name, columns))
+                        for year, (sheet_name, columns) in plan.items()
+                    }, table)
+            finally:
+                # No modo somente leitura o arquivo fica aberto até o close()
+                wb.close()
+
+            # Só a tabela completa substitui a anterior (troca de referência)
+            self.table = table
 
             # Ordenar por nome
-            result.sort(key=lambda x: x['name'])
+            result = table.sorted_by_name()
 
             logger.info(f"Processadas {len(result)} empresas")
             return result
 
+        except IngestCancelled:
+            logger.info(f"Processamento cancelado: {file_path}")
+            raise
+
         except Exception as e:
             logger.error(f"Erro ao processar arquivo: {e}")
             import traceback
             traceback.print_exc()
-            return []
+            return CompanyTable()
+
+        finally:
+            self._cancel = None
+            self._record_stats(start, started_tracing)
+
+    def _read_header(self, wb, sheet_name: str) -> Tuple[Any, ...]:
+        """Valores da primeira linha da aba"""
+        if self.mode in ('xml', 'parallel'):
+            rows = wb.iter_rows(sheet_name, range(HEADER_COLUMNS))
+            try:
+                return next(rows, ())
+            finally:
+                rows.close()
+
+        for row in wb[sheet_name].iter_rows(min_row=1, max_row=1, values_only=True):
+            return row
+        return ()
+
+    def _iter_rows(self, wb, sheet_name: str, columns: Sequence[int]) -> Iterator[Tuple[Any, ...]]:
+        """
+        Percorre as linhas de dados da aba (sem o cabeçalho) retornando apenas
+        as colunas projetadas
+
+        Args:
+            wb: Workbook do openpyxl ou XlsxReader
+            sheet_name: Nome da aba
+            columns: Índices das colunas a manter (resolvidos pelo cabeçalho)
+
+        Returns:
+            Iterador de tuplas com os valores das colunas projetadas
+        """
+        if self.mode == 'xml':
+            # O leitor nativo já devolve as linhas projetadas
+            rows = wb.iter_rows(sheet_name, columns, min_row=2)
+        else:
+            # Limitar a leitura à última coluna usada; linhas curtas vêm
+            # completadas com None, então não há verificação por linha
+            project = itemgetter(*columns)
+            rows = map(project, wb[sheet_name].iter_rows(min_row=2, max_col=max(columns) + 1, values_only=True))
+
+        cancel = self._cancel
+        for row in rows:
+            self._rows_read += 1
+            if cancel is not None and not self._rows_read % CANCEL_CHECK_ROWS:
+                cancel.check()
+            yield row
+
+    def _process_parallel(self, file_path: str, validacoes: Tuple[str, Tuple[int, ...]],
+                          plan: Dict[int, Tuple[str, Tuple[int, ...]]], table: CompanyTable) -> None:
+        """Lê a VALIDAÇÕES e todas as abas de LIQUIDAÇÃO ao mesmo tempo no pool (a maior em lotes de linhas)"""
+        rows, by_year, rows_read = self.parallel.run(file_path, validacoes, plan, cancel=self._cancel)
+        self._rows_read += rows_read
+
+        self._process_validacoes(iter(rows), table)
+        self._apply_liquidacao(by_year, table)
+
+    def _record_stats(self, start: float, started_tracing: bool) -> None:
+        """Registra tempo, linhas/s e pico de memória da última ingestão"""
+        elapsed = time.perf_counter() - start
+        peak_memory = None
+        if self.profile and tracemalloc.is_tracing():
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+
+        self.last_stats = {
+            'mode': self.mode,
+            'rows': self._rows_read,
+            'elapsed': round(elapsed, 4),
+            'rows_per_sec': round(self._rows_read / elapsed, 1) if elapsed > 0 else 0,
+            'peak_memory': peak_memory
+        }
 
-    def _process_validacoes(self, ws) -> None:
-        """Processa aba VALIDAÇÕES"""
+        message = (f"Ingestão ({self.mode}): {self._rows_read} linhas em {elapsed:.2f}s "
+                   f"({self.last_stats['rows_per_sec']:.0f} linhas/s)")
+        if peak_memory is not None:
+            message += f", pico de memória {peak_memory / (1024 * 1024):.1f} MB"
+        logger.info(message)
+
+    def _process_validacoes(self, rows: Iterator[Tuple[Any, ...]], table: CompanyTable) -> None:
+        """
+        Processa aba VALIDAÇÕES
+
+        Args:
+            rows: Linhas projetadas (Código, Empresa, Valor Contrato)
+            table: Tabela do arquivo em processamento
+        """
         try:
             logger.info("Processando aba VALIDAÇÕES...")
             
             # Iterar sobre as linhas
-            for row_idx, row in enumerate(ws.iter_rows(values_only=True), 1):
-                if row_idx == 1:  # Pular cabeçalho
-                    continue
-                
-                if not row or len(row) < 7:
-                    continue
-
-                # Colunas: 0=Código, 1=Empresa, 6=Valor Contrato
-                codigo = str(row[0]).strip() if row[0] else ""
-                empresa = str(row[1]).strip() if row[1] else ""
-                valor = row[6] if row[6] else 0
+            for codigo, empresa, valor in rows:
+                codigo = str(codigo).strip() if codigo else ""
+                empresa = str(empresa).strip() if empresa else ""
+                valor = valor if valor else 0
 
                 # Pular linhas vazias
                 if not codigo or not empresa:
@@ -125,67 +285,65 @@ class ExcelProcessor:
                 try:
                     valor_float = float(valor) if isinstance(valor, (int, float)) else 0
                     if valor_float > 0:  # Só adicionar se tiver valor
-                        self.companies[codigo] = CompanyData(codigo, empresa, valor_float, 0)
+                        table.set(codigo, empresa, valor_float, 0)
                         logger.debug(f"Empresa adicionada: {codigo} - {empresa} - R${valor_float}")
                 except (ValueError, TypeError) as e:
                     logger.debug(f"Erro ao processar valor: {e}")
                     continue
 
-            logger.info(f"Total de empresas após VALIDAÇÕES: {len(self.companies)}")
+            logger.info(f"Total de empresas após VALIDAÇÕES: {len(table)}")
+
+        except IngestCancelled:
+            raise
 
         except Exception as e:
             logger.error(f"Erro ao processar VALIDAÇÕES: {e}")
             import traceback
             traceback.print_exc()
 
-    def _process_liquidacao(self, ws) -> None:
-        """Processa aba LIQUIDAÇÃO 2025"""
-        try:
-            logger.info("Processando aba LIQUIDAÇÃO 2025...")
-            
-            # Dicionário para acumular gastos por código
-            gastos_por_codigo = {}
-
-            # Iterar sobre as linhas
-            for row_idx, row in enumerate(ws.iter_rows(values_only=True), 1):
-                if row_idx == 1:  # Pular cabeçalho
-                    continue
-                
-                if not row or len(row) < 7:
-                    continue
-
-                # Colunas: 1=Código, 6=Valor Liquidado
-                codigo = str(row[1]).strip() if row[1] else ""
-                valor = row[6] if row[6] else 0
-
-                # Pular linhas vazias
-                if not codigo:
-                    continue
+    def _process_liquidacao(self, sheet_name: str, rows: Iterator[Tuple[Any, ...]]) -> LiquidacaoTotals:
+        """
+        Processa uma aba de LIQUIDAÇÃO
 
-                try:
-                    valor_float = float(valor) if isinstance(valor, (int, float)) else 0
-                    if valor_float > 0:
-                        if codigo not in gastos_por_codigo:
-                            gastos_por_codigo[codigo] = 0
-                        gastos_por_codigo[codigo] += valor_float
-                        logger.debug(f"Gasto registrado: {codigo} - R${valor_float}")
-                except (ValueError, TypeError) as e:
-                    logger.debug(f"Erro ao processar valor: {e}")
-                    continue
+        Args:
+            sheet_name: Nome da aba
+            rows: Linhas projetadas (Código, Valor Liquidado)
 
-            # Atualizar gastos nas empresas
-            for codigo, gasto in gastos_por_codigo.items():
-                if codigo in self.companies:
-                    company = self.companies[codigo]
-                    company.spent_value = gasto
-                    logger.debug(f"Gasto atualizado para {codigo}: R${gasto}")
+        Returns:
+            Agregados por código (vazio em caso de erro)
+        """
+        try:
+            logger.info(f"Processando aba {sheet_name}...")
+            # Colunas código/valor agregadas em lote (ver aggregation.py)
+            return aggregate_liquidacao(rows)
 
-            logger.info(f"Total de empresas após LIQUIDAÇÃO: {len(self.companies)}")
+        except IngestCancelled:
+            raise
 
         except Exception as e:
-            logger.error(f"Erro ao processar LIQUIDAÇÃO 2025: {e}")
+            logger.error(f"Erro ao processar {sheet_name}: {e}")
             import traceback
             traceback.print_exc()
+            return LiquidacaoTotals()
+
+    def _apply_liquidacao(self, by_year: Dict[int, LiquidacaoTotals], table: CompanyTable) -> None:
+        """Atualiza o valor gasto das empresas por ano e no total dos anos"""
+        self.liquidacao_by_year = by_year
+
+        for year, liquidacao in by_year.items():
+            table.add_year(year)
+            for codigo, gasto in liquidacao.totals().items():
+                row = table.index_of(codigo)
+                if row is not None:
+                    table.set_year_spent(row, year, gasto)
+
+        # Total de todos os anos somado de forma exata
+        for codigo, gasto in LiquidacaoTotals.merge(by_year.values()).totals().items():
+            row = table.index_of(codigo)
+            if row is not None:
+                table.set_spent(row, gasto)
+
+        logger.info(f"Total de empresas após LIQUIDAÇÃO ({', '.join(map(str, by_year))}): {len(table)}")
 
     def get_statistics(self, companies: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -218,10 +376,9 @@ class ExcelProcessor:
 
     def get_data(self) -> Dict[str, Any]:
         """Retorna os dados atuais processados"""
-        companies = [company.to_dict() for company in self.companies.values()]
-        companies.sort(key=lambda x: x['name'])
-        
+        table = self.table.sorted_by_name()
+
         return {
-            'companies': companies,
-            'statistics': self.get_statistics(companies)
+            'companies': table.to_dicts(),
+            'statistics': table.statistics()
         }
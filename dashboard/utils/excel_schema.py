@@ -0,0 +1,169 @@
+"""
+Esquema declarativo do workbook
+Define quais abas são lidas (padrões de nome) e como as colunas são
+encontradas (pelo texto do cabeçalho, com a posição como alternativa)
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import re
+import logging
+
+from .text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Esquema padrão (equivale ao layout fixo usado até aqui: VALIDAÇÕES e LIQUIDAÇÃO por ano)
+DEFAULT_SCHEMA = {
+    'validacoes': {
+        'sheet': r'VALIDAÇÕES',
+        'columns': {
+            'code': {'headers': ['Código', 'Código do Contrato', 'Contrato'], 'index': 0},
+            'name': {'headers': ['Empresa', 'Contratada', 'Fornecedor'], 'index': 1},
+            'contract_value': {'headers': ['Valor Contrato', 'Valor do Contrato', 'Valor Global'], 'index': 6},
+        },
+    },
+    'liquidacao': {
+        # O grupo 'year' identifica o ano de cada aba
+        'sheet': r'LIQUIDAÇÃO (?P<year>\d{4})',
+        'columns': {
+            'code': {'headers': ['Código', 'Código do Contrato', 'Contrato'], 'index': 1},
+            'value': {'headers': ['Valor Liquidado', 'Liquidado', 'Valor Liquidação'], 'index': 6},
+        },
+        # Anos lidos e somados no valor gasto (None = todas as abas encontradas)
+        'years': None,
+    },
+}
+
+
+def normalize_header(value: Any) -> str:
+    """Texto do cabeçalho comparado com os do esquema (sem acentos, sem diferença de maiúsculas e com espaços simples)"""
+    return normalize_text(value)
+
+
+class SheetSchema:
+    """Padrão do nome de uma aba e definição das suas colunas"""
+
+    def __init__(self, key: str, sheet: str, columns: Dict[str, Dict[str, Any]]):
+        """
+        Inicializa o esquema da aba
+
+        Args:
+            key: Nome da aba no esquema ('validacoes', 'liquidacao')
+            sheet: Expressão regular do nome da aba (casamento completo)
+            columns: Campo -> {'headers': [textos aceitos], 'index': posição padrão}
+        """
+        self.key = key
+        self.pattern = re.compile(sheet)
+        self.fields = list(columns)
+        self.headers = {
+            field: {normalize_header(header) for header in spec.get('headers', ())}
+            for field, spec in columns.items()
+        }
+        self.indexes = {field: spec.get('index') for field, spec in columns.items()}
+
+    def match(self, sheet_name: str) -> Optional[re.Match]:
+        return self.pattern.fullmatch(sheet_name.strip())
+
+    def resolve(self, sheet_name: str, header: Sequence[Any]) -> Optional[Tuple[int, ...]]:
+        """
+        Resolve a posição de cada coluna a partir da linha de cabeçalho
+
+        A posição padrão é mantida quando o cabeçalho nela é reconhecido;
+        senão vale a primeira coluna com um cabeçalho aceito e, por último,
+        a posição padrão.
+
+        Args:
+            sheet_name: Nome da aba (para as mensagens de log)
+            header: Valores da primeira linha da aba
+
+        Returns:
+            Índices das colunas na ordem dos campos, ou None se algum campo
+            não puder ser resolvido
+        """
+        normalized = [normalize_header(value) for value in header]
+        columns = []
+
+        for field in self.fields:
+            accepted = self.headers[field]
+            index = self.indexes[field]
+
+            if index is not None and index < len(normalized) and normalized[index] in accepted:
+                columns.append(index)
+                continue
+
+            found = next((i for i, text in enumerate(normalized) if text and text in accepted), None)
+            if found is not None:
+                if index is not None and found != index:
+                    logger.info(f"Aba '{sheet_name}': coluna '{field}' encontrada pelo cabeçalho na posição {found}")
+                columns.append(found)
+            elif index is not None:
+                logger.warning(f"Aba '{sheet_name}': cabeçalho da coluna '{field}' não reconhecido, usando a posição {index}")
+                columns.append(index)
+            else:
+                logger.error(f"Aba '{sheet_name}': coluna '{field}' não encontrada")
+                return None
+
+        return tuple(columns)
+
+
+class WorkbookSchema:
+    """Esquema das abas VALIDAÇÕES e LIQUIDAÇÃO (uma aba por ano)"""
+
+    def __init__(self, schema: Optional[Dict[str, Any]] = None):
+        """
+        Inicializa o esquema
+
+        Args:
+            schema: Dicionário no formato de DEFAULT_SCHEMA (padrão: DEFAULT_SCHEMA)
+        """
+        schema = schema or DEFAULT_SCHEMA
+        self.spec = schema
+        self.validacoes = SheetSchema('validacoes', **self._sheet_spec(schema['validacoes']))
+        self.liquidacao = SheetSchema('liquidacao', **self._sheet_spec(schema['liquidacao']))
+        if 'year' not in self.liquidacao.pattern.groupindex:
+            raise ValueError("O padrão da aba LIQUIDAÇÃO deve ter o grupo (?P<year>...)")
+        years = schema['liquidacao'].get('years')
+        self.years = {int(year) for year in years} if years else None
+
+    @classmethod
+    def from_settings(cls) -> 'WorkbookSchema':
+        """Esquema definido em settings.EXCEL_SCHEMA (ou o padrão)"""
+        from django.conf import settings
+        schema = getattr(settings, 'EXCEL_SCHEMA', DEFAULT_SCHEMA) if settings.configured else DEFAULT_SCHEMA
+        return cls(schema)
+
+    def fingerprint(self) -> str:
+        """Hash do esquema: tabelas lidas com esquemas diferentes não são intercambiáveis (ver ParseCache)"""
+        canonical = json.dumps(self.spec, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _sheet_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
+        return {'sheet': spec['sheet'], 'columns': spec['columns']}
+
+    def validacoes_sheet(self, sheet_names: List[str]) -> Optional[str]:
+        """Primeira aba cujo nome casa com o padrão da VALIDAÇÕES"""
+        return next((name for name in sheet_names if self.validacoes.match(name)), None)
+
+    def liquidacao_sheets(self, sheet_names: List[str]) -> Dict[int, str]:
+        """
+        Abas da LIQUIDAÇÃO por ano
+
+        Returns:
+            Dicionário ano -> nome da aba, em ordem crescente de ano
+        """
+        sheets: Dict[int, str] = {}
+        for name in sheet_names:
+            match = self.liquidacao.match(name)
+            if not match:
+                continue
+            year = int(match.group('year'))
+            if self.years is not None and year not in self.years:
+                continue
+            if year in sheets:
+                logger.warning(f"Mais de uma aba para o ano {year}: '{sheets[year]}' mantida, '{name}' ignorada")
+                continue
+            sheets[year] = name
+        return dict(sorted(sheets.items()))
@@ -6,7 +6,7 @@ Adaptado do export_excel.py original
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
 import os
 
@@ -26,7 +26,7 @@ class ExcelExporter:
 
     def export_company_expenses(self, company_name: str, company_code: str, 
                                contract_value: float, spent_value: float,
-                               expenses: List[Dict[str, Any]]) -> str:
+                               expenses: List[Dict[str, Any]], filepath: Optional[str] = None) -> str:
         """
         Exporta lançamentos de uma empresa para Excel
         
@@ -36,6 +36,7 @@ class ExcelExporter:
             contract_value: Valor total do contrato
             spent_value: Valor gasto
             expenses: Lista de lançamentos
+            filepath: Caminho do arquivo (padrão: Movimentos_<código>_<data e hora>.xlsx em MEDIA_ROOT)
             
         Returns:
             Caminho do arquivo gerado
@@ -144,12 +145,13 @@ class ExcelExporter:
                     ws.cell(row=total_row, column=col).fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
 
             # Salvar arquivo
-            filename = f"Movimentos_{company_code}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            
-            # Importar settings para obter MEDIA_ROOT
-            from django.conf import settings
-            os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
-            filepath = os.path.join(settings.MEDIA_ROOT, filename)
+            if filepath is None:
+                filename = f"Movimentos_{company_code}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+                
+                # Importar settings para obter MEDIA_ROOT
+                from django.conf import settings
+                os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+                filepath = os.path.join(settings.MEDIA_ROOT, filename)
             
             wb.save(filepath)
             logger.info(f"Arquivo exportado: {filepath}")
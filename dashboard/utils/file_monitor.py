@@ -7,17 +7,34 @@ import os
 import time
 import threading
 import logging
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 
+from . import inotify
+
 logger = logging.getLogger(__name__)
 
+# Modos de monitoramento: só o arquivo mais recente ou todos os arquivos da pasta
+WATCH_MODES = ('latest', 'all')
+
+# Forma de detectar mudanças: 'inotify' (eventos do Linux), 'polling'
+# (varredura a cada check_interval) ou 'auto' (inotify quando disponível e a
+# pasta não está em um sistema de arquivos de rede)
+BACKENDS = ('auto', 'inotify', 'polling')
+
+# Eventos observados: arquivo fechado após escrita, renomeado para a pasta
+# (gravação atômica: temporário + rename), removido ou renomeado para fora
+WATCH_EVENTS = (inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO | inotify.IN_DELETE | inotify.IN_MOVED_FROM
+                | inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF)
+
 
 class FileMonitor:
     """Monitor de arquivo Excel com detecção de mudanças"""
 
-    def __init__(self, folder_path: str, pattern: str = "*.xlsm", check_interval: int = 2):
+    def __init__(self, folder_path: str, pattern: str = "*.xlsm", check_interval: int = 2, mode: str = 'latest',
+                 backend: str = 'auto', rescan_interval: int = 60):
         """
         Inicializa o monitor
 
@@ -25,22 +42,43 @@ class FileMonitor:
             folder_path: Caminho da pasta a monitorar
             pattern: Padrão de arquivo (ex: *.xlsm)
             check_interval: Intervalo de verificação em segundos
+            mode: 'latest' acompanha só o arquivo modificado mais recentemente;
+                'all' acompanha todos os arquivos que correspondem ao padrão
+            backend: 'auto', 'inotify' ou 'polling' (ver BACKENDS)
+            rescan_interval: Com inotify, intervalo em segundos de uma varredura
+                completa de segurança (alterações feitas por outras máquinas em
+                pastas de rede não geram eventos); 0 desativa
         """
+        if mode not in WATCH_MODES:
+            raise ValueError(f"Modo de monitoramento inválido: {mode}. Use um de {WATCH_MODES}")
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend de monitoramento inválido: {backend}. Use um de {BACKENDS}")
+
         self.folder_path = Path(folder_path)
         self.pattern = pattern
         self.check_interval = check_interval
+        self.mode = mode
+        self.backend = backend
+        self.rescan_interval = rescan_interval
+        # Backend efetivamente em uso ('inotify' ou 'polling')
+        self.active_backend: Optional[str] = None
         self.is_running = False
         self.thread: Optional[threading.Thread] = None
         self.on_file_changed: Optional[Callable] = None
         self.last_modified_time = 0
+        self.last_signature: Optional[Tuple[int, int]] = None
         self.current_file: Optional[Path] = None
+        self._watcher: Optional[inotify.Inotify] = None
+        # Modo 'all': arquivo -> (mtime, tamanho) da última versão entregue
+        self.known_files: Dict[Path, Tuple[int, int]] = {}
 
     def start(self, on_file_changed: Callable) -> bool:
         """
         Inicia o monitoramento
 
         Args:
-            on_file_changed: Função callback quando arquivo muda
+            on_file_changed: Função callback quando arquivo muda; no modo
+                'all' recebe (arquivos alterados, arquivos removidos)
 
         Returns:
             True se iniciou com sucesso
@@ -51,61 +89,202 @@ class FileMonitor:
 
         self.on_file_changed = on_file_changed
         self.is_running = True
-        self.thread = threading.Thread(target=self._monitor_loop, daemon=True)
+        self._watcher = self._create_watcher()
+        self.active_backend = 'inotify' if self._watcher else 'polling'
+        target = self._event_loop if self._watcher else self._monitor_loop
+        self.thread = threading.Thread(target=target, daemon=True)
         self.thread.start()
 
-        logger.info(f"Monitor iniciado para: {self.folder_path}")
+        logger.info(f"Monitor iniciado para: {self.folder_path} ({self.active_backend})")
         return True
 
     def stop(self):
         """Para o monitoramento"""
         self.is_running = False
+        if self._watcher:
+            self._watcher.wake()
         if self.thread:
             self.thread.join(timeout=5)
         logger.info("Monitor parado")
 
+    def _create_watcher(self) -> Optional[inotify.Inotify]:
+        """Cria o observador inotify se o backend permitir; None para usar polling"""
+        if self.backend == 'polling':
+            return None
+        if not inotify.inotify_available():
+            if self.backend == 'inotify':
+                logger.warning("inotify não disponível neste sistema, usando polling")
+            return None
+        if inotify.is_network_filesystem(str(self.folder_path)):
+            # Gravações feitas por outras máquinas não geram eventos nesta máquina
+            if self.backend == 'auto':
+                logger.info(f"Pasta em sistema de arquivos de rede ({self.folder_path}), usando polling")
+                return None
+            logger.warning(f"Pasta em sistema de arquivos de rede ({self.folder_path}): alterações de outras "
+                           f"máquinas só serão vistas na varredura de segurança")
+        if '/' in self.pattern or os.sep in self.pattern:
+            # Eventos só da própria pasta: padrões com subpastas exigem varredura
+            logger.warning(f"Padrão com subpastas ({self.pattern}) não é suportado pelo inotify, usando polling")
+            return None
+        try:
+            return inotify.Inotify(str(self.folder_path), WATCH_EVENTS)
+        except OSError as e:
+            logger.warning(f"Não foi possível iniciar o inotify ({e}), usando polling")
+            return None
+
+    def _check(self):
+        """Varredura completa da pasta (polling)"""
+        if self.mode == 'all':
+            self._check_folder()
+        else:
+            self._check_file()
+
     def _monitor_loop(self):
         """Loop de monitoramento"""
         while self.is_running:
             try:
-                self._check_file()
+                self._check()
                 time.sleep(self.check_interval)
             except Exception as e:
                 logger.error(f"Erro no monitor: {e}")
                 time.sleep(self.check_interval)
 
+    def _event_loop(self):
+        """Loop de monitoramento por eventos do inotify"""
+        watcher = self._watcher
+        try:
+            # Estado inicial da pasta
+            self._check()
+
+            while self.is_running:
+                try:
+                    events = watcher.read(self.rescan_interval or None)
+                    if not self.is_running:
+                        break
+                    if events is None:
+                        # Varredura de segurança periódica
+                        self._check()
+                    elif not self._dispatch(events):
+                        break
+                except Exception as e:
+                    logger.error(f"Erro no monitor: {e}")
+                    time.sleep(self.check_interval)
+        finally:
+            watcher.close()
+            self._watcher = None
+
+        if self.is_running:
+            # A pasta observada foi removida ou renomeada: continuar por polling
+            logger.warning(f"Pasta {self.folder_path} deixou de ser observada pelo inotify, usando polling")
+            self.active_backend = 'polling'
+            self._monitor_loop()
+
+    def _dispatch(self, events: List[Tuple[int, str]]) -> bool:
+        """
+        Trata um lote de eventos do inotify
+
+        Returns:
+            False se a pasta deixou de ser observada
+        """
+        changed: Dict[Path, None] = {}
+        removed: Dict[Path, None] = {}
+
+        for mask, name in events:
+            if mask & inotify.IN_Q_OVERFLOW:
+                # Eventos perdidos: conferir a pasta inteira
+                self._check()
+                return True
+            if mask & (inotify.IN_IGNORED | inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF):
+                return False
+            if mask & inotify.IN_ISDIR or not self._matches(name):
+                continue
+
+            path = self.folder_path / name
+            if mask & (inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO):
+                # Arquivo completo: fechado após a escrita ou renomeado já pronto
+                removed.pop(path, None)
+                changed.pop(path, None)
+                changed[path] = None
+            elif mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+                changed.pop(path, None)
+                removed[path] = None
+
+        if self.mode == 'all':
+            self._notify_folder(list(changed), list(removed))
+        elif changed:
+            # O último arquivo escrito é o mais recente
+            self._notify_file(list(changed)[-1])
+        elif self.current_file in removed:
+            # O arquivo atual saiu da pasta: procurar o mais recente restante
+            self._check()
+        return True
+
+    def _matches(self, name: str) -> bool:
+        # Ignorar os arquivos de bloqueio do Excel (~$arquivo.xlsm)
+        return fnmatch(name, self.pattern) and not name.startswith('~$')
+
+    def _notify_file(self, path: Path):
+        """Entrega um arquivo alterado no modo 'latest'"""
+        try:
+            stat = path.stat()
+        except OSError:
+            return
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if path == self.current_file and signature == self.last_signature:
+            return
+
+        self.current_file = path
+        self.last_modified_time = stat.st_mtime
+        self.last_signature = signature
+        if self.on_file_changed:
+            logger.info(f"Arquivo detectado: {path.name}")
+            self.on_file_changed(str(path))
+
+    def _notify_folder(self, changed: List[Path], removed: List[Path]):
+        """Entrega os arquivos alterados e removidos no modo 'all'"""
+        delivered = []
+        for path in changed:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self.known_files.get(path) != signature:
+                self.known_files[path] = signature
+                delivered.append(path)
+        removed = [path for path in removed if self.known_files.pop(path, None) is not None]
+
+        if (delivered or removed) and self.on_file_changed:
+            logger.info(f"Pasta: {len(delivered)} arquivo(s) alterado(s), {len(removed)} removido(s)")
+            self.on_file_changed(sorted(map(str, delivered)), sorted(map(str, removed)))
+
     def _check_file(self):
         """Verifica se o arquivo foi modificado"""
         try:
-            # Procurar arquivo que corresponde ao padrão
-            files = list(self.folder_path.glob(self.pattern))
+            # Procurar arquivos que correspondem ao padrão (um stat por arquivo)
+            files = self._scan_folder()
 
             if not files:
                 logger.debug(f"Nenhum arquivo encontrado com padrão {self.pattern}")
                 return
 
             # Usar o arquivo mais recente
-            latest_file = max(files, key=lambda p: p.stat().st_mtime)
-
-            # Verificar se é um arquivo novo ou foi modificado
-            try:
-                current_mtime = latest_file.stat().st_mtime
-            except OSError:
-                # Arquivo pode estar sendo acessado
-                return
+            latest_file = max(files, key=lambda p: files[p][0])
+            signature = files[latest_file]
 
             # Se é um arquivo novo ou foi modificado
-            if latest_file != self.current_file or current_mtime != self.last_modified_time:
+            if latest_file != self.current_file or signature != self.last_signature:
                 # Aguardar um pouco para garantir que o arquivo foi completamente salvo
                 time.sleep(1)
 
                 # Verificar novamente se o arquivo não está sendo modificado
                 try:
-                    new_mtime = latest_file.stat().st_mtime
-                    if new_mtime == current_mtime:
+                    stat = latest_file.stat()
+                    if (stat.st_mtime_ns, stat.st_size) == signature:
                         # Arquivo estável, chamar callback
                         self.current_file = latest_file
-                        self.last_modified_time = current_mtime
+                        self.last_modified_time = stat.st_mtime
+                        self.last_signature = signature
 
                         if self.on_file_changed:
                             logger.info(f"Arquivo detectado: {latest_file.name}")
@@ -116,6 +295,49 @@ class FileMonitor:
         except Exception as e:
             logger.error(f"Erro ao verificar arquivo: {e}")
 
+    def _scan_folder(self) -> Dict[Path, Tuple[int, int]]:
+        """Assinatura (mtime, tamanho) de cada arquivo que corresponde ao padrão"""
+        files = {}
+        for path in self.folder_path.glob(self.pattern):
+            # Ignorar os arquivos de bloqueio do Excel (~$arquivo.xlsm)
+            if path.name.startswith('~$'):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def _check_folder(self):
+        """Verifica todos os arquivos da pasta (modo 'all')"""
+        try:
+            current = self._scan_folder()
+            changed = [path for path, signature in current.items() if self.known_files.get(path) != signature]
+            removed = [path for path in self.known_files if path not in current]
+
+            if not changed and not removed:
+                return
+
+            if changed:
+                # Aguardar um pouco para garantir que os arquivos foram completamente salvos
+                time.sleep(1)
+                again = self._scan_folder()
+                # Arquivos ainda em gravação ficam para a próxima verificação
+                changed = [path for path in changed if again.get(path) == current[path]]
+
+            for path in changed:
+                self.known_files[path] = current[path]
+            for path in removed:
+                del self.known_files[path]
+
+            if (changed or removed) and self.on_file_changed:
+                logger.info(f"Pasta: {len(changed)} arquivo(s) alterado(s), {len(removed)} removido(s)")
+                self.on_file_changed(sorted(map(str, changed)), sorted(map(str, removed)))
+
+        except Exception as e:
+            logger.error(f"Erro ao verificar pasta: {e}")
+
     def get_current_file(self) -> Optional[str]:
         """Retorna o caminho do arquivo atual"""
         return str(self.current_file) if self.current_file else None
@@ -0,0 +1,217 @@
+"""
+Ingestão de todos os workbooks de uma pasta
+Cada arquivo tem a sua tabela de empresas; só os arquivos alterados são
+reprocessados (em paralelo) e a tabela combinada é atualizada apenas nos
+códigos desses arquivos
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+import math
+import multiprocessing
+import os
+import threading
+import logging
+
+from .company_table import CompanyTable
+from .excel_processor import ExcelProcessor
+from .excel_schema import WorkbookSchema
+from .ingest_scheduler import CancelToken, IngestCancelled
+from .parse_cache import ParseCache
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_workbook(file_path: str, mode: str, schema: WorkbookSchema,
+                    cancel: Optional[CancelToken] = None) -> CompanyTable:
+    """Processa um workbook com um processador novo (no pool ou, com um só worker, na própria thread)"""
+    return ExcelProcessor(mode=mode, schema=schema).process_table(file_path, cancel=cancel)
+
+
+class FolderIngestor:
+    """Mantém uma tabela por arquivo e a combinação de todas elas"""
+
+    def __init__(self, mode: str = 'xml', schema: Optional[WorkbookSchema] = None,
+                 workers: Optional[int] = None, cache: Optional[ParseCache] = None):
+        """
+        Inicializa a ingestão da pasta
+
+        Args:
+            mode: Modo de leitura de cada arquivo ('parallel' vira 'xml': o
+                paralelismo passa a ser entre arquivos)
+            schema: Abas e colunas lidas (padrão: settings.EXCEL_SCHEMA)
+            workers: Arquivos processados ao mesmo tempo (padrão: número de CPUs)
+            cache: Cache de processamento (opcional)
+        """
+        self.mode = 'xml' if mode == 'parallel' else mode
+        self.schema = schema or WorkbookSchema.from_settings()
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.cache = cache
+        self.tables: Dict[str, CompanyTable] = {}
+        self.merged = CompanyTable()
+        # Código -> arquivos em que aparece (e a linha em cada tabela)
+        self._rows_by_code: Dict[str, Dict[str, int]] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def files(self) -> List[str]:
+        """Arquivos com dados carregados"""
+        return sorted(self.tables)
+
+    def update(self, changed: Iterable[str], removed: Iterable[str] = (),
+               cancel: Optional[CancelToken] = None) -> CompanyTable:
+        """
+        Reprocessa os arquivos alterados e atualiza a tabela combinada
+
+        Args:
+            changed: Arquivos novos ou modificados
+            removed: Arquivos que saíram da pasta
+            cancel: Token verificado durante a leitura e entre os arquivos
+
+        Returns:
+            Tabela combinada, ordenada por nome e código (a ordem não depende
+            da sequência de atualizações)
+
+        Raises:
+            IngestCancelled: Se o cancelamento foi pedido antes de todos os
+                arquivos serem lidos (as tabelas não são alteradas)
+        """
+        changed = sorted(set(changed))
+        touched: Set[str] = set()
+
+        tables = self._parse_all(changed, cancel)
+        for file_path, table in zip(changed, tables):
+            if not len(table) and file_path in self.tables:
+                logger.warning(f"Nenhuma empresa lida de {os.path.basename(file_path)}; dados anteriores mantidos")
+                continue
+            touched.update(self._replace(file_path, table))
+
+        for file_path in removed:
+            if file_path in self.tables:
+                touched.update(self._replace(file_path, None))
+
+        self._merge(touched)
+        logger.info(f"Pasta: {len(changed)} arquivo(s) processado(s), {len(touched)} empresa(s) recalculada(s), "
+                    f"{len(self.merged)} empresa(s) em {len(self.tables)} arquivo(s)")
+        merged = self.merged
+        return merged.take(sorted(range(len(merged)), key=lambda row: (merged.names[row], merged.codes[row])))
+
+    def shutdown(self) -> None:
+        """Encerra o pool de processos"""
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _parse_all(self, paths: List[str], cancel: Optional[CancelToken] = None) -> List[CompanyTable]:
+        """Processa os arquivos ao mesmo tempo (cada um em um processo do pool)"""
+        if len(paths) <= 1 or self.workers == 1:
+            tables = []
+            for path in paths:
+                if cancel is not None:
+                    cancel.check()
+                tables.append(self._load(path, cancel))
+            return tables
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(paths))) as threads:
+            futures = [threads.submit(self._load, path, cancel) for path in paths]
+            if cancel is not None:
+                cancel.wait_futures(futures)
+            return [future.result() for future in futures]
+
+    def _load(self, file_path: str, cancel: Optional[CancelToken] = None) -> CompanyTable:
+        try:
+            if cancel is not None:
+                cancel.check()
+            parse = lambda path: self._parse(path, cancel)
+            if self.cache:
+                return self.cache.get_or_parse(file_path, parse)
+            return parse(file_path)
+        except IngestCancelled:
+            raise
+        except Exception as e:
+            logger.exception(f"Erro ao processar {file_path}: {e}")
+            return CompanyTable()
+
+    def _parse(self, file_path: str, cancel: Optional[CancelToken] = None) -> CompanyTable:
+        if self.workers == 1:
+            return _parse_workbook(file_path, self.mode, self.schema, cancel)
+        try:
+            # O token não atravessa processos: a espera é que verifica o cancelamento
+            future = self._get_pool().submit(_parse_workbook, file_path, self.mode, self.schema)
+            if cancel is not None:
+                cancel.wait_futures([future])
+            return future.result()
+        except IngestCancelled:
+            raise
+        except Exception:
+            # Um processo que morreu inutiliza o pool; recriar na próxima vez
+            self.shutdown()
+            raise
+
+    def _replace(self, file_path: str, table: Optional[CompanyTable]) -> Set[str]:
+        """Troca a tabela de um arquivo e retorna os códigos afetados"""
+        touched = set()
+        old = self.tables.pop(file_path, None)
+        if old is not None:
+            for code in old.codes:
+                self._rows_by_code[code].pop(file_path, None)
+                touched.add(code)
+
+        if table is not None:
+            self.tables[file_path] = table
+            for row, code in enumerate(table.codes):
+                self._rows_by_code.setdefault(code, {})[file_path] = row
+                touched.add(code)
+        return touched
+
+    def _merge(self, codes: Set[str]) -> None:
+        """
+        Recalcula na tabela combinada apenas os códigos informados
+
+        Um código presente em mais de um arquivo tem os valores somados e o
+        nome do primeiro arquivo (em ordem de caminho).
+        """
+        merged = self.merged
+        years = sorted({year for table in self.tables.values() for year in table.spent_by_year})
+        for year in list(merged.spent_by_year):
+            if year not in years:
+                merged.remove_year(year)
+        for year in years:
+            merged.add_year(year)
+
+        removed = set()
+        for code in codes:
+            rows = self._rows_by_code.get(code)
+            if not rows:
+                self._rows_by_code.pop(code, None)
+                removed.add(code)
+                continue
+
+            sources = [(self.tables[path], row) for path, row in sorted(rows.items())]
+            first, first_row = sources[0]
+            merged.set(
+                code,
+                first.names[first_row],
+                math.fsum(table.contract_values[row] for table, row in sources),
+                math.fsum(table.spent_values[row] for table, row in sources)
+            )
+            row = merged.index_of(code)
+            for year in years:
+                merged.set_year_spent(row, year, math.fsum(
+                    table.spent_by_year[year][source_row]
+                    for table, source_row in sources if year in table.spent_by_year
+                ))
+
+        if removed:
+            self.merged = merged.take(row for row, code in enumerate(merged.codes) if code not in removed)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Chamado pelas threads de _parse_all ao mesmo tempo
+        with self._pool_lock:
+            if self._pool is None:
+                # 'spawn' evita herdar locks das threads do servidor (monitor, Channels)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
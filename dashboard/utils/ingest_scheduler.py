@@ -0,0 +1,236 @@
+"""
+Agendador da ingestão do Excel
+Desacopla o monitor de arquivos do processamento: eventos em rajada são
+agrupados em uma janela (debounce), uma versão nova cancela a ingestão em
+andamento da mesma chave e a fila limitada aplica contrapressão ao monitor
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future, wait
+from typing import Any, Callable, Dict, Iterable, Optional
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IngestCancelled(Exception):
+    """A ingestão foi substituída por uma versão mais nova do arquivo"""
+
+
+# Intervalo em segundos entre verificações do cancelamento enquanto espera o pool
+CANCEL_POLL_SECONDS = 0.1
+
+
+class CancelToken(threading.Event):
+    """Sinal de cancelamento consultado pelas etapas da ingestão"""
+
+    def check(self) -> None:
+        """Levanta IngestCancelled se o cancelamento foi pedido"""
+        if self.is_set():
+            raise IngestCancelled()
+
+    def wait_futures(self, futures: Iterable[Future]) -> None:
+        """
+        Espera tarefas de um pool verificando o cancelamento
+
+        Raises:
+            IngestCancelled: Se o cancelamento foi pedido antes de todas
+                terminarem; as que ainda não começaram são canceladas (as em
+                execução terminam no pool e o resultado é descartado)
+        """
+        pending = set(futures)
+        while pending:
+            if self.is_set():
+                for future in pending:
+                    future.cancel()
+                raise IngestCancelled()
+            pending = wait(pending, timeout=CANCEL_POLL_SECONDS)[1]
+
+
+class _Job:
+    __slots__ = ('payload', 'submitted_at', 'deadline')
+
+    def __init__(self, payload: Any, submitted_at: float, deadline: float):
+        self.payload = payload
+        self.submitted_at = submitted_at
+        self.deadline = deadline
+
+
+class IngestScheduler:
+    """Fila de ingestões com agrupamento por chave, cancelamento e métricas"""
+
+    def __init__(self, handler: Callable[[Any, CancelToken], None], debounce: float = 0.5,
+                 max_pending: int = 16, merge: Optional[Callable[[Any, Any], Any]] = None):
+        """
+        Inicializa o agendador
+
+        Args:
+            handler: Função executada para cada ingestão (payload, token de cancelamento)
+            debounce: Segundos sem novos eventos da mesma chave antes de processar
+            max_pending: Máximo de chaves aguardando na fila (submit bloqueia quando cheia)
+            merge: Combina o payload pendente com um novo da mesma chave
+                (padrão: o novo substitui o pendente)
+        """
+        self.handler = handler
+        self.debounce = debounce
+        self.max_pending = max(1, max_pending)
+        self.merge = merge
+
+        self._pending: 'OrderedDict[Any, _Job]' = OrderedDict()
+        self._in_flight: Optional[Any] = None
+        self._in_flight_token: Optional[CancelToken] = None
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self._counters = {
+            'submitted': 0, 'coalesced': 0, 'started': 0, 'completed': 0,
+            'cancelled': 0, 'failed': 0, 'rejected': 0
+        }
+        self._wait_total = 0.0
+        self._last_wait: Optional[float] = None
+        self._max_wait = 0.0
+        self._last_duration: Optional[float] = None
+
+    def start(self) -> None:
+        """Inicia a thread de ingestão"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._worker, name='ingest-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        """Para a thread de ingestão (a ingestão em andamento é cancelada)"""
+        with self._cond:
+            self._running = False
+            if self._in_flight_token:
+                self._in_flight_token.set()
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def submit(self, key: Any, payload: Any, timeout: Optional[float] = None) -> bool:
+        """
+        Agenda uma ingestão
+
+        Args:
+            key: Identifica o que está sendo ingerido; eventos da mesma chave
+                são agrupados e cancelam a ingestão em andamento dessa chave
+            payload: Dados passados ao handler
+            timeout: Espera máxima por espaço na fila (None = sem limite)
+
+        Returns:
+            False se a fila continuou cheia até o fim do timeout
+        """
+        with self._cond:
+            now = time.monotonic()
+            job = self._pending.get(key)
+            if job is not None:
+                job.payload = self.merge(job.payload, payload) if self.merge else payload
+                job.deadline = now + self.debounce
+                self._counters['coalesced'] += 1
+            else:
+                # Contrapressão: quem gera eventos espera a fila esvaziar
+                limit = None if timeout is None else now + timeout
+                while self._running and len(self._pending) >= self.max_pending:
+                    remaining = None if limit is None else limit - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._counters['rejected'] += 1
+                        logger.warning(f"Fila de ingestão cheia ({self.max_pending}), evento descartado: {key}")
+                        return False
+                    self._cond.wait(remaining)
+                self._pending[key] = _Job(payload, now, now + self.debounce)
+
+            self._counters['submitted'] += 1
+
+            # Uma versão mais nova substitui a ingestão em andamento
+            if self._in_flight == key and self._in_flight_token and not self._in_flight_token.is_set():
+                logger.info(f"Ingestão em andamento substituída por versão mais nova: {key}")
+                self._in_flight_token.set()
+
+            self._cond.notify_all()
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas da fila (profundidade, tempos de espera e contadores)"""
+        with self._cond:
+            started = self._counters['started']
+            return {
+                'running': self._running,
+                'pending': len(self._pending),
+                'max_pending': self.max_pending,
+                'in_flight': str(self._in_flight) if self._in_flight is not None else None,
+                'debounce': self.debounce,
+                **self._counters,
+                'last_wait': self._round(self._last_wait),
+                'avg_wait': self._round(self._wait_total / started) if started else None,
+                'max_wait': self._round(self._max_wait),
+                'last_duration': self._round(self._last_duration),
+            }
+
+    @staticmethod
+    def _round(value: Optional[float]) -> Optional[float]:
+        return round(value, 4) if value is not None else None
+
+    def _next_job(self):
+        """Aguarda o próximo job cuja janela de agrupamento terminou"""
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                due = [(job.deadline, key) for key, job in self._pending.items()]
+                if due:
+                    deadline, key = min(due, key=lambda item: item[0])
+                    if deadline <= now:
+                        job = self._pending.pop(key)
+                        token = CancelToken()
+                        self._in_flight, self._in_flight_token = key, token
+
+                        wait = now - job.submitted_at
+                        self._counters['started'] += 1
+                        self._wait_total += wait
+                        self._last_wait = wait
+                        self._max_wait = max(self._max_wait, wait)
+
+                        # Espaço liberado na fila
+                        self._cond.notify_all()
+                        return key, job, token
+                    self._cond.wait(deadline - now)
+                else:
+                    self._cond.wait()
+            return None
+
+    def _worker(self) -> None:
+        """Executa as ingestões, uma por vez"""
+        while True:
+            item = self._next_job()
+            if item is None:
+                return
+            key, job, token = item
+
+            start = time.perf_counter()
+            outcome = 'completed'
+            try:
+                self.handler(job.payload, token)
+            except IngestCancelled:
+                outcome = 'cancelled'
+                logger.info(f"Ingestão cancelada: {key}")
+                # Com merge, o que a ingestão cancelada não concluiu vai junto com a versão nova
+                with self._cond:
+                    pending = self._pending.get(key)
+                    if self.merge and pending is not None:
+                        pending.payload = self.merge(job.payload, pending.payload)
+            except Exception as e:
+                outcome = 'failed'
+                logger.error(f"Erro na ingestão de {key}: {e}")
+                import traceback
+                traceback.print_exc()
+            finally:
+                with self._cond:
+                    self._counters[outcome] += 1
+                    self._last_duration = time.perf_counter() - start
+                    self._in_flight, self._in_flight_token = None, None
+                    self._cond.notify_all()
@@ -0,0 +1,176 @@
+"""
+Acesso mínimo ao inotify do Linux via ctypes
+Usado pelo FileMonitor para receber eventos da pasta em vez de varrê-la
+"""
+
+from typing import List, Optional, Tuple
+import ctypes
+import ctypes.util
+import errno
+import os
+import re
+import select
+import struct
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Eventos (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        _libc.inotify_init1.argtypes = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return _libc
+
+
+def inotify_available() -> bool:
+    """True se o sistema oferece inotify (Linux)"""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        return hasattr(_load_libc(), 'inotify_init1')
+    except OSError:
+        return False
+
+
+# Sistemas de arquivos de rede: gravações feitas por outras máquinas não geram eventos
+NETWORK_FILESYSTEMS = frozenset({
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'ncpfs', 'afs', 'coda', '9p', 'ceph', 'glusterfs',
+    'lustre', 'gpfs', 'davfs', 'fuse.sshfs', 'fuse.rclone', 'fuse.s3fs', 'fuse.glusterfs', 'fuse.davfs2',
+})
+
+MOUNTS_FILE = '/proc/mounts'
+
+
+def filesystem_type(path: str) -> Optional[str]:
+    """Tipo do sistema de arquivos (ex: 'ext4', 'nfs4') do ponto de montagem do caminho; None se desconhecido"""
+    try:
+        with open(MOUNTS_FILE, encoding='utf-8', errors='replace') as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return None
+
+    path = os.path.realpath(path)
+    best, fs_type = '', None
+    for mount_point, mount_type in mounts:
+        # Espaços e outros caracteres vêm escapados em octal (\040)
+        mount_point = re.sub(r'\\([0-7]{3})', lambda match: chr(int(match.group(1), 8)), mount_point)
+        prefix = mount_point.rstrip('/') + '/'
+        if (path == mount_point or path.startswith(prefix)) and len(mount_point) >= len(best):
+            best, fs_type = mount_point, mount_type
+    return fs_type
+
+
+def is_network_filesystem(path: str) -> bool:
+    """True se o caminho está em uma montagem de rede (NFS, SMB/CIFS, sshfs...)"""
+    return filesystem_type(path) in NETWORK_FILESYSTEMS
+
+
+class Inotify:
+    """Observa uma pasta e devolve os eventos (máscara, nome do arquivo)"""
+
+    def __init__(self, folder_path: str, mask: int):
+        """
+        Inicializa o observador
+
+        Args:
+            folder_path: Pasta observada
+            mask: Eventos de interesse (IN_*)
+
+        Raises:
+            OSError: Se o inotify não puder ser iniciado (ex: limite de watches)
+        """
+        libc = _load_libc()
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1: {os.strerror(error)}")
+
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(str(folder_path)), mask | IN_ONLYDIR)
+        if wd < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch({folder_path}): {os.strerror(error)}")
+
+        # Pipe para acordar read() quando o monitor é parado
+        self._wake_read, self._wake_write = os.pipe()
+        self._poll = select.poll()
+        self._poll.register(self.fd, select.POLLIN)
+        self._poll.register(self._wake_read, select.POLLIN)
+
+    def read(self, timeout: Optional[float] = None) -> Optional[List[Tuple[int, str]]]:
+        """
+        Aguarda eventos
+
+        Args:
+            timeout: Tempo máximo de espera em segundos (None = sem limite)
+
+        Returns:
+            Lista de (máscara, nome); lista vazia se acordado por wake();
+            None se o tempo acabou sem eventos
+        """
+        ready = self._poll.poll(None if timeout is None else int(timeout * 1000))
+        if not ready:
+            return None
+
+        fds = {fd for fd, _ in ready}
+        if self._wake_read in fds:
+            os.read(self._wake_read, 1024)
+        if self.fd not in fds:
+            return []
+
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, _READ_SIZE)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((mask, os.fsdecode(name)))
+        return events
+
+    def wake(self) -> None:
+        """Interrompe um read() em andamento"""
+        try:
+            os.write(self._wake_write, b'\0')
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        for fd in (self.fd, self._wake_read, self._wake_write):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
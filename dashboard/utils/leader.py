@@ -0,0 +1,108 @@
+"""
+Eleição de líder entre processos por trava de arquivo
+Só o processo que obtém a trava monitora e processa o Excel; a trava é
+liberada pelo sistema operacional se o processo morrer
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+import json
+import os
+import socket
+import time
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """Trava exclusiva em um arquivo; quem a obtém é o líder"""
+
+    def __init__(self, path: str):
+        """
+        Inicializa a trava
+
+        Args:
+            path: Arquivo da trava (criado se não existir)
+        """
+        self.path = Path(path)
+        self._file = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._file is not None
+
+    def acquire(self, blocking: bool = False, timeout: Optional[float] = None, interval: float = 1.0) -> bool:
+        """
+        Tenta obter a trava
+
+        Args:
+            blocking: Se True, tenta de novo até obter (ou até o timeout)
+            timeout: Espera máxima em segundos (None = sem limite)
+            interval: Intervalo entre as tentativas
+
+        Returns:
+            True se este processo é o líder
+        """
+        if self._file is not None:
+            return True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._try_lock():
+                return True
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                return False
+            time.sleep(interval)
+
+    def release(self) -> None:
+        """Libera a trava"""
+        if self._file is None:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        finally:
+            self._file.close()
+            self._file = None
+            logger.info(f"Liderança liberada ({self.path})")
+
+    def holder(self) -> Optional[Dict[str, Any]]:
+        """Dados (pid, máquina, início) do líder atual, se disponíveis"""
+        try:
+            return json.loads(self.path.read_text(encoding='utf-8') or 'null')
+        except (OSError, ValueError):
+            return None
+
+    def _try_lock(self) -> bool:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(self.path, 'a+', encoding='utf-8')
+        try:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+
+        # Registrar quem é o líder (apenas informativo)
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps({'pid': os.getpid(), 'host': socket.gethostname(), 'since': time.time()}))
+        f.flush()
+        self._file = f
+        logger.info(f"Liderança obtida ({self.path}, pid {os.getpid()})")
+        return True
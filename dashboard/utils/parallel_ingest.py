@@ -0,0 +1,168 @@
+"""
+Ingestão paralela do Excel em um pool de processos
+A VALIDAÇÕES e as abas de LIQUIDAÇÃO de todos os anos são lidas ao mesmo
+tempo. A maior LIQUIDAÇÃO é descompactada e lida uma só vez neste processo
+(o XML de uma aba dentro do zip não permite começar a leitura no meio) e
+dividida em lotes de linhas somados por código no pool; os agregados dos
+lotes são combinados na ordem das linhas (etapa de redução)
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import multiprocessing
+import os
+import logging
+
+from .aggregation import LiquidacaoTotals, aggregate_liquidacao
+from .ingest_scheduler import CancelToken, IngestCancelled
+from .xlsx_reader import XlsxReader
+
+logger = logging.getLogger(__name__)
+
+# Linhas da maior LIQUIDAÇÃO enviadas a cada tarefa do pool
+ROW_BATCH = 50_000
+# Lotes em andamento por processo (limita a memória das linhas em trânsito)
+BATCHES_PER_WORKER = 2
+
+
+def _read_validacoes(file_path: str, sheet_name: str, columns: Sequence[int]) -> List[Tuple[Any, ...]]:
+    """Lê as linhas projetadas da aba VALIDAÇÕES (executado no pool)"""
+    reader = XlsxReader(file_path)
+    try:
+        return list(reader.iter_rows(sheet_name, columns, min_row=2))
+    finally:
+        reader.close()
+
+
+def _sum_liquidacao(file_path: str, sheet_name: str, columns: Sequence[int]) -> Tuple[LiquidacaoTotals, int]:
+    """Agrega por código as linhas de uma aba de LIQUIDAÇÃO (executado no pool)"""
+    reader = XlsxReader(file_path)
+    rows_read = 0
+
+    def counted(rows):
+        nonlocal rows_read
+        for row in rows:
+            rows_read += 1
+            yield row
+
+    try:
+        return aggregate_liquidacao(counted(reader.iter_rows(sheet_name, columns, min_row=2))), rows_read
+    finally:
+        reader.close()
+
+
+class ParallelIngestor:
+    """Executa a leitura das abas em um pool de processos reaproveitado entre arquivos"""
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Inicializa o executor
+
+        Args:
+            workers: Número de processos (padrão: número de CPUs)
+        """
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def run(self, file_path: str, validacoes: Tuple[str, Sequence[int]],
+            liquidacao: Dict[int, Tuple[str, Sequence[int]]],
+            cancel: Optional[CancelToken] = None) -> Tuple[List[Tuple[Any, ...]], Dict[int, LiquidacaoTotals], int]:
+        """
+        Lê as abas em paralelo
+
+        Args:
+            file_path: Caminho do arquivo Excel
+            validacoes: Aba VALIDAÇÕES e colunas projetadas
+            liquidacao: Ano -> (aba de LIQUIDAÇÃO, colunas projetadas)
+            cancel: Token verificado enquanto o pool trabalha
+
+        Returns:
+            Tupla (linhas da VALIDAÇÕES, agregados da LIQUIDAÇÃO por ano, linhas lidas)
+
+        Raises:
+            IngestCancelled: Se o cancelamento foi pedido antes do fim da leitura
+        """
+        pool = self._get_pool()
+        reader = XlsxReader(file_path)
+        # A maior aba é dividida em lotes de linhas; as outras são uma tarefa cada
+        split_year = max(liquidacao, key=lambda year: reader.sheet_size(liquidacao[year][0]), default=None)
+        try:
+            rows_future = pool.submit(_read_validacoes, file_path, *validacoes)
+            futures = {
+                year: pool.submit(_sum_liquidacao, file_path, sheet_name, columns)
+                for year, (sheet_name, columns) in liquidacao.items() if year != split_year
+            }
+            batches = []
+            split_rows = 0
+            if split_year is not None:
+                batches, split_rows = self._submit_batches(pool, reader, *liquidacao[split_year], cancel)
+            if cancel is not None:
+                cancel.wait_futures([rows_future, *futures.values(), *batches])
+            rows = rows_future.result()
+            parts = {year: future.result() for year, future in futures.items()}
+            if split_year is not None:
+                parts[split_year] = (LiquidacaoTotals.merge(batch.result() for batch in batches), split_rows)
+        except IngestCancelled:
+            for future in (rows_future, *futures.values()):
+                future.cancel()
+            raise
+        except Exception:
+            # Um processo que morreu inutiliza o pool; recriar na próxima vez
+            self.shutdown()
+            raise
+        finally:
+            reader.close()
+
+        by_year = {year: parts[year][0] for year in liquidacao}
+        rows_read = len(rows) + sum(count for _, count in parts.values())
+        logger.info(f"Leitura paralela: VALIDAÇÕES, {len(liquidacao)} aba(s) de LIQUIDAÇÃO e "
+                    f"{len(batches)} lote(s) de linhas em {self.workers} processo(s)")
+        return rows, by_year, rows_read
+
+    def _submit_batches(self, pool: ProcessPoolExecutor, reader: XlsxReader, sheet_name: str, columns: Sequence[int],
+                        cancel: Optional[CancelToken]) -> Tuple[List[Future], int]:
+        """
+        Lê a aba neste processo e envia cada lote de linhas ao pool
+
+        Returns:
+            Tupla (futuros dos agregados na ordem das linhas, linhas lidas)
+        """
+        batches: List[Future] = []
+        rows_read = 0
+        rows = reader.iter_rows(sheet_name, columns, min_row=2)
+        try:
+            while True:
+                batch = list(islice(rows, ROW_BATCH))
+                if not batch:
+                    break
+                rows_read += len(batch)
+                if cancel is not None:
+                    cancel.check()
+                # Esperar o lote mais antigo em andamento antes de ler mais linhas
+                in_flight = len(batches) - self.workers * BATCHES_PER_WORKER
+                if in_flight >= 0:
+                    wait([batches[in_flight]])
+                batches.append(pool.submit(aggregate_liquidacao, batch))
+        except IngestCancelled:
+            for batch in batches:
+                batch.cancel()
+            raise
+        finally:
+            rows.close()
+        return batches, rows_read
+
+    def shutdown(self) -> None:
+        """Encerra o pool de processos"""
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # 'spawn' evita herdar locks das threads do servidor (monitor, Channels)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._pool
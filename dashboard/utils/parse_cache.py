@@ -0,0 +1,215 @@
+"""
+Cache de processamento do Excel endereçado pelo conteúdo do arquivo
+Guarda a tabela de empresas em snapshots compactos no disco para evitar
+reprocessar bytes idênticos e para servir os dados logo após reiniciar
+"""
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from datetime import datetime
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import logging
+
+from .company_table import CompanyTable
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato do snapshot (faz parte do nome do arquivo)
+SNAPSHOT_FORMAT = 2
+
+# Colunas guardadas (nome no snapshot -> atributo da CompanyTable), além do
+# valor liquidado por ano; percentual e status são recalculados na leitura
+SNAPSHOT_COLUMNS = {
+    'code': 'codes',
+    'name': 'names',
+    'contract_value': 'contract_values',
+    'spent_value': 'spent_values',
+}
+
+LATEST_FILE = 'latest.json'
+
+
+def file_digest(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Calcula o SHA-256 do conteúdo do arquivo"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """Cache de empresas processadas, indexado pelo hash do workbook"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 100 * 1024 * 1024, variant: str = ''):
+        """
+        Inicializa o cache
+
+        Args:
+            cache_dir: Pasta dos snapshots
+            max_bytes: Tamanho máximo total dos snapshots (os menos usados são removidos)
+            variant: Identifica o que, além do conteúdo, muda o resultado do
+                processamento (ex: WorkbookSchema.fingerprint()); faz parte da chave
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.variant = variant
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def get_or_parse(self, file_path: str, parse: Callable[[str], CompanyTable]) -> CompanyTable:
+        """
+        Retorna as empresas do arquivo a partir do cache ou processando-o
+
+        Args:
+            file_path: Caminho do arquivo Excel
+            parse: Função de processamento (ex: ExcelProcessor.process_table)
+
+        Returns:
+            Tabela de empresas
+        """
+        digest = file_digest(file_path)
+        key = self.key(digest)
+        table = self.get(key)
+        if table is not None:
+            logger.info(f"Cache: conteúdo inalterado ({digest[:12]}), processamento evitado")
+            self._write_latest(key, file_path)
+            return table
+
+        table = parse(file_path)
+
+        # Só guardar se o arquivo não mudou durante o processamento
+        if len(table) and file_digest(file_path) == digest:
+            self.put(key, table, file_path)
+        return table
+
+    def key(self, digest: str) -> str:
+        """Chave do snapshot: hash do conteúdo e, se houver, a variante (esquema)"""
+        return f"{digest}-{self.variant}" if self.variant else digest
+
+    def get(self, digest: str) -> Optional[CompanyTable]:
+        """Lê um snapshot do cache; None se não existir ou estiver corrompido"""
+        path = self._snapshot_path(digest)
+        try:
+            snapshot = self._read(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Snapshot inválido descartado ({path.name}): {e}")
+            self._remove(path)
+            return None
+
+        # Marcar como usado recentemente (LRU pela data de modificação)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return snapshot['table']
+
+    def put(self, digest: str, table: CompanyTable, file_path: str) -> None:
+        """Grava o snapshot das empresas e o marca como o mais recente"""
+        columns = {
+            name: list(getattr(table, attribute))
+            for name, attribute in SNAPSHOT_COLUMNS.items()
+        }
+        payload = {
+            'format': SNAPSHOT_FORMAT,
+            'file_path': file_path,
+            'created_at': datetime.now().isoformat(),
+            'columns': columns,
+            'spent_by_year': {str(year): list(values) for year, values in table.spent_by_year.items()}
+        }
+        data = gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        self._atomic_write(self._snapshot_path(digest), data)
+        self._write_latest(digest, file_path)
+        self._evict()
+        logger.info(f"Cache: snapshot gravado ({digest[:12]}, {len(data) / 1024:.1f} KB)")
+
+    def load_latest(self) -> Optional[Dict[str, Any]]:
+        """
+        Lê o último snapshot publicado
+
+        Returns:
+            Dicionário com 'table', 'file_path' e 'digest', ou None
+        """
+        try:
+            latest = json.loads((self.cache_dir / LATEST_FILE).read_text(encoding='utf-8'))
+            # Snapshot lido com outro esquema: não serve para este processo
+            if latest['digest'].partition('-')[2] != self.variant:
+                return None
+            table = self.get(latest['digest'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+        if table is None:
+            return None
+        return {
+            'table': table,
+            'file_path': latest.get('file_path'),
+            'digest': latest['digest']
+        }
+
+    def _snapshot_path(self, digest: str) -> Path:
+        return self.cache_dir / f"{digest}.v{SNAPSHOT_FORMAT}.json.gz"
+
+    @staticmethod
+    def _read(path: Path) -> Dict[str, Any]:
+        with gzip.open(path, 'rb') as f:
+            payload = json.loads(f.read().decode('utf-8'))
+        if payload.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError(f"formato {payload.get('format')} não suportado")
+
+        columns = payload['columns']
+        table = CompanyTable(*(columns[name] for name in SNAPSHOT_COLUMNS), payload['spent_by_year'])
+        return {'table': table, 'file_path': payload.get('file_path')}
+
+    def _write_latest(self, digest: str, file_path: str) -> None:
+        data = json.dumps({'digest': digest, 'file_path': file_path}).encode('utf-8')
+        self._atomic_write(self.cache_dir / LATEST_FILE, data)
+
+    def _atomic_write(self, path: Path, data: bytes) -> None:
+        """Grava em arquivo temporário e renomeia (leitores nunca veem arquivo parcial)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(Path(tmp_path))
+            raise
+
+    def _evict(self) -> None:
+        """Remove os snapshots menos usados até respeitar o limite de tamanho"""
+        try:
+            latest = json.loads((self.cache_dir / LATEST_FILE).read_text(encoding='utf-8')).get('digest')
+        except (OSError, ValueError):
+            latest = None
+        keep = self._snapshot_path(latest) if latest else None
+
+        entries = []
+        for path in self.cache_dir.glob('*.json.gz'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            total -= size
+            logger.info(f"Cache: snapshot removido ({path.name})")
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
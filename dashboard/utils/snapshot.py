@@ -0,0 +1,232 @@
+"""
+Versão imutável dos dados do dashboard
+Cada ingestão monta um Snapshot novo à parte e o publica trocando uma única
+referência (views.current_snapshot); quem lê nunca trava nem vê um estado
+pela metade, e o que é derivado dos dados (como o JSON) fica guardado na
+própria versão
+
+Formatos de envio: 'json' (uma lista de objetos por empresa), 'columnar'
+(JSON com uma lista por campo e o status como índice em STATUSES) e
+'msgpack' (o formato colunar em MessagePack, se o pacote estiver instalado)
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+import gzip
+import hashlib
+import json
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele o conteúdo é comprimido só em gzip
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack é opcional: sem ele o formato 'msgpack' fica indisponível
+    msgpack = None
+
+from .company_table import STATUSES
+
+# Formatos de envio e seus Content-Type
+WIRE_FORMATS = {
+    'json': 'application/json',
+    'columnar': 'application/json',
+    'msgpack': 'application/x-msgpack',
+}
+# Campos por empresa enviados como colunas no formato colunar
+COLUMNAR_FIELDS = ('code', 'name', 'contract_value', 'spent_value', 'percentage')
+
+# Codificações pré-comprimidas, da preferida à menos preferida
+CONTENT_ENCODINGS = ('br', 'gzip')
+# Cada versão é comprimida uma só vez: vale usar níveis altos
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+
+class Snapshot:
+    """Dados do dashboard em uma versão (não devem ser alterados depois de criados)"""
+
+    __slots__ = ('version', 'companies', 'statistics', 'file_path', 'last_update', '_data', '_payload',
+                 '_encoded', '_etag', '_index')
+
+    def __init__(self, version: int, companies: Iterable[Dict[str, Any]], statistics: Dict[str, Any],
+                 file_path: Optional[str] = None, last_update: Optional[str] = None,
+                 payload: Optional[bytes] = None):
+        """
+        Inicializa o snapshot
+
+        Args:
+            version: Número da versão (crescente)
+            companies: Empresas (dicionários da API)
+            statistics: Estatísticas gerais
+            file_path: Arquivo ou pasta de origem
+            last_update: Data/hora da ingestão (ISO)
+            payload: JSON já serializado destes dados, se disponível
+        """
+        set_ = object.__setattr__
+        set_(self, 'version', version)
+        set_(self, 'companies', tuple(companies))
+        set_(self, 'statistics', statistics)
+        set_(self, 'file_path', file_path)
+        set_(self, 'last_update', last_update)
+        set_(self, '_data', None)
+        set_(self, '_payload', payload)
+        set_(self, '_encoded', {})
+        set_(self, '_etag', None)
+        set_(self, '_index', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Snapshot é imutável: publique uma nova versão em vez de alterar '{name}'")
+
+    @classmethod
+    def empty(cls) -> 'Snapshot':
+        """Versão 0, antes da primeira ingestão"""
+        return cls(0, (), {})
+
+    @classmethod
+    def from_payload(cls, payload: bytes, encodings: Optional[Dict[Tuple[str, str], bytes]] = None) -> 'Snapshot':
+        """
+        Snapshot a partir do JSON publicado (ver SnapshotStore)
+
+        Args:
+            payload: JSON publicado
+            encodings: Formatos e compressões publicados com o JSON (ver encodings())
+        """
+        data = json.loads(payload)
+        snapshot = cls(data.get('version', 0), data.get('companies', ()), data.get('statistics', {}),
+                       data.get('file_path'), data.get('last_update'), payload)
+        snapshot._encoded.update(encodings or {})
+        return snapshot
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dados no formato da API (o mesmo dicionário a cada chamada)"""
+        if self._data is None:
+            object.__setattr__(self, '_data', {
+                'companies': list(self.companies),
+                'statistics': self.statistics,
+                'last_update': self.last_update,
+                'file_path': self.file_path,
+                'version': self.version
+            })
+        return self._data
+
+    @property
+    def payload(self) -> bytes:
+        """JSON dos dados, serializado uma só vez por versão"""
+        if self._payload is None:
+            object.__setattr__(self, '_payload', json.dumps(self.to_dict(), separators=(',', ':')).encode('utf-8'))
+        return self._payload
+
+    @property
+    def etag(self) -> str:
+        """ETag HTTP desta versão (número da versão e hash do conteúdo)"""
+        if self._etag is None:
+            digest = hashlib.blake2b(self.payload, digest_size=8).hexdigest()
+            object.__setattr__(self, '_etag', f'"{self.version}-{digest}"')
+        return self._etag
+
+    def etag_for(self, wire: str = 'json') -> str:
+        """ETag da versão em um formato de envio (cada formato é uma representação)"""
+        return self.etag if wire == 'json' else f'{self.etag[:-1]}-{wire}"'
+
+    def columnar(self) -> Dict[str, Any]:
+        """Dados no formato colunar: uma lista por campo das empresas"""
+        companies = self.companies
+        years = sorted({year for c in companies for year in c.get('spent_by_year', {})})
+        status_index = {status: index for index, status in enumerate(STATUSES)}
+        columns: Dict[str, Any] = {field: [c.get(field) for c in companies] for field in COLUMNAR_FIELDS}
+        columns['status'] = [status_index.get(c.get('status'), 0) for c in companies]
+        columns['spent_by_year'] = {
+            year: [c.get('spent_by_year', {}).get(year, 0.0) for c in companies] for year in years
+        }
+        return {
+            'format': 'columnar',
+            'version': self.version,
+            'statuses': list(STATUSES),
+            'count': len(companies),
+            'companies': columns,
+            'statistics': self.statistics,
+            'last_update': self.last_update,
+            'file_path': self.file_path
+        }
+
+    def body(self, wire: str = 'json') -> Optional[bytes]:
+        """
+        Conteúdo sem compressão no formato de envio, serializado uma só vez por versão
+
+        Returns:
+            Os bytes, ou None se o formato não estiver disponível (msgpack não instalado)
+        """
+        if wire == 'json':
+            return self.payload
+        key = (wire, 'identity')
+        if key not in self._encoded:
+            if wire == 'columnar':
+                body = json.dumps(self.columnar(), separators=(',', ':')).encode('utf-8')
+            elif wire == 'msgpack' and msgpack is not None:
+                body = msgpack.packb(self.columnar(), use_bin_type=True)
+            else:
+                body = None
+            self._encoded[key] = body
+        return self._encoded[key]
+
+    def encoded(self, encoding: str, wire: str = 'json') -> Optional[bytes]:
+        """
+        Conteúdo na codificação pedida, comprimido uma só vez por versão
+
+        Args:
+            encoding: 'identity', 'gzip' ou 'br'
+            wire: Formato de envio ('json', 'columnar' ou 'msgpack')
+
+        Returns:
+            Os bytes, ou None se a codificação ou o formato não estiverem
+            disponíveis (brotli ou msgpack não instalados)
+        """
+        if encoding == 'identity':
+            return self.body(wire)
+        key = (wire, encoding)
+        if key not in self._encoded:
+            body = self.body(wire)
+            if body is None:
+                pass
+            elif encoding == 'gzip':
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            elif encoding == 'br' and brotli is not None:
+                body = brotli.compress(body, quality=BROTLI_QUALITY)
+            else:
+                body = None
+            self._encoded[key] = body
+        return self._encoded[key]
+
+    @property
+    def index(self):
+        """Índices de consulta das empresas (CompanyIndex), montados uma só vez por versão"""
+        if self._index is None:
+            from .snapshot_index import CompanyIndex
+            object.__setattr__(self, '_index', CompanyIndex(self.companies))
+        return self._index
+
+    def cached_body(self, wire: str = 'json') -> Optional[bytes]:
+        """Conteúdo no formato de envio se já foi serializado (senão None, sem serializar)"""
+        if wire == 'json':
+            return self._payload
+        return self._encoded.get((wire, 'identity'))
+
+    def encodings(self) -> Dict[Tuple[str, str], bytes]:
+        """Formatos e compressões já montados, além do JSON (publicados no SnapshotStore)"""
+        return {key: body for key, body in self._encoded.items() if body is not None}
+
+    def prepare(self) -> 'Snapshot':
+        """Serializa, comprime e indexa antes da publicação (as requisições e o WebSocket só copiam bytes)"""
+        for wire in WIRE_FORMATS:
+            for encoding in ('identity',) + CONTENT_ENCODINGS:
+                self.encoded(encoding, wire)
+        self.etag
+        self.index
+        return self
+
+    def __len__(self) -> int:
+        return len(self.companies)
+
+    def __repr__(self) -> str:
+        return f"Snapshot(version={self.version}, companies={len(self.companies)}, file_path={self.file_path!r})"
@@ -0,0 +1,216 @@
+"""
+Índices das empresas de um snapshot
+Montados uma vez por versão (ao publicar): posição por código, ordem por
+chave de ordenação, posições por status e, para a busca, trigramas e
+palavras do nome e do código sem acentos. As consultas de /api/companies e
+/api/search usam esses índices em vez de percorrer todas as empresas
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .company_table import STATUSES
+from .text import normalize_text
+
+# Chaves de ordenação (?sort=chave ou ?sort=-chave)
+SORT_KEYS = ('name', 'code', 'contract_value', 'spent_value', 'available', 'percentage')
+
+
+def _sort_value(company: Dict[str, Any], key: str) -> Any:
+    if key == 'name':
+        return normalize_text(company.get('name'))
+    if key == 'code':
+        return normalize_text(company.get('code'))
+    if key == 'available':
+        return (company.get('contract_value') or 0) - (company.get('spent_value') or 0)
+    return company.get(key) or 0
+
+
+class CompanyIndex:
+    """Índices de consulta sobre as empresas de um snapshot (imutável)"""
+
+    def __init__(self, companies: Sequence[Dict[str, Any]]):
+        """
+        Monta os índices
+
+        Args:
+            companies: Empresas do snapshot (dicionários da API)
+        """
+        self.companies = companies
+        self.by_code: Dict[str, int] = {company['code']: position for position, company in enumerate(companies)}
+
+        # Para cada chave: posições em ordem crescente, valores nessa ordem e a posição de cada empresa na ordem
+        self.orders: Dict[str, Tuple[int, ...]] = {}
+        self.sorted_values: Dict[str, List[Any]] = {}
+        self.ranks: Dict[str, List[int]] = {}
+        for key in SORT_KEYS:
+            values = [_sort_value(company, key) for company in companies]
+            # O código desempata: a mesma ordem a cada versão
+            order = tuple(sorted(
+                range(len(companies)), key=lambda position: (values[position], companies[position]['code'])
+            ))
+            ranks = [0] * len(companies)
+            for rank, position in enumerate(order):
+                ranks[position] = rank
+            self.orders[key] = order
+            self.sorted_values[key] = [values[position] for position in order]
+            self.ranks[key] = ranks
+
+        # Posições de cada status, na ordem por nome
+        self.status_buckets: Dict[str, Tuple[int, ...]] = {
+            status: tuple(position for position in self.orders['name'] if companies[position].get('status') == status)
+            for status in STATUSES
+        }
+
+        # Busca: texto normalizado ("nome código") de cada empresa, trigramas e palavras em ordem
+        self.search_names: List[str] = [_sort_value(company, 'name') for company in companies]
+        self.search_codes: List[str] = [_sort_value(company, 'code') for company in companies]
+        self.search_texts: List[str] = [f'{name} {code}' for name, code in zip(self.search_names, self.search_codes)]
+        self.trigrams: Dict[str, List[int]] = {}
+        words = set()
+        for position, text in enumerate(self.search_texts):
+            for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+                self.trigrams.setdefault(gram, []).append(position)
+            words.update((word, position) for word in text.split())
+        self.words: List[Tuple[str, int]] = sorted(words)
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        """Empresa pelo código (ou None)"""
+        position = self.by_code.get(code)
+        return None if position is None else self.companies[position]
+
+    def status_counts(self) -> Dict[str, int]:
+        """Quantidade de empresas de cada status"""
+        return {status: len(positions) for status, positions in self.status_buckets.items()}
+
+    def _range(self, key: str, low: Any = None, high: Any = None) -> Set[int]:
+        """Posições com low <= valor <= high (busca binária na ordem da chave)"""
+        values = self.sorted_values[key]
+        start = 0 if low is None else bisect_left(values, low)
+        end = len(values) if high is None else bisect_right(values, high)
+        return set(self.orders[key][start:end])
+
+    def _prefix(self, key: str, prefix: str) -> Set[int]:
+        """Posições cujo valor (normalizado) começa com o prefixo"""
+        start, end = self._bounds(key, prefix)
+        return set(self.orders[key][start:end])
+
+    def query(self, statuses: Optional[Iterable[str]] = None, percentage_min: Optional[float] = None,
+              percentage_max: Optional[float] = None, prefix: Optional[str] = None,
+              sort: str = 'name', descending: bool = False,
+              offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Empresas filtradas e ordenadas
+
+        Args:
+            statuses: Status aceitos ('ok', 'warning', 'critical')
+            percentage_min: Percentual utilizado mínimo
+            percentage_max: Percentual utilizado máximo
+            prefix: Início do nome ou do código (sem diferença de acentos e maiúsculas)
+            sort: Chave de ordenação (SORT_KEYS)
+            descending: Ordem decrescente
+            offset: Empresas puladas
+            limit: Máximo de empresas devolvidas (None = todas)
+
+        Returns:
+            (total de empresas filtradas, empresas da página)
+        """
+        # Cada filtro vira um conjunto de posições; a interseção começa pelo menor
+        selections: List[Set[int]] = []
+        if statuses is not None:
+            selections.append({position for status in statuses for position in self.status_buckets.get(status, ())})
+        if percentage_min is not None or percentage_max is not None:
+            selections.append(self._range('percentage', percentage_min, percentage_max))
+        if prefix:
+            prefix = normalize_text(prefix)
+            selections.append(self._prefix('name', prefix) | self._prefix('code', prefix))
+
+        order = self.orders[sort]
+        end = None if limit is None else offset + limit
+        if not selections:
+            # Sem filtros: só a fatia da página é lida da ordem
+            total = len(order)
+            if descending:
+                stop = total - offset
+                start = 0 if end is None else max(total - end, 0)
+                positions = order[start:max(stop, 0)][::-1]
+            else:
+                positions = order[offset:end]
+            return total, [self.companies[position] for position in positions]
+
+        selections.sort(key=len)
+        selected = selections[0].intersection(*selections[1:])
+        ranks = self.ranks[sort]
+        positions = sorted(selected, key=ranks.__getitem__, reverse=descending)
+        return len(positions), [self.companies[position] for position in positions[offset:end]]
+
+    def _token_matches(self, token: str) -> Set[int]:
+        """Posições cujo texto contém o termo (trigramas) ou, se curto, tem palavra que começa com ele"""
+        if len(token) < 3:
+            start = bisect_left(self.words, (token,))
+            end = bisect_left(self.words, (token + '\U0010ffff',))
+            return {position for _, position in self.words[start:end]}
+
+        postings = [self.trigrams.get(token[i:i + 3], ()) for i in range(len(token) - 2)]
+        postings.sort(key=len)
+        if not postings[0]:
+            return set()
+        candidates = set(postings[0]).intersection(*postings[1:])
+        # Trigramas em comum não garantem a sequência: confirmar no texto
+        return {position for position in candidates if token in self.search_texts[position]}
+
+    def search(self, term: str, limit: int = 20) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Empresas cujo nome ou código contém todas as palavras do termo
+
+        Sem diferença de acentos e maiúsculas. A ordem é a relevância: código
+        igual ao termo, código que começa com ele, nome que começa com ele,
+        palavra do nome que começa com ele e, por fim, qualquer ocorrência;
+        empates pela ordem alfabética do nome
+
+        Returns:
+            Lista de (relevância, empresa), da mais relevante (0) à menos (4)
+        """
+        term = normalize_text(term)
+        tokens = term.split()
+        if not tokens:
+            return []
+
+        matches = [self._token_matches(token) for token in tokens]
+        matches.sort(key=len)
+        selected = matches[0].intersection(*matches[1:])
+        if not selected:
+            return []
+
+        # Cada nível de relevância sai de um índice já ordenado; só o que falta é ordenado aqui
+        name_ranks = self.ranks['name']
+        word_start = bisect_left(self.words, (term,))
+        word_end = bisect_left(self.words, (term + '\U0010ffff',))
+        code_start, code_end = self._bounds('code', term)
+        name_start, name_end = self._bounds('name', term)
+        tiers = (
+            [position for position in self.orders['code'][code_start:code_end] if self.search_codes[position] == term],
+            self.orders['code'][code_start:code_end],
+            self.orders['name'][name_start:name_end],
+            [position for _, position in self.words[word_start:word_end]],
+            selected,
+        )
+
+        results: List[Tuple[int, Dict[str, Any]]] = []
+        seen: Set[int] = set()
+        for score, positions in enumerate(tiers):
+            found = sorted(
+                {position for position in positions if position in selected and position not in seen},
+                key=name_ranks.__getitem__
+            )
+            for position in found[:limit - len(results)]:
+                results.append((score, self.companies[position]))
+            if len(results) >= limit:
+                break
+            seen.update(found)
+        return results
+
+    def _bounds(self, key: str, prefix: str) -> Tuple[int, int]:
+        """Faixa da ordem da chave com valores que começam com o prefixo"""
+        values = self.sorted_values[key]
+        return bisect_left(values, prefix), bisect_left(values, prefix + '\U0010ffff')
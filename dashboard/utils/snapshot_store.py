@@ -0,0 +1,206 @@
+"""
+Publicação dos dados do dashboard entre processos
+O processo ingestor grava cada versão dos dados, já serializada em JSON, em
+uma tabela SQLite, junto com os outros formatos de envio e as compressões
+(montados uma só vez); os processos web verificam a versão (consulta barata)
+e só leem o conteúdo quando ela muda
+"""
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+import json
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class VersionConflict(Exception):
+    """Outra versão foi publicada depois da versão usada como base"""
+
+
+class SnapshotStore:
+    """Última versão publicada dos dados, compartilhada pelos processos da máquina"""
+
+    def __init__(self, path: str):
+        """
+        Inicializa o store
+
+        Args:
+            path: Banco SQLite dos dados publicados (criado se não existir)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS snapshot ('
+                'id INTEGER PRIMARY KEY CHECK (id = 1), '
+                'version INTEGER NOT NULL, '
+                'published_at REAL NOT NULL, '
+                'payload BLOB NOT NULL)'
+            )
+            # Formatos/compressões da versão publicada (ver Snapshot.encodings)
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS snapshot_body ('
+                'version INTEGER NOT NULL, '
+                'wire TEXT NOT NULL, '
+                'encoding TEXT NOT NULL, '
+                'body BLOB NOT NULL, '
+                'PRIMARY KEY (wire, encoding))'
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Conexão da thread atual (sqlite3 não compartilha conexões entre threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            # WAL: leitores não bloqueiam a publicação e vice-versa
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.data_version = None
+            self._local.version = None
+        return conn
+
+    def publish(self, data: Dict[str, Any], expected_version: Optional[int] = None,
+                encode: Optional[Callable[[int, bytes], Dict[Tuple[str, str], bytes]]] = None) -> Tuple[int, bytes]:
+        """
+        Publica uma nova versão dos dados (serializados uma só vez)
+
+        Args:
+            data: Dados do dashboard; recebem a chave 'version'
+            expected_version: Versão a partir da qual os dados foram montados
+                (0 = nada publicado); None publica sem conferir
+            encode: Recebe (versão, JSON) e devolve {(formato, codificação): bytes},
+                gravados junto com o JSON para os outros processos não refazerem
+
+        Returns:
+            (versão publicada, conteúdo JSON serializado)
+
+        Raises:
+            VersionConflict: Se a versão publicada não é mais expected_version
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT version FROM snapshot WHERE id = 1').fetchone()
+            current = row[0] if row else 0
+            # Conferido com a trava de escrita: nenhuma publicação entra entre a leitura e a gravação
+            if expected_version is not None and current != expected_version:
+                raise VersionConflict(f"versão {current} publicada (esperada {expected_version})")
+            version = current + 1
+            payload = json.dumps({**data, 'version': version}, separators=(',', ':')).encode('utf-8')
+            conn.execute(
+                'INSERT OR REPLACE INTO snapshot (id, version, published_at, payload) VALUES (1, ?, ?, ?)',
+                (version, time.time(), payload)
+            )
+            conn.execute('DELETE FROM snapshot_body')
+            if encode is not None:
+                conn.executemany(
+                    'INSERT INTO snapshot_body (version, wire, encoding, body) VALUES (?, ?, ?, ?)',
+                    [(version, wire, encoding, body) for (wire, encoding), body in encode(version, payload).items()]
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        self._local.version = version
+        return version, payload
+
+    def version(self) -> Optional[int]:
+        """
+        Versão publicada, ou None se nada foi publicado
+
+        Só consulta a tabela quando outra conexão gravou desde a última
+        verificação (PRAGMA data_version não lê o banco)
+        """
+        conn = self._connection()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self._local.data_version or self._local.version is None:
+            row = conn.execute('SELECT version FROM snapshot WHERE id = 1').fetchone()
+            self._local.data_version = data_version
+            self._local.version = row[0] if row else None
+        return self._local.version
+
+    def load(self) -> Optional[Tuple[int, bytes]]:
+        """Versão e conteúdo JSON publicados, ou None"""
+        row = self._connection().execute('SELECT version, payload FROM snapshot WHERE id = 1').fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def load_encodings(self, version: int) -> Dict[Tuple[str, str], bytes]:
+        """Formatos e compressões gravados com a versão ({} se a versão já foi substituída)"""
+        rows = self._connection().execute(
+            'SELECT wire, encoding, body FROM snapshot_body WHERE version = ?', (version,)
+        ).fetchall()
+        return {(wire, encoding): bytes(body) for wire, encoding, body in rows}
+
+    def close(self) -> None:
+        """Fecha a conexão da thread atual"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class SnapshotFollower:
+    """Acompanha o store e entrega cada versão nova"""
+
+    def __init__(self, store: SnapshotStore, on_update: Callable[[int, bytes], None],
+                 interval: float = 1.0):
+        """
+        Inicializa o acompanhamento
+
+        Args:
+            store: Store publicado pelo ingestor
+            on_update: Chamado com (versão, conteúdo JSON) a cada versão nova
+            interval: Intervalo em segundos entre as verificações da thread
+        """
+        self.store = store
+        self.on_update = on_update
+        self.interval = interval
+        self.version: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name='snapshot-follower', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def poll(self) -> bool:
+        """
+        Verifica o store uma vez (também chamado pelas requisições)
+
+        Returns:
+            True se uma versão nova foi entregue
+        """
+        version = self.store.version()
+        if version is None or version == self.version:
+            return False
+
+        with self._lock:
+            loaded = self.store.load()
+            if loaded is None or loaded[0] == self.version:
+                return False
+            self.version = loaded[0]
+            self.on_update(*loaded)
+            return True
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Erro ao acompanhar os dados publicados: {e}")
+            self._stop.wait(self.interval)
@@ -0,0 +1,16 @@
+"""
+Normalização de texto para comparações sem acentos e sem diferença de
+maiúsculas (busca, ordenação e cabeçalhos)
+"""
+
+from typing import Any
+import unicodedata
+
+
+def normalize_text(value: Any) -> str:
+    """Texto sem acentos, sem diferença de maiúsculas e com espaços simples"""
+    if value is None:
+        return ''
+    text = unicodedata.normalize('NFKD', str(value))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.casefold().split())
@@ -0,0 +1,356 @@
+"""
+Leitor nativo de arquivos xlsx/xlsm (zip + XML)
+Lê apenas as abas e colunas pedidas sem criar objetos Cell do openpyxl
+"""
+
+from openpyxl.styles.stylesheet import Stylesheet
+from openpyxl.utils.datetime import from_excel, from_ISO8601, CALENDAR_WINDOWS_1900, CALENDAR_MAC_1904
+from openpyxl.xml.functions import fromstring
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from xml.parsers import expat
+import posixpath
+import zipfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Namespaces SpreadsheetML (transitional e strict)
+MAIN_NAMESPACES = (
+    'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+    'http://purl.oclc.org/ooxml/spreadsheetml/main',
+)
+REL_NAMESPACES = (
+    'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'http://purl.oclc.org/ooxml/officeDocument/relationships',
+)
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+# Tamanho dos blocos lidos do zip e entregues ao parser
+CHUNK_SIZE = 64 * 1024
+
+# Códigos internos das tags relevantes
+_ROW, _CELL, _VALUE, _INLINE, _TEXT, _PHONETIC, _SI = range(7)
+
+_TAGS = {}
+for _ns in MAIN_NAMESPACES:
+    _TAGS.update({
+        f'{_ns} row': _ROW,
+        f'{_ns} c': _CELL,
+        f'{_ns} v': _VALUE,
+        f'{_ns} is': _INLINE,
+        f'{_ns} t': _TEXT,
+        f'{_ns} rPh': _PHONETIC,
+        f'{_ns} si': _SI,
+    })
+
+
+def column_index(reference: str) -> int:
+    """Converte a referência de uma célula (ex: 'AB12') no índice da coluna (base 0)"""
+    index = 0
+    for char in reference:
+        if char.isdigit():
+            break
+        index = index * 26 + (ord(char.upper()) - 64)
+    return index - 1
+
+
+def _cast_number(value: str):
+    """Converte número em texto para int ou float (mesma regra do openpyxl)"""
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+class _SharedStringsHandler:
+    """Acumula o texto de cada <si> ignorando a grafia fonética (<rPh>)"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._parts: List[str] = []
+        self._in_text = False
+        self._in_phonetic = False
+
+    def start(self, name, attrs):
+        tag = _TAGS.get(name)
+        if tag == _TEXT:
+            self._in_text = not self._in_phonetic
+        elif tag == _PHONETIC:
+            self._in_phonetic = True
+        elif tag == _SI:
+            self._parts = []
+
+    def end(self, name):
+        tag = _TAGS.get(name)
+        if tag == _TEXT:
+            self._in_text = False
+        elif tag == _PHONETIC:
+            self._in_phonetic = False
+        elif tag == _SI:
+            self.strings.append(''.join(self._parts).replace('x005F_', ''))
+
+    def data(self, text):
+        if self._in_text:
+            self._parts.append(text)
+
+
+class _SheetHandler:
+    """Converte os eventos do parser em linhas com as colunas projetadas"""
+
+    def __init__(self, reader: 'XlsxReader', columns: Sequence[int], min_row: int):
+        self.reader = reader
+        self.positions = {column: pos for pos, column in enumerate(columns)}
+        self.width = len(columns)
+        self.min_row = min_row
+        self.rows: List[Tuple[Any, ...]] = []
+        self._column_cache: Dict[str, int] = {}
+        self._row_number = 0
+        self._column = -1
+        self._values: List[Any] = [None] * self.width
+        self._position: Optional[int] = None
+        self._type = 'n'
+        self._style = 0
+        self._parts: List[str] = []
+        self._capture = False
+        self._in_phonetic = False
+
+    def start(self, name, attrs):
+        tag = _TAGS.get(name)
+        if tag == _CELL:
+            reference = attrs.get('r')
+            if reference:
+                letters = reference.rstrip('0123456789')
+                column = self._column_cache.get(letters)
+                if column is None:
+                    column = self._column_cache[letters] = column_index(letters)
+                self._column = column
+            else:
+                self._column += 1
+            self._position = self.positions.get(self._column)
+            if self._position is not None:
+                self._type = attrs.get('t', 'n')
+                style = attrs.get('s')
+                self._style = int(style) if style else 0
+                self._parts = []
+        elif self._position is None:
+            if tag == _ROW:
+                self._start_row(attrs)
+        elif tag == _VALUE:
+            self._capture = self._type != 'inlineStr'
+        elif tag == _INLINE:
+            # <is> presente: o valor passa a ser texto, mesmo que vazio
+            self._parts = ['']
+        elif tag == _TEXT:
+            self._capture = self._type == 'inlineStr' and not self._in_phonetic
+        elif tag == _PHONETIC:
+            self._in_phonetic = True
+
+    def _start_row(self, attrs):
+        reference = attrs.get('r')
+        if reference:
+            try:
+                self._row_number = int(reference)
+            except ValueError:
+                self._row_number = int(float(reference))
+        else:
+            self._row_number += 1
+        self._column = -1
+        self._values = [None] * self.width
+
+    def end(self, name):
+        tag = _TAGS.get(name)
+        if tag == _ROW:
+            if self._row_number >= self.min_row:
+                self.rows.append(tuple(self._values))
+        elif self._position is None:
+            return
+        elif tag == _CELL:
+            self._values[self._position] = self._convert()
+            self._position = None
+        elif tag == _VALUE or tag == _TEXT:
+            self._capture = False
+        elif tag == _PHONETIC:
+            self._in_phonetic = False
+
+    def data(self, text):
+        if self._capture:
+            self._parts.append(text)
+
+    def _convert(self) -> Any:
+        """Converte o valor bruto da célula como o openpyxl faz com data_only=True"""
+        data_type = self._type
+        value = ''.join(self._parts)
+
+        if data_type == 'inlineStr':
+            return value if self._parts else None
+        if not value:
+            return None
+        if data_type == 'n':
+            number = _cast_number(value)
+            if self._style in self.reader.date_formats:
+                try:
+                    return from_excel(number, self.reader.epoch,
+                                      timedelta=self._style in self.reader.timedelta_formats)
+                except (OverflowError, ValueError):
+                    return '#VALUE!'
+            return number
+        if data_type == 's':
+            return self.reader.shared_strings[int(value)]
+        if data_type == 'b':
+            return bool(int(value))
+        if data_type == 'd':
+            return from_ISO8601(value)
+        return value
+
+
+class XlsxReader:
+    """
+    Leitor de workbooks xlsx/xlsm direto do zip
+
+    Resolve os nomes das abas pelo workbook.xml e percorre o XML da aba em
+    blocos, devolvendo apenas as colunas pedidas de cada linha.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.archive = zipfile.ZipFile(file_path)
+        self.epoch = CALENDAR_WINDOWS_1900
+        self.date_formats = set()
+        self.timedelta_formats = set()
+        self._sheets: Dict[str, str] = {}
+        self._shared_strings_path: Optional[str] = None
+        self._styles_path: Optional[str] = None
+        self._shared_strings: Optional[List[str]] = None
+
+        try:
+            self._read_workbook()
+            self._read_styles()
+        except Exception:
+            self.archive.close()
+            raise
+
+    @property
+    def sheetnames(self) -> List[str]:
+        """Nomes das abas na ordem do workbook"""
+        return list(self._sheets)
+
+    def sheet_size(self, sheet_name: str) -> int:
+        """Tamanho do XML descompactado da aba, em bytes (sem ler a aba)"""
+        return self.archive.getinfo(self._sheets[sheet_name]).file_size
+
+    @property
+    def shared_strings(self) -> List[str]:
+        """Tabela de strings compartilhadas (carregada na primeira utilização)"""
+        if self._shared_strings is None:
+            handler = _SharedStringsHandler()
+            if self._shared_strings_path:
+                self._parse(self._shared_strings_path, handler)
+            self._shared_strings = handler.strings
+        return self._shared_strings
+
+    def close(self) -> None:
+        """Fecha o arquivo zip"""
+        self.archive.close()
+
+    def iter_rows(self, sheet_name: str, columns: Sequence[int], min_row: int = 1) -> Iterator[Tuple[Any, ...]]:
+        """
+        Percorre as linhas de uma aba
+
+        Args:
+            sheet_name: Nome da aba
+            columns: Índices (base 0) das colunas a devolver
+            min_row: Primeira linha (base 1) a devolver
+
+        Returns:
+            Iterador de tuplas com os valores das colunas pedidas
+        """
+        path = self._sheets[sheet_name]
+        handler = _SheetHandler(self, columns, min_row)
+        parser = self._create_parser(handler)
+
+        with self.archive.open(path) as source:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                parser.Parse(chunk, not chunk)
+                if handler.rows:
+                    rows, handler.rows = handler.rows, []
+                    yield from rows
+                if not chunk:
+                    break
+
+    def _read_workbook(self) -> None:
+        """Lê workbook.xml e seus relacionamentos para mapear abas em arquivos"""
+        workbook_path = self._office_document_path()
+        root = fromstring(self.archive.read(workbook_path))
+        main_ns = root.tag[1:].partition('}')[0]
+
+        properties = root.find(f'{{{main_ns}}}workbookPr')
+        if properties is not None and properties.get('date1904') in ('1', 'true'):
+            self.epoch = CALENDAR_MAC_1904
+
+        relationships = self._read_relationships(workbook_path)
+        for rel_type, target in relationships.values():
+            if rel_type.endswith('/sharedStrings'):
+                self._shared_strings_path = target
+            elif rel_type.endswith('/styles'):
+                self._styles_path = target
+
+        sheets = root.find(f'{{{main_ns}}}sheets')
+        for sheet in (sheets if sheets is not None else []):
+            rel_id = None
+            for rel_ns in REL_NAMESPACES:
+                rel_id = sheet.get(f'{{{rel_ns}}}id')
+                if rel_id:
+                    break
+            if rel_id in relationships:
+                self._sheets[sheet.get('name')] = relationships[rel_id][1]
+
+    def _read_styles(self) -> None:
+        """Identifica os estilos de data/hora (mesma regra do openpyxl)"""
+        if not self._styles_path or self._styles_path not in self.archive.namelist():
+            return
+        stylesheet = Stylesheet.from_tree(fromstring(self.archive.read(self._styles_path)))
+        self.date_formats = stylesheet.date_formats
+        self.timedelta_formats = stylesheet.timedelta_formats
+
+    def _office_document_path(self) -> str:
+        """Caminho do workbook principal segundo _rels/.rels"""
+        for rel_type, target in self._read_relationships('').values():
+            if rel_type.endswith('/officeDocument'):
+                return target
+        return 'xl/workbook.xml'
+
+    def _read_relationships(self, part_path: str) -> Dict[str, Tuple[str, str]]:
+        """Lê o arquivo .rels de uma parte e resolve os caminhos de destino"""
+        folder, name = posixpath.split(part_path)
+        rels_path = posixpath.join(folder, '_rels', f'{name}.rels')
+        try:
+            root = fromstring(self.archive.read(rels_path))
+        except KeyError:
+            return {}
+
+        relationships = {}
+        for rel in root.iter(f'{{{PACKAGE_REL_NS}}}Relationship'):
+            target = rel.get('Target', '')
+            if rel.get('TargetMode') == 'External':
+                continue
+            if target.startswith('/'):
+                target = target.lstrip('/')
+            else:
+                target = posixpath.normpath(posixpath.join(folder, target))
+            relationships[rel.get('Id')] = (rel.get('Type', ''), target)
+        return relationships
+
+    def _parse(self, path: str, handler) -> None:
+        """Processa uma parte XML inteira com o handler informado"""
+        parser = self._create_parser(handler)
+        with self.archive.open(path) as source:
+            parser.ParseFile(source)
+
+    @staticmethod
+    def _create_parser(handler):
+        parser = expat.ParserCreate(namespace_separator=' ')
+        parser.buffer_text = True
+        parser.StartElementHandler = handler.start
+        parser.EndElementHandler = handler.end
+        parser.CharacterDataHandler = handler.data
+        return parser
@@ -4,21 +4,30 @@ Convertido de Flask para Django
 """
 
 from django.shortcuts import render
-from django.http import JsonResponse, FileResponse, Http404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, FileResponse, Http404, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth import authenticate
 from django.conf import settings
-from django.db.models import Sum
 from datetime import datetime, timedelta
 from functools import wraps
+import io
 import jwt
 import logging
 import os
+import time
 
-from .models import User, Expense, CompanyAdjustment
+from . import company_listing, expense_import, expense_listing
+from .api_errors import ListingError
+from .db import create_expense, delete_expense as delete_expense_record, get_expense_writer
+from .export_cache import get_export_cache
+from .models import User, Expense, ExpenseTotal, CompanyAdjustment
+from .search import search_companies, search_expenses
+from .utils.company_table import CompanyTable
 from .utils.excel_processor import ExcelProcessor
 from .utils.export_excel import ExcelExporter
+from .utils.snapshot import CONTENT_ENCODINGS, WIRE_FORMATS, Snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -26,13 +35,11 @@ logger = logging.getLogger(__name__)
 processor = ExcelProcessor()
 exporter = ExcelExporter()
 
-# Dados atuais (em memória)
-current_data = {
-    'companies': [],
-    'statistics': {},
-    'last_update': None,
-    'file_path': None
-}
+# Agendador da ingestão (criado por DashboardConfig.start_file_monitor)
+ingest_scheduler = None
+
+# Dados atuais (em memória): substituídos por inteiro a cada versão, nunca alterados
+current_snapshot = Snapshot.empty()
 
 
 def token_required(f):
@@ -58,49 +65,49 @@ def token_required(f):
     return decorated
 
 
-def apply_adjustments_to_companies(companies):
-    """Aplica ajustes do banco de dados aos dados das empresas"""
-    for company in companies:
-        try:
-            adjustment = CompanyAdjustment.objects.filter(company_code=company['code']).first()
-            if adjustment:
-                # Aplicar ajustes se existirem
-                if adjustment.contract_value is not None:
-                    company['contract_value'] = float(adjustment.contract_value)
-                if adjustment.spent_value is not None:
-                    company['spent_value'] = float(adjustment.spent_value)
-                else:
-                    # Se não há ajuste de spent_value, usar soma de lançamentos
-                    total_expenses = Expense.objects.filter(
-                        company_code=company['code']
-                    ).aggregate(total=Sum('amount'))['total'] or 0
-                    if total_expenses > 0:
-                        company['spent_value'] = float(total_expenses)
-            else:
-                # Se não há ajuste, usar soma de lançamentos
-                total_expenses = Expense.objects.filter(
-                    company_code=company['code']
-                ).aggregate(total=Sum('amount'))['total'] or 0
-                if total_expenses > 0:
-                    company['spent_value'] = float(total_expenses)
-            
-            # Recalcular percentual
-            if company['contract_value'] > 0:
-                company['percentage'] = round((company['spent_value'] / company['contract_value']) * 100, 2)
-            else:
-                company['percentage'] = 0
-            
-            # Recalcular status
-            if company['percentage'] > 90:
-                company['status'] = 'critical'
-            elif company['percentage'] > 70:
-                company['status'] = 'warning'
-            else:
-                company['status'] = 'ok'
-        except Exception as e:
-            logger.error(f"Erro ao aplicar ajustes para empresa {company['code']}: {e}")
+def load_adjustments():
+    """
+    Carrega os ajustes e os totais de lançamentos de todas as empresas
+
+    Returns:
+        Tupla (ajustes, totais): ajustes por código como (valor do contrato,
+        valor gasto), cada um None se não ajustado; totais de lançamentos por código
+    """
+    adjustments = {
+        code: (contract_value, spent_value)
+        for code, contract_value, spent_value in CompanyAdjustment.objects.order_by().values_list(
+            'company_code', 'contract_value', 'spent_value'
+        )
+    }
+    # Totais mantidos a cada lançamento (ver ExpenseTotal): sem agregar a tabela de lançamentos
+    expense_totals = dict(ExpenseTotal.objects.order_by().values_list('company_code', 'total'))
+    return adjustments, expense_totals
+
+
+def apply_adjustments_to_companies(table: CompanyTable) -> CompanyTable:
+    """Aplica ajustes do banco de dados aos dados das empresas (retorna uma nova tabela)"""
+    table = table.copy()
+    try:
+        # Duas consultas no total, independente do número de empresas
+        adjustments, expense_totals = load_adjustments()
+    except Exception as e:
+        logger.error(f"Erro ao carregar ajustes: {e}")
+        return table
     
-    return companies
+    for row, code in enumerate(table.codes):
+        contract_value, spent_value = adjustments.get(code, (None, None))
+        if contract_value is not None:
+            table.set_contract(row, float(contract_value))
+        if spent_value is not None:
+            table.set_spent(row, float(spent_value))
+        else:
+            # Se não há ajuste de spent_value, usar soma de lançamentos
+            total_expenses = expense_totals.get(code) or 0
+            if total_expenses > 0:
+                table.set_spent(row, float(total_expenses))
+    
+    # Percentual e status são recalculados pela tabela a partir dos novos valores
+    return table
 
 
 def login_page(request):
@@ -205,13 +212,180 @@ def index(request):
 
 
 def get_data(request):
-    """Retorna dados atuais em JSON"""
-    return JsonResponse(current_data)
+    """
+    Retorna dados atuais em JSON
+    
+    ?format=columnar devolve uma lista por campo das empresas (status como
+    índice em 'statuses') e ?format=msgpack o mesmo em MessagePack
+    """
+    # Versão publicada por outro processo (verificação barata da versão)
+    from .ingest import refresh_snapshot
+    refresh_snapshot()
+    
+    snapshot = current_snapshot
+    wire = request.GET.get('format') or 'json'
+    if wire not in WIRE_FORMATS:
+        return JsonResponse({'error': f"Formato inválido: {wire}. Use {', '.join(WIRE_FORMATS)}"}, status=400)
+    if snapshot.body(wire) is None:
+        return JsonResponse({'error': f'Formato {wire} indisponível no servidor'}, status=406)
+    etag = snapshot.etag_for(wire)
+    
+    # Versão que o navegador já tem: 304 sem corpo
+    if _etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponse(status=304)
+    else:
+        # Serializado e comprimido uma só vez por versão: aqui só bytes prontos
+        encoding = _choose_encoding(request.headers.get('Accept-Encoding', ''), snapshot, wire)
+        response = HttpResponse(snapshot.encoded(encoding, wire), content_type=WIRE_FORMATS[wire])
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+    
+    response['ETag'] = etag
+    response['Vary'] = 'Accept-Encoding'
+    # O navegador guarda a resposta, mas confirma a versão a cada uso
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _etag_matches(header, etag: str) -> bool:
+    """If-None-Match contém a ETag (comparação fraca, como em RFC 9110)"""
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+
+def _choose_encoding(header: str, snapshot: Snapshot, wire: str = 'json') -> str:
+    """Codificação aceita pelo cliente (Accept-Encoding) e disponível no snapshot"""
+    accepted = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    
+    for encoding in CONTENT_ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0 and snapshot.encoded(encoding, wire) is not None:
+            return encoding
+    return 'identity'
+
+
+@require_http_methods(["GET"])
+def get_companies(request):
+    """
+    Empresas filtradas, ordenadas e paginadas (sem enviar a lista inteira)
+    
+    Parâmetros: status (ok, warning, critical; separados por vírgula),
+    pct_min/pct_max (percentual utilizado), q (início do nome ou do código),
+    sort (name, code, contract_value, spent_value, available, percentage;
+    com - para decrescente), offset e limit
+    """
+    from .ingest import refresh_snapshot
+    refresh_snapshot()
+    
+    try:
+        return JsonResponse(company_listing.page(current_snapshot, request.GET))
+    except ListingError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def get_company(request, company_code):
+    """Dados de uma empresa do snapshot atual"""
+    from .ingest import refresh_snapshot
+    refresh_snapshot()
+    
+    company = current_snapshot.index.get(company_code)
+    if company is None:
+        return JsonResponse({'error': 'Empresa não encontrada'}, status=404)
+    return JsonResponse({'company': company, 'version': current_snapshot.version})
+
+
+def search(request):
+    """
+    Busca de empresas e lançamentos por relevância
+    
+    Parâmetros: q (texto), type (companies, expenses ou os dois, separados
+    por vírgula), limit (por tipo) e company_code (restringe os lançamentos)
+    """
+    from .ingest import refresh_snapshot
+    refresh_snapshot()
+    
+    term = (request.GET.get('q') or '').strip()
+    if not term:
+        return JsonResponse({'error': 'Informe o texto da busca em q'}, status=400)
+    types = [kind.strip() for kind in (request.GET.get('type') or 'companies,expenses').split(',')]
+    if any(kind not in ('companies', 'expenses') for kind in types):
+        return JsonResponse({'error': 'type inválido. Use companies, expenses ou os dois'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit') or 10), 1), getattr(settings, 'SEARCH_MAX_RESULTS', 50))
+    except ValueError:
+        return JsonResponse({'error': f"limit inválido: {request.GET.get('limit')}"}, status=400)
+    
+    start = time.perf_counter()
+    result = {'query': term}
+    if 'companies' in types:
+        result['companies'] = search_companies(current_snapshot, term, limit)
+    if 'expenses' in types:
+        result['expenses'] = search_expenses(term, limit, request.GET.get('company_code'))
+    result['took_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return JsonResponse(result)
+
+
+def get_ingest_status(request):
+    """Métricas da fila de ingestão (profundidade, tempos de espera e contadores)"""
+    if ingest_scheduler is None:
+        # A ingestão roda em outro processo (run_ingestor)
+        from .ingest import get_leader_lock
+        return JsonResponse({'running': False, 'leader': get_leader_lock().holder(),
+                             'version': current_snapshot.version})
+    return JsonResponse(ingest_scheduler.stats())
 
 
 @require_http_methods(["GET"])
 def get_expenses(request):
-    """Obter lançamentos de gastos"""
+    """
+    Obter lançamentos de gastos, paginados por cursor
+    
+    Parâmetros: company_code, date_from, date_to, amount_min, amount_max,
+    fields (campos separados por vírgula), limit e cursor (next_cursor da
+    página anterior). Com all=1 devolve a lista completa, sem paginação;
+    com stream=json ou stream=ndjson devolve todos os lançamentos em fluxo
+    """
+    if request.GET.get('stream'):
+        return stream_expenses(request, request.GET['stream'])
+    if request.GET.get('all') == '1':
+        return get_all_expenses(request)
+    
+    try:
+        return JsonResponse(expense_listing.page(request.GET))
+    except ListingError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def stream_expenses(request, stream_format: str):
+    """Todos os lançamentos filtrados, serializados enquanto são lidos do banco"""
+    try:
+        content = expense_listing.stream(request.GET, stream_format)
+    except ListingError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    # No ASGI o conteúdo precisa ser assíncrono para não ser juntado em memória
+    if isinstance(request, ASGIRequest):
+        content = expense_listing.aiterate(content)
+    
+    response = StreamingHttpResponse(content, content_type=expense_listing.STREAM_FORMATS[stream_format])
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def get_all_expenses(request):
+    """Lista completa de lançamentos, sem paginação (formato antigo)"""
     company_code = request.GET.get('company_code')
     
     if company_code:
@@ -255,29 +429,22 @@ def add_expense(request):
         company_name = data.get('company_name')
         created_by = request.full_name or request.username
         
-        expense = Expense.objects.create(
-            company_code=company_code,
-            company_name=company_name,
-            amount=amount,
-            description=data.get('description', ''),
-            expense_date=data.get('expense_date'),
-            category=data.get('category', ''),
-            notes=data.get('notes', ''),
-            created_by=created_by
-        )
+        fields = {
+            'company_code': company_code,
+            'company_name': company_name,
+            'amount': amount,
+            'description': data.get('description', ''),
+            'expense_date': data.get('expense_date'),
+            'category': data.get('category', ''),
+            'notes': data.get('notes', ''),
+            'created_by': created_by
+        }
         
-        # Obter valor total de lançamentos da empresa
-        total_spent = Expense.objects.filter(
-            company_code=company_code
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Atualizar valor gasto na empresa no banco de dados
-        adjustment, created = CompanyAdjustment.objects.get_or_create(
-            company_code=company_code,
-            defaults={'company_name': company_name}
-        )
-        adjustment.spent_value = total_spent
-        adjustment.save()
+        if getattr(settings, 'EXPENSE_GROUP_COMMIT', False):
+            # Uma transação para todos os lançamentos que chegam na mesma janela
+            get_expense_writer().write(**fields)
+        else:
+            create_expense(**fields)
         
         # Reprocessar dados para atualizar (se houver arquivo)
         # Isso será feito pelo WebSocket em tempo real
@@ -288,13 +455,68 @@ def add_expense(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+@csrf_exempt
+@token_required
+@require_http_methods(["POST"])
+def import_expenses(request):
+    """
+    Importar lançamentos em lote (CSV, XLSX ou JSON/NDJSON)
+    
+    O arquivo vem no campo 'file' (multipart) ou no corpo da requisição; o
+    formato é o de ?format= ou o da extensão/Content-Type. Tudo ou nada: com
+    alguma linha inválida nada é gravado e a resposta lista os erros.
+    Com dry_run=1 só valida
+    """
+    upload = request.FILES.get('file')
+    if upload is not None:
+        stream, filename, content_type = upload, upload.name, upload.content_type
+    else:
+        stream, filename, content_type = io.BytesIO(request.body), None, request.content_type
+    
+    try:
+        import_format = request.GET.get('format') or expense_import.detect_format(filename, content_type)
+        rows = expense_import.read_rows(stream, import_format)
+        result = expense_import.import_expenses(
+            rows,
+            created_by=request.full_name or request.username,
+            dry_run=request.GET.get('dry_run') == '1'
+        )
+    except expense_import.ImportValidationError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'errors': [{'line': line, 'error': message} for line, message in e.errors]
+        }, status=400)
+    except ValueError as e:
+        # Arquivo ilegível (codificação, XLSX corrompido)
+        return JsonResponse({'success': False, 'error': f'Arquivo inválido: {e}'}, status=400)
+    except Exception as e:
+        logger.error(f"Erro ao importar lançamentos: {e}")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+    
+    # Uma só atualização do painel para todas as empresas importadas
+    if result['companies']:
+        from .ingest import publish_spent_values
+        try:
+            publish_spent_values(result['companies'])
+        except Exception as e:
+            logger.error(f"Erro ao publicar valores importados: {e}")
+    
+    return JsonResponse({
+        'success': True,
+        'imported': result['imported'],
+        'rows': result['rows'],
+        'companies': len(result['companies'])
+    })
+
+
 @csrf_exempt
 @require_http_methods(["DELETE"])
 def delete_expense(request, expense_id):
     """Deletar lançamento"""
     try:
-        expense = Expense.objects.get(id=expense_id)
-        expense.delete()
+        # O valor gasto da empresa acompanha o total de lançamentos
+        delete_expense_record(expense_id)
         return JsonResponse({'success': True})
     except Expense.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Lançamento não encontrado'}, status=404)
@@ -306,36 +528,38 @@ def delete_expense(request, expense_id):
 def download_expenses(request, company_code):
     """Baixar relatório de movimentos da empresa"""
     try:
-        company = None
-        for c in current_data.get('companies', []):
-            if c['code'] == company_code:
-                company = c
-                break
+        # Busca pelo índice por código do snapshot
+        company = current_snapshot.index.get(company_code)
         
         if not company:
             return JsonResponse({'error': 'Empresa não encontrada'}, status=404)
         
-        expenses = Expense.objects.filter(company_code=company_code).order_by('-expense_date')
-        
-        expenses_list = []
-        for expense in expenses:
-            expenses_list.append({
-                'expense_date': expense.expense_date.strftime('%Y-%m-%d'),
-                'description': expense.description,
-                'category': expense.category,
-                'amount': float(expense.amount),
-                'created_by': expense.created_by,
-                'notes': expense.notes,
-                'created_at': expense.created_at.isoformat(),
-            })
+        def build(path):
+            expenses = Expense.objects.filter(company_code=company_code).order_by('-expense_date')
+            
+            expenses_list = []
+            for expense in expenses:
+                expenses_list.append({
+                    'expense_date': expense.expense_date.strftime('%Y-%m-%d'),
+                    'description': expense.description,
+                    'category': expense.category,
+                    'amount': float(expense.amount),
+                    'created_by': expense.created_by,
+                    'notes': expense.notes,
+                    'created_at': expense.created_at.isoformat(),
+                })
+            
+            return exporter.export_company_expenses(
+                company_name=company['name'],
+                company_code=company_code,
+                contract_value=company['contract_value'],
+                spent_value=company['spent_value'],
+                expenses=expenses_list,
+                filepath=path
+            )
         
-        filepath = exporter.export_company_expenses(
-            company_name=company['name'],
-            company_code=company_code,
-            contract_value=company['contract_value'],
-            spent_value=company['spent_value'],
-            expenses=expenses_list
-        )
+        # Relatório gerado só quando os lançamentos, o ajuste ou os valores da empresa mudam
+        filepath = get_export_cache().get_or_export(company, build)
         
         if not filepath or not os.path.exists(filepath):
             return JsonResponse({'error': 'Erro ao gerar arquivo'}, status=500)
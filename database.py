@@ -240,6 +240,22 @@ class Database:
             logger.error(f"Erro ao obter ajustes: {e}")
             return []
 
+    def get_adjustments_by_company(self) -> Dict[str, Dict[str, Any]]:
+        """Obter os ajustes de todas as empresas, por código (uma consulta)"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute('SELECT * FROM company_adjustments')
+            rows = cursor.fetchall()
+            conn.close()
+
+            return {row['company_code']: dict(row) for row in rows}
+
+        except Exception as e:
+            logger.error(f"Erro ao obter ajustes: {e}")
+            return {}
+
     # ============ STATISTICS ============
 
     def get_expenses_by_company(self, company_code: str) -> float:
@@ -262,6 +278,26 @@ class Database:
             logger.error(f"Erro ao obter gastos: {e}")
             return 0
 
+    def get_expenses_totals_by_company(self) -> Dict[str, float]:
+        """Obter o total de gastos lançados de todas as empresas, por código (um GROUP BY)"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                SELECT company_code, SUM(amount) as total FROM expenses
+                GROUP BY company_code
+            ''')
+
+            rows = cursor.fetchall()
+            conn.close()
+
+            return {row['company_code']: row['total'] or 0 for row in rows}
+
+        except Exception as e:
+            logger.error(f"Erro ao obter gastos: {e}")
+            return {}
+
     def get_total_expenses(self) -> float:
         """Obter total de todos os gastos lançados"""
         try:
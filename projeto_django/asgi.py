@@ -17,6 +17,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'projeto_django.settings')
 
 django_asgi_app = get_asgi_application()
 
+# Dados publicados pelo processo de ingestão (manage.py run_ingestor)
+from dashboard.ingest import start_snapshot_follower
+start_snapshot_follower()
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
@@ -87,9 +87,30 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'dashboard.db',
+        # Transações começam com BEGIN IMMEDIATE: a trava de escrita é obtida
+        # (esperando busy_timeout) antes da primeira leitura. Com BEGIN DEFERRED
+        # uma transação que lê (ex: gatilhos do índice FTS5) e depois escreve
+        # falha com 'database is locked' se outra escrita terminou no meio
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
     }
 }
 
+# PRAGMAs aplicados a cada conexão SQLite: sem SQLITE_PRAGMAS vale o perfil
+# DEFAULT_SQLITE_PRAGMAS de dashboard/db.py (WAL, espera de até 5s por trava
+# em vez de 'database is locked', leitura por mmap e 64 MB de cache por
+# conexão); defina-o aqui só para usar outro perfil (dicionário completo), ex:
+# SQLITE_PRAGMAS = {'journal_mode': 'WAL', 'busy_timeout': 10000, ...}
+
+# Lançamentos de POST /api/expenses gravados em lote: os que chegam dentro
+# da janela (ms) vão para a mesma transação (até MAX_BATCH por transação)
+EXPENSE_GROUP_COMMIT = False
+EXPENSE_GROUP_COMMIT_WINDOW_MS = 5
+EXPENSE_GROUP_COMMIT_MAX_BATCH = 500
+
+# Importação em lote (POST /api/expenses/import e comando import_expenses):
+# linhas validadas e gravadas por bloco, todas na mesma transação
+EXPENSE_IMPORT_CHUNK_SIZE = 1000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -141,6 +162,76 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 WATCH_FOLDER = r"C:\Users\danielcoelho\Desktop\Nova pasta"
 EXCEL_PATTERN = "*.xlsm"
 CHECK_INTERVAL = 2
+# 'latest' processa só o arquivo modificado mais recentemente; 'all' processa
+# todos os arquivos da pasta (um por diretoria) e combina as empresas
+WATCH_MODE = 'latest'
+# Detecção de mudanças: 'auto' usa eventos do inotify (Linux) quando disponível
+# e varredura a cada CHECK_INTERVAL caso contrário, inclusive em pastas de rede
+# (NFS, SMB/CIFS, sshfs...), onde gravações de outras máquinas não geram
+# eventos; 'inotify' ou 'polling' forçam um dos dois
+FILE_MONITOR_BACKEND = 'auto'
+# Com inotify, varredura completa de segurança a cada N segundos (alterações
+# feitas por outras máquinas em pastas de rede não geram eventos; 0 desativa)
+FILE_MONITOR_RESCAN_INTERVAL = 60
+# Ingestão fora da thread do monitor: eventos em rajada dentro da janela viram
+# uma só ingestão e uma versão nova cancela a que está em andamento
+INGEST_DEBOUNCE_SECONDS = 0.5
+# Máximo de ingestões aguardando na fila (o monitor espera quando está cheia)
+INGEST_QUEUE_SIZE = 16
+# Só um processo monitora e processa o Excel (manage.py run_ingestor); a
+# eleição usa uma trava neste arquivo
+INGEST_LOCK_FILE = BASE_DIR / 'cache' / 'ingestor.lock'
+# runserver processa o Excel no próprio processo se nenhum ingestor estiver
+# ativo (False = sempre usar os dados publicados pelo run_ingestor)
+INGEST_EMBEDDED = True
+# Dados publicados pelo líder (já serializados) e lidos pelos processos web
+# (daphne/uvicorn); cada processo só relê o conteúdo quando a versão muda
+SNAPSHOT_DB = BASE_DIR / 'cache' / 'snapshot.sqlite3'
+# Intervalo em segundos da verificação de nova versão para o WebSocket
+# (/api/data verifica a versão a cada requisição)
+SNAPSHOT_POLL_INTERVAL = 1
+
+# Leitura do Excel: 'streaming' abre o arquivo em modo somente leitura e lê
+# apenas as abas/colunas usadas; 'xml' lê o zip/XML diretamente (mais rápido);
+# 'parallel' usa o leitor 'xml' em um pool de processos; 'full' carrega o
+# workbook inteiro
+EXCEL_INGEST_MODE = 'streaming'
+# Medir pico de memória de cada ingestão (tracemalloc deixa a leitura mais lenta)
+EXCEL_INGEST_PROFILE = False
+# Processos do modo 'parallel' (None = número de CPUs)
+EXCEL_INGEST_WORKERS = None
+
+# Estrutura do workbook: padrão (regex) do nome de cada aba e colunas
+# encontradas pelo cabeçalho ('index' é a posição usada se o cabeçalho não for
+# reconhecido). Cada aba 'LIQUIDAÇÃO <ano>' é lida e o valor gasto é a soma
+# dos anos; 'years' limita os anos lidos (None = todos). Sem EXCEL_SCHEMA vale
+# o DEFAULT_SCHEMA de dashboard/utils/excel_schema.py; defina-o aqui só para
+# um layout diferente, no mesmo formato
+# EXCEL_SCHEMA = {'validacoes': {...}, 'liquidacao': {..., 'years': [2025]}}
+
+# Cache do processamento, indexado pelo hash do conteúdo do arquivo
+PARSE_CACHE_ENABLED = True
+PARSE_CACHE_DIR = BASE_DIR / 'cache' / 'parse'
+PARSE_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+# /api/expenses: lançamentos por página (padrão de ?limit=) e máximo aceito
+EXPENSES_PAGE_SIZE = 100
+EXPENSES_MAX_PAGE_SIZE = 1000
+# /api/expenses?stream=json|ndjson: linhas lidas do banco por bloco
+EXPENSES_STREAM_CHUNK_SIZE = 2000
+
+# /api/companies: empresas por página (padrão de ?limit=) e máximo aceito
+COMPANIES_PAGE_SIZE = 100
+COMPANIES_MAX_PAGE_SIZE = 5000
+
+# /api/search: máximo de resultados por tipo (empresas e lançamentos)
+SEARCH_MAX_RESULTS = 50
+
+# Relatórios Excel de movimentos: reaproveitados enquanto os dados da empresa
+# não mudam; a pasta é limitada por tamanho e por dias sem uso
+EXPORT_CACHE_DIR = MEDIA_ROOT
+EXPORT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+EXPORT_CACHE_MAX_AGE_DAYS = 7
 
 # Custom user model
 AUTH_USER_MODEL = 'dashboard.User'
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'projeto_django.settings')
 
 application = get_wsgi_application()
+
+# Dados publicados pelo processo de ingestão (manage.py run_ingestor)
+from dashboard.ingest import start_snapshot_follower
+start_snapshot_follower()
@@ -43,6 +43,121 @@ let currentData = {
     file_path: null
 };
 
+// Formato dos dados: 'json', 'columnar' (uma lista por campo) ou 'msgpack' (colunar em binário)
+const DATA_FORMAT = 'columnar';
+
+// Converte o formato colunar na lista de empresas usada pela interface
+function decodeSnapshot(data) {
+    if (!data || data.format !== 'columnar') return data;
+    const columns = data.companies;
+    const years = Object.keys(columns.spent_by_year || {});
+    const companies = new Array(data.count);
+    for (let i = 0; i < data.count; i++) {
+        const spentByYear = {};
+        years.forEach(function(year) { spentByYear[year] = columns.spent_by_year[year][i]; });
+        companies[i] = {
+            code: columns.code[i],
+            name: columns.name[i],
+            contract_value: columns.contract_value[i],
+            spent_value: columns.spent_value[i],
+            spent_by_year: spentByYear,
+            percentage: columns.percentage[i],
+            status: data.statuses[columns.status[i]]
+        };
+    }
+    return {
+        companies: companies,
+        statistics: data.statistics,
+        last_update: data.last_update,
+        file_path: data.file_path,
+        version: data.version
+    };
+}
+
+// Decodificador MessagePack (somente os tipos gerados pelo servidor)
+function decodeMsgpack(buffer) {
+    const view = new DataView(buffer);
+    const bytes = new Uint8Array(buffer);
+    const text = new TextDecoder('utf-8');
+    let offset = 0;
+
+    function str(length) {
+        const value = text.decode(bytes.subarray(offset, offset + length));
+        offset += length;
+        return value;
+    }
+    function bin(length) {
+        const value = bytes.slice(offset, offset + length);
+        offset += length;
+        return value;
+    }
+    function array(length) {
+        const value = new Array(length);
+        for (let i = 0; i < length; i++) value[i] = read();
+        return value;
+    }
+    function map(length) {
+        const value = {};
+        for (let i = 0; i < length; i++) {
+            const key = read();
+            value[key] = read();
+        }
+        return value;
+    }
+    function next(size, getter) {
+        const value = getter.call(view, offset);
+        offset += size;
+        return value;
+    }
+    function read() {
+        const type = bytes[offset++];
+        if (type <= 0x7f) return type;
+        if (type <= 0x8f) return map(type & 0x0f);
+        if (type <= 0x9f) return array(type & 0x0f);
+        if (type <= 0xbf) return str(type & 0x1f);
+        if (type >= 0xe0) return type - 0x100;
+        switch (type) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xc4: return bin(next(1, view.getUint8));
+            case 0xc5: return bin(next(2, view.getUint16));
+            case 0xc6: return bin(next(4, view.getUint32));
+            case 0xca: return next(4, view.getFloat32);
+            case 0xcb: return next(8, view.getFloat64);
+            case 0xcc: return next(1, view.getUint8);
+            case 0xcd: return next(2, view.getUint16);
+            case 0xce: return next(4, view.getUint32);
+            case 0xcf: return Number(next(8, view.getBigUint64));
+            case 0xd0: return next(1, view.getInt8);
+            case 0xd1: return next(2, view.getInt16);
+            case 0xd2: return next(4, view.getInt32);
+            case 0xd3: return Number(next(8, view.getBigInt64));
+            case 0xd9: return str(next(1, view.getUint8));
+            case 0xda: return str(next(2, view.getUint16));
+            case 0xdb: return str(next(4, view.getUint32));
+            case 0xdc: return array(next(2, view.getUint16));
+            case 0xdd: return array(next(4, view.getUint32));
+            case 0xde: return map(next(2, view.getUint16));
+            case 0xdf: return map(next(4, view.getUint32));
+        }
+        throw new Error('Tipo MessagePack não suportado: 0x' + type.toString(16));
+    }
+    return read();
+}
+
+// Dados atuais do servidor, já decodificados
+function fetchDashboardData() {
+    return fetch('/api/data?format=' + DATA_FORMAT)
+        .then(function(response) {
+            if (!response.ok) throw new Error('Erro na resposta');
+            return DATA_FORMAT === 'msgpack'
+                ? response.arrayBuffer().then(decodeMsgpack)
+                : response.json();
+        })
+        .then(decodeSnapshot);
+}
+
 let filteredCompanies = [];
 let selectedCompany = null;
 
@@ -70,7 +185,7 @@ socket.on('disconnect', function() {
 socket.on('update', function(data) {
     console.log('Dados recebidos:', data);
     if (data && typeof data === 'object') {
-        currentData = data;
+        currentData = decodeSnapshot(data);
         updateUI();
     }
 });
@@ -108,11 +223,20 @@ function updateStatistics() {
     const totalSpent = document.getElementById('total-spent');
     const avgUtil = document.getElementById('average-utilization');
     const compCount = document.getElementById('companies-count');
+    const spentByYear = document.getElementById('spent-by-year');
 
     if (totalContracted) totalContracted.textContent = formatCurrency(stats.total_contracted || 0);
     if (totalSpent) totalSpent.textContent = formatCurrency(stats.total_spent || 0);
     if (avgUtil) avgUtil.textContent = (stats.average_utilization || 0).toFixed(1) + '%';
     if (compCount) compCount.textContent = stats.companies_count || 0;
+
+    // Total gasto de cada ano (só quando há mais de uma aba de LIQUIDAÇÃO)
+    if (spentByYear) {
+        const years = Object.entries(stats.spent_by_year || {});
+        spentByYear.textContent = years.length > 1
+            ? years.map(([year, value]) => `${year}: ${formatCurrency(value)}`).join(' · ')
+            : '';
+    }
 }
 
 // Filtrar empresas
@@ -265,8 +389,7 @@ function saveAdjustment(event) {
         if (data.success) {
             alert('Alterações salvas com sucesso!');
             // Recarregar dados
-            fetch('/api/data')
-                .then(r => r.json())
+            fetchDashboardData()
                 .then(d => {
                     currentData = d;
                     updateUI();
@@ -322,8 +445,7 @@ function addExpense(event) {
             
             // Recarregar dados da empresa no modal
             setTimeout(function() {
-                fetch('/api/data')
-                    .then(r => r.json())
+                fetchDashboardData()
                     .then(d => {
                         currentData = d;
                         // Atualizar empresa selecionada
@@ -369,9 +491,20 @@ function addExpense(event) {
 }
 
 // Carregar lançamentos
-function loadExpenses(companyCode) {
-    fetch('/api/expenses?company_code=' + companyCode)
+function fetchAllExpenses(companyCode, cursor, expenses) {
+    // Segue as páginas (next_cursor) até a última
+    let url = '/api/expenses?company_code=' + encodeURIComponent(companyCode);
+    if (cursor) url += '&cursor=' + encodeURIComponent(cursor);
+    return fetch(url)
         .then(response => response.json())
+        .then(page => {
+            expenses = (expenses || []).concat(page.results || []);
+            return page.next_cursor ? fetchAllExpenses(companyCode, page.next_cursor, expenses) : expenses;
+        });
+}
+
+function loadExpenses(companyCode) {
+    fetchAllExpenses(companyCode)
         .then(expenses => {
             const list = document.getElementById('expenses-list');
             
@@ -416,8 +549,7 @@ function deleteExpense(expenseId) {
             loadExpenses(selectedCompany.code);
             
             // Recarregar dados da empresa
-            fetch('/api/data')
-                .then(r => r.json())
+            fetchDashboardData()
                 .then(d => {
                     currentData = d;
                     const updatedCompany = currentData.companies.find(c => c.code === selectedCompany.code);
@@ -535,11 +667,7 @@ if (searchInput) {
 document.addEventListener('DOMContentLoaded', function() {
     console.log('Página carregada');
     // Solicitar dados iniciais
-    fetch('/api/data')
-        .then(function(response) {
-            if (!response.ok) throw new Error('Erro na resposta');
-            return response.json();
-        })
+    fetchDashboardData()
         .then(function(data) {
             if (data && typeof data === 'object') {
                 currentData = data;